@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the API's hot paths.
+
+For each dataset size, students are seeded through the real CRUD layer
+(`create_student`, `link_tag`, `create_device`) into a local SQLite database,
+then the FastAPI app is driven in-process through an ASGI client:
+
+    rfid_check_status      POST /rfid/check-status       (device API key)
+    token                  POST /token                   (bcrypt verify)
+    clearance_update       PUT  /clearance/update        (admin)
+    clearance_statistics   GET  /clearance/statistics    (admin)
+    admin_students         GET  /admin/students/         (admin, random page)
+    students_me_clearance  GET  /students/me/clearance   (student)
+
+Throughput and p50/p95/p99 latency per scenario are written as JSON, so two
+branches can be compared by running the same command on each. Everything runs
+offline; no Postgres, network or external service is needed.
+
+Each size runs in its own subprocess because the database URL is read when
+`src` is imported. Seeded databases are kept in --data-dir and reused on the
+next run (pass --fresh to rebuild them); seeding 100k students takes a while.
+
+Usage:
+    python benchmarks/api_bench.py [--sizes 1000,10000,100000] [--requests 200]
+                                   [--concurrency 8] [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATA_DIR = os.path.join(ROOT, "benchmarks", ".data")
+
+ADMIN_USERNAME = "bench-admin"
+ADMIN_PASSWORD = "bench-admin-password"
+STUDENT_PASSWORD = "bench-student-password"
+MATRIC_BASE = 30_000_000
+TAG_EVERY = 10  # link an RFID tag to every 10th student
+LOGGED_IN_STUDENTS = 20
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], errors: int, wall_seconds: float) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall_seconds, 2) if wall_seconds else 0.0,
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else 0.0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]) if latencies else 0.0,
+    }
+
+
+# --- Child process: seed and run one size ---
+
+
+def matric_no(i: int) -> str:
+    return str(MATRIC_BASE + i)
+
+
+def tag_id(i: int) -> str:
+    return f"BENCH{i:08d}"
+
+
+@contextmanager
+def hash_seed_password_once():
+    """
+    Every seeded student shares a password, so hash it once instead of paying
+    bcrypt per student. Logins during the run still verify at full cost.
+    """
+    from src.crud import users as user_crud
+    original = user_crud.hash_password
+    cache: Dict[str, str] = {}
+
+    def hash_once(password: str) -> str:
+        if password not in cache:
+            cache[password] = original(password)
+        return cache[password]
+
+    user_crud.hash_password = hash_once
+    try:
+        yield
+    finally:
+        user_crud.hash_password = original
+
+
+def seed(size: int) -> str:
+    """Seeds `size` benchmark students (skipping any already present) and returns a device API key."""
+    from sqlmodel import Session, func, select
+    from src.crud import devices as device_crud
+    from src.crud import students as student_crud
+    from src.crud import users as user_crud
+    from src.crud.tag_linking import link_tag
+    from src.database import engine
+    from src.models import (
+        Department, DeviceCreate, Role, Student, StudentCreate, TagLink, UserCreate
+    )
+
+    departments = list(Department)
+    with Session(engine) as db:
+        if not user_crud.get_user_by_username(db, ADMIN_USERNAME):
+            user_crud.create_user(db, UserCreate(
+                username=ADMIN_USERNAME, password=ADMIN_PASSWORD, email="bench-admin@example.com",
+                full_name="Benchmark Admin", role=Role.ADMIN))
+
+        existing = db.exec(
+            select(func.count(Student.id)).where(Student.matric_no >= matric_no(1))  # type:ignore
+        ).one()
+        started = time.perf_counter()
+        with hash_seed_password_once():
+            for i in range(existing + 1, size + 1):
+                student_crud.create_student(db, StudentCreate(
+                    full_name=f"Bench Student {i}",
+                    matric_no=matric_no(i),
+                    email=f"bench{i}@example.com",
+                    department=departments[i % len(departments)],
+                    password=STUDENT_PASSWORD,
+                ))
+                if i % TAG_EVERY == 0:
+                    link_tag(db, TagLink(tag_id=tag_id(i), matric_no=matric_no(i)))
+                if i % 1000 == 0:
+                    print(f"  seeded {i}/{size} students ({time.perf_counter() - started:.0f}s)",
+                          file=sys.stderr, flush=True)
+
+        device = device_crud.get_device_by_name(db, "bench-gate") or device_crud.create_device(
+            db, DeviceCreate(device_name="bench-gate", location="Main Gate", department=departments[0]))
+        return device.api_key  # type:ignore
+
+
+async def run_scenario(name: str, call: Callable[[int], Awaitable[int]], requests: int,
+                       concurrency: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal errors, next_index
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            start = time.perf_counter()
+            status_code = await call(index)
+            latencies.append(time.perf_counter() - start)
+            if status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(latencies, errors, time.perf_counter() - started)
+    print(f"  {name}: {result['throughput_rps']} req/s, p50 {result['p50_ms']} ms, "
+          f"p99 {result['p99_ms']} ms, {errors} errors", file=sys.stderr, flush=True)
+    return result
+
+
+async def run_size(size: int, requests: int, concurrency: int, seed_value: int) -> Dict[str, dict]:
+    import httpx
+    import main
+    from src.models import ClearanceDepartment, ClearanceStatusEnum
+
+    app = main.app
+
+    rng = random.Random(seed_value)
+    results: Dict[str, dict] = {}
+    async with main.lifespan(app):
+        print(f"Seeding {size} students...", file=sys.stderr, flush=True)
+        api_key = seed(size)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def login(username: str, password: str) -> Dict[str, str]:
+                response = await client.post("/token", data={"username": username, "password": password})
+                response.raise_for_status()
+                return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            admin = await login(ADMIN_USERNAME, ADMIN_PASSWORD)
+            student_ids = rng.sample(range(1, size + 1), min(size, LOGGED_IN_STUDENTS))
+            students = [await login(matric_no(i), STUDENT_PASSWORD) for i in student_ids]
+            tagged = [tag_id(i) for i in range(TAG_EVERY, size + 1, TAG_EVERY)]
+            departments = list(ClearanceDepartment)
+            statuses = [ClearanceStatusEnum.APPROVED, ClearanceStatusEnum.PENDING]
+
+            async def rfid_check_status(i: int) -> int:
+                # One scan in ten is an unknown card
+                tag = rng.choice(tagged) if tagged and i % 10 else f"UNKNOWN{i}"
+                response = await client.post("/rfid/check-status", json={"tag_id": tag},
+                                             headers={"x-api-key": api_key})
+                return response.status_code
+
+            async def token(i: int) -> int:
+                response = await client.post("/token", data={
+                    "username": matric_no(rng.choice(student_ids)), "password": STUDENT_PASSWORD})
+                return response.status_code
+
+            async def clearance_update(i: int) -> int:
+                response = await client.put("/clearance/update", headers=admin, json={
+                    "matric_no": matric_no(rng.randint(1, size)),
+                    "department": rng.choice(departments).value,
+                    "status": statuses[i % 2].value,
+                })
+                return response.status_code
+
+            async def clearance_statistics(i: int) -> int:
+                return (await client.get("/clearance/statistics", headers=admin)).status_code
+
+            async def admin_students(i: int) -> int:
+                skip = rng.randrange(0, max(1, size - 100))
+                response = await client.get("/admin/students/", headers=admin,
+                                            params={"skip": skip, "limit": 100})
+                return response.status_code
+
+            async def students_me_clearance(i: int) -> int:
+                response = await client.get("/students/me/clearance", headers=students[i % len(students)])
+                return response.status_code
+
+            scenarios = [
+                ("rfid_check_status", rfid_check_status, requests),
+                # bcrypt dominates, so fewer logins are enough for stable percentiles
+                ("token", token, max(10, requests // 10)),
+                ("clearance_update", clearance_update, requests),
+                ("clearance_statistics", clearance_statistics, requests),
+                ("admin_students", admin_students, requests),
+                ("students_me_clearance", students_me_clearance, requests),
+            ]
+            for name, call, count in scenarios:
+                results[name] = await run_scenario(name, call, count, concurrency)
+    return results
+
+
+def child_main(args):
+    results = asyncio.run(run_size(args.child, args.requests, args.concurrency, args.seed))
+    print(json.dumps(results))
+
+
+# --- Parent process: one child per size, merged report ---
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_child(size: int, args) -> Dict[str, dict]:
+    os.makedirs(args.data_dir, exist_ok=True)
+    db_path = os.path.join(args.data_dir, f"bench-{size}.db")
+    if args.fresh and os.path.exists(db_path):
+        os.remove(db_path)
+    env = dict(
+        os.environ,
+        POSTGRES_URI=f"sqlite:///{db_path}",
+        initial_admin_username="admin",
+        initial_admin_password="admin-password",
+        initial_admin_email="admin@example.com",
+        # Measure the endpoints themselves, not the admission control in front of them
+        RATE_LIMIT_ENABLED="false",
+        COUNTER_RECONCILE_INTERVAL_SECONDS="86400",
+    )
+    command = [sys.executable, os.path.abspath(__file__), "--child", str(size),
+               "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+               "--seed", str(args.seed)]
+    completed = subprocess.run(command, cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True)
+    if completed.returncode != 0:
+        raise SystemExit(f"Benchmark for {size} students failed (exit code {completed.returncode})")
+    # The app prints startup messages to stdout; the results are the last line.
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="Comma-separated student counts (default: 1000,10000,100000)")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent in-flight requests")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for request mixes")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="Where seeded databases are kept")
+    parser.add_argument("--fresh", action="store_true", help="Rebuild seeded databases")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, ROOT)
+        child_main(args)
+        return
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": "sqlite",
+            "requests_per_scenario": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "results": {},
+    }
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        print(f"== {size} students ==", file=sys.stderr, flush=True)
+        report["results"][str(size)] = run_child(size, args)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
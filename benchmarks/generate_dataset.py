@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Synthetic campus dataset generator for hardware sizing and benchmarks.
+
+Loads, into the database configured by POSTGRES_URI:
+
+- N students spread over the five `Department` values and the last --sessions
+  academic sessions (oldest first, ending with CURRENT_ACADEMIC_SESSION), each with a linked
+  student user account (username = matric number) and one `ClearanceStatus` row per
+  `ClearanceDepartment`, with department-specific approval and rejection rates
+- `RFIDTag`s linked to a share of the students and staff
+- staff users for every `ClearanceDepartment`
+- gate devices
+
+The same --seed always produces the same data. Rows are written with
+PostgreSQL `COPY` or, on SQLite, batched executemany inserts, skipping the ORM
+entirely, and the dashboard counters are reconciled at the end. Every
+generated account shares one password, hashed once.
+
+The generated data (including device API keys) is predictable from the seed;
+never load it into a production database.
+
+Usage:
+    POSTGRES_URI=sqlite:///campus.db python benchmarks/generate_dataset.py --students 100000
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+from typing import Dict, Iterable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Connection
+from sqlmodel import Session, SQLModel
+
+from src.config import settings
+from src.crud.counters import reconcile_counters
+from src.crud.utils import hash_password
+from src.database import create_db_and_tables, engine
+from src.models import (
+    ClearanceDepartment, ClearanceStatus, ClearanceStatusEnum, Department, Device, Role, Student, User
+)
+
+FIRST_NAMES = [
+    "Adebayo", "Chinedu", "Funmilayo", "Ibrahim", "Ngozi", "Oluwaseun", "Aisha", "Emeka", "Temitope",
+    "Yusuf", "Blessing", "Tunde", "Kemi", "Chiamaka", "Segun", "Zainab", "Ifeoma", "Babatunde",
+    "Halima", "Obinna", "Esther", "Praise", "Testimony", "Damilola", "Uche",
+]
+LAST_NAMES = [
+    "Adeyemi", "Okafor", "Bello", "Eze", "Ogunleye", "Abubakar", "Nwosu", "Balogun", "Okonkwo",
+    "Adekoya", "Oladimeji", "Musa", "Chukwu", "Afolabi", "Lawal", "Obi", "Salami", "Danjuma",
+]
+
+# Share of students each department has approved / rejected. The Bursary and
+# Academic Affairs queues are the usual bottlenecks.
+APPROVAL_RATES: Dict[ClearanceDepartment, float] = {
+    ClearanceDepartment.LIBRARY: 0.85,
+    ClearanceDepartment.STUDENT_AFFAIRS: 0.75,
+    ClearanceDepartment.BURSARY: 0.50,
+    ClearanceDepartment.ACADEMIC_AFFAIRS: 0.60,
+    ClearanceDepartment.HEALTH_CENTER: 0.90,
+}
+REJECTION_RATES: Dict[ClearanceDepartment, float] = {
+    ClearanceDepartment.LIBRARY: 0.02,
+    ClearanceDepartment.STUDENT_AFFAIRS: 0.01,
+    ClearanceDepartment.BURSARY: 0.06,
+    ClearanceDepartment.ACADEMIC_AFFAIRS: 0.03,
+    ClearanceDepartment.HEALTH_CENTER: 0.01,
+}
+REJECTION_REMARKS: Dict[ClearanceDepartment, str] = {
+    ClearanceDepartment.LIBRARY: "Overdue library books",
+    ClearanceDepartment.STUDENT_AFFAIRS: "Hostel damage report outstanding",
+    ClearanceDepartment.BURSARY: "Outstanding school fees",
+    ClearanceDepartment.ACADEMIC_AFFAIRS: "Missing final year project submission",
+    ClearanceDepartment.HEALTH_CENTER: "Medical report not submitted",
+}
+ENTRY_YEARS = range(2018, 2025)
+
+
+def tag_code(index: int, seed: int) -> str:
+    """
+    A unique 8-hex-digit tag id per index (the owner's user id, so reruns don't
+    collide): multiplying by an odd constant is a bijection mod 2**32.
+    """
+    return f"{(index * 2654435761 + seed) & 0xFFFFFFFF:08X}"
+
+
+def next_id(db: Session, model) -> int:
+    return (db.execute(select(func.max(model.id))).scalar() or 0) + 1  # type:ignore
+
+
+def student_status(rng: random.Random, department: ClearanceDepartment, progress: float) -> ClearanceStatusEnum:
+    """Students further along (higher progress) are more likely to be approved everywhere."""
+    roll = rng.random()
+    if roll < REJECTION_RATES[department]:
+        return ClearanceStatusEnum.REJECTED
+    if roll < REJECTION_RATES[department] + APPROVAL_RATES[department] * progress:
+        return ClearanceStatusEnum.APPROVED
+    return ClearanceStatusEnum.PENDING
+
+
+def generate(db: Session, args) -> Dict[str, List[dict]]:
+    rng = random.Random(args.seed)
+    password_hash = hash_password(args.password)
+    departments = list(Department)
+    user_id, student_id, status_id, device_id = (
+        next_id(db, User), next_id(db, Student), next_id(db, ClearanceStatus), next_id(db, Device))
+    matric_offset = student_id  # keeps matric numbers unique across repeated runs
+    current_start = int(settings.CURRENT_ACADEMIC_SESSION[:4])
+    sessions = [f"{year}/{year + 1}" for year in range(current_start - args.sessions + 1, current_start + 1)]
+
+    rows: Dict[str, List[dict]] = {"user": [], "student": [], "clearancestatus": [], "rfidtag": [], "device": []}
+
+    for i in range(args.students):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        full_name = f"{last} {first}"
+        matric_no = f"{rng.choice(ENTRY_YEARS)}{matric_offset + i:06d}"
+        email = f"{first}.{last}.{matric_no}@student.example.edu".lower()
+        department = departments[rng.randrange(len(departments))]
+        academic_session = sessions[i * len(sessions) // args.students]
+
+        rows["user"].append(dict(
+            id=user_id, username=matric_no, email=email, full_name=full_name, hashed_password=password_hash,
+            role=Role.STUDENT, department=department, clearance_department=None, student_id=student_id))
+        rows["student"].append(dict(
+            id=student_id, full_name=full_name, matric_no=matric_no, email=email, department=department, version=1,
+            academic_session=academic_session))
+
+        # Skewed towards the ends: many students have barely started, many are nearly done
+        progress = rng.betavariate(0.8, 0.6)
+        for clearance_department in ClearanceDepartment:
+            status = student_status(rng, clearance_department, progress)
+            rows["clearancestatus"].append(dict(
+                id=status_id, department=clearance_department, status=status,
+                remarks=REJECTION_REMARKS[clearance_department] if status == ClearanceStatusEnum.REJECTED else None,
+                student_id=student_id, version=1, claimed_by=None, claim_expires_at=None,
+                academic_session=academic_session))
+            status_id += 1
+
+        if rng.random() < args.tag_ratio:
+            rows["rfidtag"].append(dict(tag_id=tag_code(user_id, args.seed), student_id=student_id, user_id=None))
+        user_id += 1
+        student_id += 1
+
+    for clearance_department in ClearanceDepartment:
+        slug = clearance_department.value.lower().replace(" ", "-")
+        for n in range(1, args.staff_per_department + 1):
+            rows["user"].append(dict(
+                id=user_id, username=f"staff.{slug}.{matric_offset}.{n}",
+                email=f"{slug}.{matric_offset}.{n}@staff.example.edu",
+                full_name=f"{clearance_department.value} Officer {n}", hashed_password=password_hash,
+                role=Role.STAFF, department=None, clearance_department=clearance_department, student_id=None))
+            rows["rfidtag"].append(dict(tag_id=tag_code(user_id, args.seed), student_id=None, user_id=user_id))
+            user_id += 1
+
+    for n in range(args.devices):
+        department = departments[n % len(departments)]
+        rows["device"].append(dict(
+            id=device_id, device_name=f"gate-{device_id}", api_key=f"{rng.getrandbits(192):048x}",
+            location=f"{department.value} Gate {n // len(departments) + 1}", department=department,
+            is_active=True))
+        device_id += 1
+    return rows
+
+
+# --- Loaders ---
+
+
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def copy_rows(conn: Connection, table_name: str, rows: List[dict]):
+    """Streams rows through PostgreSQL COPY, converting values the same way SQLAlchemy binds them."""
+    table = SQLModel.metadata.tables[table_name]
+    columns = list(rows[0])
+    processors = [table.c[name].type.dialect_impl(conn.dialect).bind_processor(conn.dialect) for name in columns]
+    buffer = io.StringIO()
+    for row in rows:
+        values = []
+        for name, process in zip(columns, processors):
+            value = row[name]
+            values.append(_copy_value(process(value) if process is not None else value))
+        buffer.write("\t".join(values) + "\n")
+    buffer.seek(0)
+    column_list = ", ".join(f'"{name}"' for name in columns)
+    statement = f'COPY "{table_name}" ({column_list}) FROM STDIN'
+    cursor = conn.connection.dbapi_connection.cursor()  # type:ignore
+    try:
+        if conn.dialect.driver == "psycopg2":
+            cursor.copy_expert(statement, buffer)
+        else:  # psycopg 3, SQLAlchemy's default for postgresql:// URLs
+            with cursor.copy(statement) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+
+def insert_rows(conn: Connection, table_name: str, rows: List[dict], batch_size: int):
+    """executemany in batches; SQLAlchemy hands each batch to the driver in one call."""
+    table = SQLModel.metadata.tables[table_name]
+    for start in range(0, len(rows), batch_size):
+        conn.execute(table.insert(), rows[start:start + batch_size])
+
+
+def load(rows: Dict[str, List[dict]], batch_size: int):
+    use_copy = engine.dialect.name == "postgresql"
+    # Parents before children, all in one transaction
+    with engine.begin() as conn:
+        for table_name in ("student", "clearancestatus", "user", "rfidtag", "device"):
+            if not rows[table_name]:
+                continue
+            started = time.perf_counter()
+            if use_copy:
+                copy_rows(conn, table_name, rows[table_name])
+            else:
+                insert_rows(conn, table_name, rows[table_name], batch_size)
+            print(f"  {table_name}: {len(rows[table_name])} rows in {time.perf_counter() - started:.1f}s")
+
+        if use_copy:
+            # Explicit ids bypass the sequences, so move them past the loaded rows
+            for table_name in ("user", "student", "clearancestatus", "device"):
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('\"{table_name}\"', 'id'), "
+                    f"(SELECT MAX(id) FROM \"{table_name}\"))"))
+
+
+def summarize(rows: Iterable[dict]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for row in rows:
+        counts[row["status"].value] = counts.get(row["status"].value, 0) + 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=100_000, help="Number of students (default: 100000)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42)")
+    parser.add_argument("--tag-ratio", type=float, default=0.8, help="Share of students with an RFID tag")
+    parser.add_argument("--staff-per-department", type=int, default=3, help="Staff users per clearance department")
+    parser.add_argument("--sessions", type=int, default=1,
+                        help="Academic sessions to spread the students over, ending with the current one")
+    parser.add_argument("--devices", type=int, default=10, help="Number of gate devices")
+    parser.add_argument("--password", default="student123", help="Password for every generated account")
+    parser.add_argument("--batch-size", type=int, default=10_000, help="Rows per executemany batch (SQLite)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    create_db_and_tables()
+
+    print(f"Generating {args.students} students (seed {args.seed})...")
+    with Session(engine) as db:
+        rows = generate(db, args)
+    print(f"Generated in {time.perf_counter() - started:.1f}s; clearance statuses: "
+          f"{summarize(rows['clearancestatus'])}")
+
+    print(f"Loading into {engine.dialect.name}...")
+    load(rows, args.batch_size)
+
+    with Session(engine) as db:
+        reconcile_counters(db)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    print(f"Done in {time.perf_counter() - started:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the /admin/students/ serialization path.
+
+Compares the default FastAPI encoding of `List[StudentReadWithClearance]`
+(pydantic validation from ORM attributes, then stdlib json) with the
+`FAST_JSON` path in `src.serialization` (plain dicts + orjson).
+Runs without a database: the ORM objects are built in memory.
+
+Usage:
+    python benchmarks/serialization_bench.py [--students 1000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+from pydantic import TypeAdapter
+
+from src.models import (
+    ClearanceDepartment, ClearanceStatus, Department, RFIDTag, Student, StudentReadWithClearance
+)
+from src.serialization import student_payload
+
+
+def build_students(count: int) -> List[Student]:
+    departments = list(Department)
+    students = []
+    for i in range(1, count + 1):
+        student = Student(
+            id=i,
+            full_name=f"Student {i}",
+            matric_no=f"{20190000 + i}",
+            email=f"student{i}@example.com",
+            department=departments[i % len(departments)],
+        )
+        student.clearance_statuses = [
+            ClearanceStatus(id=i * 10 + n, department=dept, student_id=i)
+            for n, dept in enumerate(ClearanceDepartment)
+        ]
+        if i % 2:
+            student.rfid_tag = RFIDTag(tag_id=f"TAG{i:08X}", student_id=i)
+        students.append(student)
+    return students
+
+
+def encode_default(adapter: TypeAdapter, students: List[Student]) -> bytes:
+    """What FastAPI does for a response_model: validate, dump to JSON-able, json.dumps."""
+    validated = adapter.validate_python(students, from_attributes=True)
+    return json.dumps(adapter.dump_python(validated, mode="json")).encode("utf-8")
+
+
+def encode_adapter_json(adapter: TypeAdapter, students: List[Student]) -> bytes:
+    """Validation still runs, but serialization happens in pydantic-core."""
+    return adapter.dump_json(adapter.validate_python(students, from_attributes=True))
+
+
+def encode_fast(students: List[Student]) -> bytes:
+    """The FAST_JSON path: trusted ORM data straight to orjson."""
+    return orjson.dumps([student_payload(s) for s in students])
+
+
+def timeit(fn, repeat: int) -> List[float]:
+    fn()  # warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    students = build_students(args.students)
+    adapter = TypeAdapter(List[StudentReadWithClearance])
+
+    # Both paths must produce the same document.
+    assert json.loads(encode_default(adapter, students)) == json.loads(encode_fast(students))
+
+    results = {
+        "default (validate + json)": timeit(lambda: encode_default(adapter, students), args.repeat),
+        "TypeAdapter.dump_json": timeit(lambda: encode_adapter_json(adapter, students), args.repeat),
+        "FAST_JSON (dicts + orjson)": timeit(lambda: encode_fast(students), args.repeat),
+    }
+
+    baseline = statistics.median(results["default (validate + json)"])
+    print(f"Serializing {args.students} students, median of {args.repeat} runs:")
+    for name, timings in results.items():
+        median = statistics.median(timings)
+        print(f"  {name:<28} {median:8.2f} ms  ({baseline / median:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark and import-time budget check.
+
+Two measurements, each in fresh processes against a local SQLite database:
+
+    imports         `import main` under `python -X importtime`: the total, the
+                    slowest modules, and any of LAZY_MODULES that got imported
+                    (they must only load on first use)
+    first_request   spawn `uvicorn main:app`, poll GET /health, and time from
+                    spawn to the first 200 response
+
+The database is created and seeded by one untimed boot first, so the timed
+boots measure a worker joining an existing deployment. Exits with status 1 if
+the import time is over --import-budget-ms, a lazy module is imported eagerly,
+or the median time to first request is over --target.
+
+Usage:
+    python benchmarks/startup_bench.py [--runs 5] [--import-budget-ms 1500] [--target 5]
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy dependencies only needed on first use (login, token checks, tests, dev server)
+LAZY_MODULES = ("pytest", "jose", "passlib", "bcrypt", "uvicorn")
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)$")
+
+
+def app_env(db_path: str) -> Dict[str, str]:
+    return dict(
+        os.environ,
+        POSTGRES_URI=f"sqlite:///{db_path}",
+        initial_admin_username="admin",
+        initial_admin_password="admin-password",
+        initial_admin_email="admin@example.com",
+    )
+
+
+def measure_imports(env: Dict[str, str], top: int) -> Tuple[float, List[Tuple[str, float]], List[str]]:
+    """Returns (total ms, slowest modules by own time, lazy modules that were imported)."""
+    probe = (f"import sys, json; import main; "
+             f"print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))")
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], cwd=ROOT, env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if completed.returncode != 0:
+        raise SystemExit(f"Importing main failed:\n{completed.stderr[-2000:]}")
+    own: List[Tuple[str, float]] = []
+    total_us = 0
+    for line in completed.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        own.append((name, int(self_us) / 1000))
+        if len(indent) == 1:  # top-level imports; their cumulative times add up to the total
+            total_us += int(cumulative_us)
+    eager = json.loads(completed.stdout.strip().splitlines()[-1])
+    own.sort(key=lambda item: item[1], reverse=True)
+    return total_us / 1000, own[:top], eager
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_request(env: Dict[str, str], timeout: float) -> Tuple[float, str]:
+    """Spawns a uvicorn worker and returns (seconds until /health answered, the worker's own report)."""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        while True:
+            if time.perf_counter() - started > timeout:
+                raise SystemExit(f"No response from the worker within {timeout:.0f}s")
+            if process.poll() is not None:
+                raise SystemExit(f"The worker exited during startup:\n{process.stdout.read()[-2000:]}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        elapsed = time.perf_counter() - started
+                        break
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+    finally:
+        process.terminate()
+        output, _ = process.communicate(timeout=10)
+    reported = next((line for line in output.splitlines() if line.startswith("First request served")), "")
+    return elapsed, reported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Timed worker boots (default: 5)")
+    parser.add_argument("--import-budget-ms", type=float, default=1500.0, help="Budget for `import main`")
+    parser.add_argument("--target", type=float, default=float(os.getenv("STARTUP_TARGET_SECONDS", "5")),
+                        help="Target for the median time to first request, in seconds")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Give up on a boot after this many seconds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = app_env(os.path.join(data_dir, "startup.db"))
+        print("Creating and seeding the database...", file=sys.stderr, flush=True)
+        time_to_first_request(env, args.timeout)
+
+        total_ms, slowest, eager = measure_imports(env, args.top)
+        boots = []
+        for run in range(args.runs):
+            elapsed, reported = time_to_first_request(env, args.timeout)
+            print(f"  boot {run + 1}: {elapsed:.2f}s ({reported or 'no report'})", file=sys.stderr, flush=True)
+            boots.append(elapsed)
+
+    median = statistics.median(boots)
+    failures = []
+    if total_ms > args.import_budget_ms:
+        failures.append(f"import main took {total_ms:.0f} ms, budget is {args.import_budget_ms:.0f} ms")
+    if eager:
+        failures.append(f"imported at startup instead of on first use: {', '.join(eager)}")
+    if median > args.target:
+        failures.append(f"median time to first request {median:.2f}s, target is {args.target:.2f}s")
+
+    print(json.dumps({
+        "imports": {
+            "total_ms": round(total_ms, 1),
+            "budget_ms": args.import_budget_ms,
+            "eager_lazy_modules": eager,
+            "slowest_ms": {name: round(ms, 1) for name, ms in slowest},
+        },
+        "first_request": {
+            "median_seconds": round(median, 3),
+            "min_seconds": round(min(boots), 3),
+            "max_seconds": round(max(boots), 3),
+            "target_seconds": args.target,
+        },
+        "failures": failures,
+    }, indent=2))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the hot lookups' per-call overhead.
+
+Times the CRUD lookups on the authentication and gate-scan paths against the
+way they used to be written (a fresh `select(...)` per call and, for the tag
+lookups, a tag query followed by the owner query and relationship refreshes).
+Runs against an in-memory SQLite database, so the numbers are dominated by
+Python-side statement construction, caching and ORM loading rather than I/O.
+
+Usage:
+    python benchmarks/statement_bench.py [--calls 5000]
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("POSTGRES_URI", "sqlite://")
+os.environ.setdefault("initial_admin_username", "admin")
+os.environ.setdefault("initial_admin_password", "admin-password")
+os.environ.setdefault("initial_admin_email", "admin@example.com")
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, select
+
+from src.crud import devices as device_crud
+from src.crud import students as student_crud
+from src.crud import users as user_crud
+from src.models import ClearanceDepartment, ClearanceStatus, Department, Device, RFIDTag, Role, Student, User
+
+
+# --- The lookups as they were written before the statements were pre-built ---
+
+
+def adhoc_user_by_username(db: Session, username: str):
+    return db.exec(select(User).where(User.username == username)).first()
+
+
+def adhoc_device_by_api_key(db: Session, api_key: str):
+    return db.exec(select(Device).where(Device.api_key == api_key, Device.is_active == True)).first()
+
+
+def adhoc_student_by_matric_no(db: Session, matric_no: str):
+    student = db.exec(select(Student).where(Student.matric_no == matric_no)).first()
+    if student:
+        db.refresh(student, ["rfid_tag", "clearance_statuses"])
+    return student
+
+
+def adhoc_student_by_tag_id(db: Session, tag_id: str):
+    tag = db.exec(select(RFIDTag).where(RFIDTag.tag_id == tag_id)).first()
+    if tag and tag.student_id:
+        student = db.exec(select(Student).where(Student.id == tag.student_id)).first()
+        if student:
+            db.refresh(student, ["rfid_tag", "clearance_statuses"])
+        return student
+    return None
+
+
+def adhoc_user_by_tag_id(db: Session, tag_id: str):
+    tag = db.exec(select(RFIDTag).where(RFIDTag.tag_id == tag_id)).first()
+    if tag and tag.user_id:
+        return db.exec(select(User).where(User.id == tag.user_id)).first()
+    return None
+
+
+def seed(db: Session):
+    staff = User(username="staff.library", email="staff@example.com", full_name="Library Officer",
+                 hashed_password="x", role=Role.STAFF, clearance_department=ClearanceDepartment.LIBRARY)
+    student = Student(full_name="Ada Obi", matric_no="20190001", email="ada@example.com",
+                      department=Department.ENGINEERING)
+    student.clearance_statuses = [ClearanceStatus(department=d) for d in ClearanceDepartment]
+    db.add_all([staff, student, Device(device_name="gate-1", api_key="bench-key", location="Main Gate",
+                                       department=Department.ENGINEERING, is_active=True)])
+    db.flush()
+    db.add_all([RFIDTag(tag_id="STAFF001", user_id=staff.id), RFIDTag(tag_id="STUDENT1", student_id=student.id)])
+    db.commit()
+
+
+def time_calls(engine, call: Callable[[Session], object], calls: int) -> Dict[str, float]:
+    statements = 0
+
+    def count(*args):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine, "after_cursor_execute", count)
+    try:
+        with Session(engine) as db:
+            for _ in range(min(calls, 500)):  # warm up the compiled-statement cache
+                call(db)
+                db.expunge_all()
+            statements = 0
+            started = time.perf_counter()
+            for _ in range(calls):
+                call(db)
+                db.expunge_all()  # each request starts with an empty identity map
+            elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine, "after_cursor_execute", count)
+    return {"us_per_call": round(elapsed / calls * 1e6, 1), "statements_per_call": round(statements / calls, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=5000, help="Calls per lookup (default: 5000)")
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        seed(db)
+
+    lookups = {
+        "user_by_username": (lambda db: adhoc_user_by_username(db, "staff.library"),
+                             lambda db: user_crud.get_user_by_username(db, "staff.library")),
+        "device_by_api_key": (lambda db: adhoc_device_by_api_key(db, "bench-key"),
+                              lambda db: device_crud.get_device_by_api_key(db, "bench-key")),
+        "student_by_matric_no": (lambda db: adhoc_student_by_matric_no(db, "20190001"),
+                                 lambda db: student_crud.get_student_by_matric_no(db, "20190001")),
+        "student_by_tag_id": (lambda db: adhoc_student_by_tag_id(db, "STUDENT1"),
+                              lambda db: student_crud.get_student_by_tag_id(db, "STUDENT1")),
+        "user_by_tag_id": (lambda db: adhoc_user_by_tag_id(db, "STAFF001"),
+                           lambda db: user_crud.get_user_by_tag_id(db, "STAFF001")),
+    }
+    print(f"{'lookup':<22} {'before us':>10} {'after us':>10} {'change':>8} {'stmts':>12}")
+    for name, (before_call, after_call) in lookups.items():
+        before = time_calls(engine, before_call, args.calls)
+        after = time_calls(engine, after_call, args.calls)
+        change = (after["us_per_call"] - before["us_per_call"]) / before["us_per_call"] * 100
+        print(f"{name:<22} {before['us_per_call']:>10.1f} {after['us_per_call']:>10.1f} {change:>7.0f}% "
+              f"{before['statements_per_call']:>5.2f} -> {after['statements_per_call']:<4.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,20 @@
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from datetime import datetime
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
 from contextlib import asynccontextmanager
 import os
 from sqlmodel import Session, select
 from starlette.middleware.cors import CORSMiddleware
 
 from src.config import settings
+from src.startup import FirstRequestTimerMiddleware, clock as startup_clock
 from src.database import create_db_and_tables, engine
-from src.routers import admin, clearance, devices, students, token, users
+from src.routers import admin, analytics, clearance, devices, jobs, rfid, students, token, users
+from src.serialization import FastJSONResponse
+from src.rate_limit import RateLimitMiddleware
+from src import metrics
+from src.query_budget import QueryBudgetMiddleware
 from src.models import (
     User,
     UserCreate,
@@ -24,6 +28,11 @@ from src.models import (
     StudentCreate
 )
 from src.crud.tag_linking import link_tag
+from src.crud.counters import reconcile_counters
+from src.background import start_periodic
+from src.jobs import job_runner, requeue_stale_jobs
+from src import job_kinds  # noqa: F401 (registers the job kinds)
+from src.tag_filter import tag_filter
 from src.crud.students import create_student, get_student_by_matric_no
 
 initial_students_data = [
@@ -169,28 +178,79 @@ def seed_initial_students(session: Session):
     print("Initial student data check complete.")
 
 
+def reconcile_dashboard_counters():
+    with Session(engine) as session:
+        drift = reconcile_counters(session)
+    if drift:
+        print(f"Dashboard counters reconciled, corrected drift: {drift}")
+
+
+def rebuild_tag_filter():
+    # From the primary: a lagging replica would leave fresh links out of the filter
+    with Session(engine) as session:
+        tag_filter.rebuild(session)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Starting up...")
     print("Initializing database...")
     create_db_and_tables()
 
+    # Counter rows must exist before seeding so the seed's deltas land on them
+    reconcile_dashboard_counters()
+
     with Session(engine) as session:
         create_initial_admin(session)
         seed_initial_students(session)
 
+    reconcile_task = start_periodic(
+        "reconcile-dashboard-counters",
+        settings.COUNTER_RECONCILE_INTERVAL_SECONDS,
+        reconcile_dashboard_counters,
+    )
+
+    filter_task = None
+    if settings.TAG_FILTER_ENABLED:
+        rebuild_tag_filter()
+        filter_task = start_periodic(
+            "rebuild-tag-filter",
+            settings.TAG_FILTER_REBUILD_INTERVAL_SECONDS,
+            rebuild_tag_filter,
+        )
+
+    # Jobs left running by a worker that died are picked up again, here or by another worker
+    requeue_stale_jobs()
+    job_runner.start()
+    stale_jobs_task = start_periodic(
+        "requeue-stale-jobs",
+        settings.JOB_STALE_SECONDS,
+        requeue_stale_jobs,
+    )
+
+    print(f"Startup complete {startup_clock.mark('lifespan'):.2f}s after process start.")
     yield
     print("Shutting down...")
+    reconcile_task.cancel()
+    if filter_task is not None:
+        filter_task.cancel()
+    stale_jobs_task.cancel()
+    await job_runner.drain(settings.JOB_DRAIN_SECONDS)
 
 app = FastAPI(
     title="Undergraduate Clearance System API",
     description="A comprehensive API for managing student clearance processes with RFID authentication.",
     version="2.1.0",
     lifespan=lifespan,
+    default_response_class=FastJSONResponse if settings.FAST_JSON else JSONResponse,
     docs_url="/docs",
     redoc_url="/redoc",
 )
 
+# Added before CORS so that 429 responses still carry CORS headers
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -202,10 +262,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Inside the metrics middleware, whose per-request query counts it checks
+if settings.METRICS_ENABLED and settings.QUERY_BUDGETS_ENABLED:
+    app.add_middleware(QueryBudgetMiddleware)
+
+# Outermost, so rejected and failed requests are measured too
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# Outermost of all; after the first request it only passes requests through
+app.add_middleware(FirstRequestTimerMiddleware)
+
 print("Including API routers...")
 app.include_router(admin.router)
+app.include_router(analytics.router)
 app.include_router(clearance.router)
 app.include_router(devices.router)
+app.include_router(jobs.router)
+app.include_router(rfid.router)
 app.include_router(students.router)
 app.include_router(token.router)
 app.include_router(users.router)
@@ -225,6 +299,15 @@ async def health_check():
         "version": app.version,
     }
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", summary="Prometheus Metrics", tags=["System"], include_in_schema=False)
+    def prometheus_metrics():
+        return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+startup_clock.mark("imports")
+
 if __name__ == "__main__":
+    import uvicorn
+
     print("Starting Uvicorn server for development...")
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,232 @@
+"""
+Columnar clearance analytics.
+
+Loads every `ClearanceStatus` row into a compact int8 matrix of
+students x clearance departments, alongside a vector of each student's
+academic `Department` code. Cross-tabs, completion curves and
+"blocked only by X" filters are then plain vectorised NumPy over that
+matrix instead of per-student Python loops.
+
+The matrix refreshes incrementally: each student's `version` (bumped on
+every clearance, profile or tag change) is compared with the loaded copy,
+and only students that changed, appeared or disappeared are re-read.
+"""
+import csv
+import io
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlmodel import Session, select
+
+from src.models import ClearanceDepartment, ClearanceStatus, ClearanceStatusEnum, Department, Student
+
+# Cell codes in the status matrix. MISSING marks a department with no clearance row.
+MISSING = -1
+STATUS_CODES: Dict[ClearanceStatusEnum, int] = {
+    ClearanceStatusEnum.PENDING: 0,
+    ClearanceStatusEnum.APPROVED: 1,
+    ClearanceStatusEnum.REJECTED: 2,
+}
+STATUSES: List[ClearanceStatusEnum] = list(STATUS_CODES)
+APPROVED = STATUS_CODES[ClearanceStatusEnum.APPROVED]
+REJECTED = STATUS_CODES[ClearanceStatusEnum.REJECTED]
+
+CLEARANCE_DEPARTMENTS: List[ClearanceDepartment] = list(ClearanceDepartment)
+STUDENT_DEPARTMENTS: List[Department] = list(Department)
+_CLEARANCE_DEPT_INDEX = {dept: i for i, dept in enumerate(CLEARANCE_DEPARTMENTS)}
+_STUDENT_DEPT_CODES = {dept: i for i, dept in enumerate(STUDENT_DEPARTMENTS)}
+
+OVERALL_STATES = ["not_started", "rejected", "fully_cleared", "partially_cleared", "pending"]
+
+# Above this share of changed students a full reload is cheaper than a partial one.
+_FULL_RELOAD_RATIO = 0.5
+# Keeps IN (...) lists well under driver parameter limits.
+_ID_CHUNK_SIZE = 1000
+
+
+class ClearanceMatrix:
+    """
+    Immutable snapshot of clearance state as NumPy arrays, sorted by student id.
+
+    - `student_ids`: int64 vector of student primary keys
+    - `versions`: int64 vector of the student versions the rows were loaded at
+    - `departments`: int8 vector of academic `Department` codes (see STUDENT_DEPARTMENTS)
+    - `statuses`: int8 matrix, one column per CLEARANCE_DEPARTMENTS entry (see STATUS_CODES)
+    """
+
+    def __init__(self, student_ids: Optional[np.ndarray] = None, versions: Optional[np.ndarray] = None,
+                 departments: Optional[np.ndarray] = None, statuses: Optional[np.ndarray] = None,
+                 reloaded: int = 0):
+        self.student_ids = student_ids if student_ids is not None else np.empty(0, dtype=np.int64)
+        self.versions = versions if versions is not None else np.empty(0, dtype=np.int64)
+        self.departments = departments if departments is not None else np.empty(0, dtype=np.int8)
+        self.statuses = statuses if statuses is not None else np.empty(
+            (0, len(CLEARANCE_DEPARTMENTS)), dtype=np.int8)
+        # Number of students re-read from the database when this snapshot was built
+        self.reloaded = reloaded
+
+    def __len__(self) -> int:
+        return len(self.student_ids)
+
+    # --- Loading ---
+
+    def refreshed(self, db: Session) -> "ClearanceMatrix":
+        """
+        Returns a new snapshot that is up to date with the database, reusing
+        this snapshot's rows for students whose version hasn't changed.
+        """
+        rows = db.exec(select(Student.id, Student.department, Student.version).order_by(
+            Student.id)).all()  # type:ignore
+        ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        versions = np.fromiter((r[2] for r in rows), dtype=np.int64, count=len(rows))
+        departments = np.fromiter(
+            (_STUDENT_DEPT_CODES[r[1]] for r in rows), dtype=np.int8, count=len(rows))
+        statuses = np.full((len(rows), len(CLEARANCE_DEPARTMENTS)), MISSING, dtype=np.int8)
+
+        unchanged = np.zeros(len(rows), dtype=bool)
+        if len(self.student_ids) and len(ids):
+            pos = np.minimum(np.searchsorted(self.student_ids, ids), len(self.student_ids) - 1)
+            unchanged = (self.student_ids[pos] == ids) & (self.versions[pos] == versions)
+            statuses[unchanged] = self.statuses[pos[unchanged]]
+
+        stale_ids = ids[~unchanged]
+        if len(stale_ids) > _FULL_RELOAD_RATIO * max(len(ids), 1):
+            self._fill_statuses(db, ids, statuses, None)
+        elif len(stale_ids):
+            self._fill_statuses(db, ids, statuses, stale_ids)
+
+        return ClearanceMatrix(ids, versions, departments, statuses, reloaded=len(stale_ids))
+
+    @staticmethod
+    def _fill_statuses(db: Session, ids: np.ndarray, statuses: np.ndarray,
+                       only_ids: Optional[np.ndarray]) -> None:
+        """Writes clearance rows into `statuses`, for all students or just `only_ids`."""
+        columns = (ClearanceStatus.student_id, ClearanceStatus.department, ClearanceStatus.status)
+        if only_ids is None:
+            batches = [db.exec(select(*columns)).all()]
+        else:
+            batches = [
+                db.exec(select(*columns).where(
+                    ClearanceStatus.student_id.in_(chunk.tolist()))).all()  # type:ignore
+                for chunk in np.array_split(only_ids, max(1, -(-len(only_ids) // _ID_CHUNK_SIZE)))
+            ]
+        for batch in batches:
+            if not batch:
+                continue
+            student_ids = np.fromiter((r[0] for r in batch), dtype=np.int64, count=len(batch))
+            cols = np.fromiter((_CLEARANCE_DEPT_INDEX[r[1]] for r in batch),
+                               dtype=np.intp, count=len(batch))
+            codes = np.fromiter((STATUS_CODES[r[2]] for r in batch), dtype=np.int8, count=len(batch))
+            rows = np.searchsorted(ids, student_ids)
+            # Rows for students created after the id scan above are simply skipped.
+            valid = (rows < len(ids)) & (ids[np.minimum(rows, len(ids) - 1)] == student_ids)
+            statuses[rows[valid], cols[valid]] = codes[valid]
+
+    # --- Per-student vectors ---
+
+    def approved_counts(self) -> np.ndarray:
+        return (self.statuses == APPROVED).sum(axis=1)
+
+    def overall_states(self) -> np.ndarray:
+        """
+        Index into OVERALL_STATES for every student, using the same rules as
+        the /clearance summary endpoints (departments without a row are ignored).
+        """
+        present = (self.statuses != MISSING).sum(axis=1)
+        approved = self.approved_counts()
+        rejected = (self.statuses == REJECTED).any(axis=1)
+        return np.select(
+            [present == 0, rejected, approved == present, approved > 0],
+            [0, 1, 2, 3],
+            default=4,
+        ).astype(np.int8)
+
+    # --- Aggregates ---
+
+    def crosstab(self) -> np.ndarray:
+        """
+        Counts of shape (student departments, clearance departments, statuses):
+        how many students of each academic department hold each status in each
+        clearance department.
+        """
+        n_cd, n_st = len(CLEARANCE_DEPARTMENTS), len(STATUSES)
+        index = (self.departments.astype(np.intp)[:, None] * n_cd
+                 + np.arange(n_cd)[None, :]) * n_st + self.statuses
+        present = self.statuses != MISSING
+        counts = np.bincount(index[present], minlength=len(STUDENT_DEPARTMENTS) * n_cd * n_st)
+        return counts.reshape(len(STUDENT_DEPARTMENTS), n_cd, n_st)
+
+    def completion_curve(self) -> np.ndarray:
+        """
+        Shape (student departments, clearance departments + 1): entry [d, k] is
+        the number of students in department d with at least k approvals.
+        """
+        width = len(CLEARANCE_DEPARTMENTS) + 1
+        index = self.departments.astype(np.intp) * width + self.approved_counts()
+        exact = np.bincount(index, minlength=len(STUDENT_DEPARTMENTS) * width).reshape(-1, width)
+        return np.cumsum(exact[:, ::-1], axis=1)[:, ::-1]
+
+    def overall_counts(self) -> Dict[str, int]:
+        counts = np.bincount(self.overall_states(), minlength=len(OVERALL_STATES))
+        return {state: int(n) for state, n in zip(OVERALL_STATES, counts)}
+
+    def blocked_only_by(self, department: ClearanceDepartment) -> np.ndarray:
+        """Ids of students approved everywhere except `department`."""
+        col = _CLEARANCE_DEPT_INDEX[department]
+        others = np.delete(self.statuses, col, axis=1)
+        mask = (others == APPROVED).all(axis=1) & (self.statuses[:, col] != APPROVED) & (
+            self.statuses[:, col] != MISSING)
+        return self.student_ids[mask]
+
+    # --- Export ---
+
+    def to_csv(self) -> str:
+        """One row per student: id, academic department, then one status column per clearance department."""
+        labels = np.array([s.value for s in STATUSES] + [""], dtype=object)  # MISSING (-1) -> ""
+        dept_labels = np.array([d.value for d in STUDENT_DEPARTMENTS], dtype=object)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["student_id", "department"] + [d.value for d in CLEARANCE_DEPARTMENTS])
+        writer.writerows(zip(
+            self.student_ids.tolist(),
+            dept_labels[self.departments].tolist(),
+            *(labels[self.statuses[:, i]].tolist() for i in range(len(CLEARANCE_DEPARTMENTS))),
+        ))
+        return buffer.getvalue()
+
+    def to_arrow(self):
+        """
+        Returns a `pyarrow.Table` with dictionary-encoded columns built from the
+        int8 codes without copying. Requires the optional `pyarrow` package.
+        """
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise RuntimeError("Arrow export requires the 'pyarrow' package.") from e
+
+        def dictionary(codes: np.ndarray, names: Sequence[str]):
+            return pa.DictionaryArray.from_arrays(
+                pa.array(codes, mask=codes == MISSING), pa.array(list(names)))
+
+        columns = {
+            "student_id": pa.array(self.student_ids),
+            "department": dictionary(self.departments, [d.value for d in STUDENT_DEPARTMENTS]),
+        }
+        for i, dept in enumerate(CLEARANCE_DEPARTMENTS):
+            columns[dept.value] = dictionary(
+                np.ascontiguousarray(self.statuses[:, i]), [s.value for s in STATUSES])
+        return pa.table(columns)
+
+
+# Process-wide snapshot shared by the analytics endpoints.
+_current_matrix = ClearanceMatrix()
+_refresh_lock = threading.Lock()
+
+
+def get_clearance_matrix(db: Session) -> ClearanceMatrix:
+    """Refreshes the shared snapshot incrementally and returns it."""
+    global _current_matrix
+    with _refresh_lock:
+        _current_matrix = _current_matrix.refreshed(db)
+        return _current_matrix
@@ -1,9 +1,9 @@
 from fastapi import Depends, HTTPException, status, Security, Request
 from fastapi.security import APIKeyHeader, OAuth2PasswordBearer, HTTPBearer
-from jose import JWTError, jwt
 from sqlmodel import Session, select
-from typing import List, Optional, Union
+from typing import Callable, List, Optional, Tuple, Union
 from datetime import datetime, timedelta
+from functools import lru_cache
 
 from src.config import settings
 from src.database import get_session
@@ -11,6 +11,8 @@ from src.crud import users as user_crud
 from src.crud import devices as device_crud
 from src.models import User, Role, Device
 from src.crud.utils import verify_password, hash_password
+from src.tokens import decode_access_token, encode_access_token
+from src.rate_limit import verified_api_keys
 
 # --- Configuration ---
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -24,8 +26,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+    return encode_access_token(to_encode)
 
 # --- User Authentication ---
 def authenticate_user(db: Session, username: str, password: str):
@@ -55,27 +56,75 @@ def authenticate_user(db: Session, username: str, password: str):
 #     return db_device
 
 
+# --- Per-request principal ---
+# Several dependencies of one request (router-level and endpoint-level checks,
+# require_super_admin, ...) need the caller. The resolved user or device is kept
+# in request.state, so each request decodes its token and looks the caller up
+# at most once; role checks then run against the cached principal.
+
+
+def _request_state(request: Request) -> dict:
+    return request.scope.setdefault("state", {})
+
+
+def resolve_current_user(
+    request: Request, token: str, db: Session, lookup: Callable[..., Optional[User]] = user_crud.get_user_by_username
+) -> Optional[User]:
+    """
+    The user a bearer token belongs to, or None if the token is invalid or the user is gone.
+    `lookup(db, username=...)` loads the user, so a route can eager-load what it needs
+    in the same query.
+    """
+    if "current_user" in _request_state(request):
+        return _request_state(request)["current_user"]
+    payload = decode_access_token(token, _request_state(request))
+    username: str | None = payload.get("sub") if payload else None
+    user = lookup(db, username=username) if username else None
+    _request_state(request)["current_user"] = user
+    return user
+
+
+def resolve_active_device(request: Request, api_key: str, db: Session) -> Optional[Device]:
+    """The active device registered under an API key, or None."""
+    cached = _request_state(request).get("current_device")
+    if cached is not None and cached[0] == api_key:
+        return cached[1]
+    device = device_crud.get_device_by_api_key(db, api_key=api_key)
+    if device is not None and not device.is_active:
+        device = None
+    # Lets the rate limiter give this key its own bucket from now on
+    if device is not None:
+        verified_api_keys.add(api_key)
+    else:
+        verified_api_keys.discard(api_key)
+    _request_state(request)["current_device"] = (api_key, device)
+    return device
+
+
 # --- Dependency for User Authentication and Authorization ---
+def _role_key(required_roles: List[Role] | None) -> Tuple[Role, ...]:
+    return tuple(sorted(set(required_roles or ()), key=lambda role: role.value))
+
+
 def get_current_active_user(required_roles: List[Role]|None = None):
+    """
+    Returns the dependency for the given roles. Equal role sets, in any order,
+    share one dependency object, so FastAPI also runs identical declarations only once.
+    """
+    return _active_user_dependency(_role_key(required_roles))
+
+
+@lru_cache(maxsize=None)
+def _active_user_dependency(required_roles: Tuple[Role, ...]):
     def dependency(
-        token: str = Depends(oauth2_scheme), db: Session = Depends(get_session)
+        request: Request, token: str = Depends(oauth2_scheme), db: Session = Depends(get_session)
     ) -> User:
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-        try:
-            payload = jwt.decode(
-                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-            )
-            username: str|None = payload.get("sub")
-            if username is None:
-                raise credentials_exception
-        except JWTError:
-            raise credentials_exception
-
-        user = user_crud.get_user_by_username(db, username=username)
+        user = resolve_current_user(request, token, db)
         if user is None:
             raise credentials_exception
 
@@ -91,16 +140,33 @@ def get_current_active_user(required_roles: List[Role]|None = None):
 
     return dependency
 
-async def get_api_key(api_key: str = Security(api_key_header), db: Session = Depends(get_session)):
-    """Validate device API key."""
+def get_current_user_with_clearance(
+    request: Request, token: str = Depends(oauth2_scheme), db: Session = Depends(get_session)
+) -> User:
+    """
+    The caller with their student record and its clearance rows already loaded,
+    for /students/me/clearance. Only works as the request's first user lookup,
+    so that route must not also sit behind a router-level user dependency.
+    """
+    user = resolve_current_user(request, token, db, lookup=user_crud.get_user_with_clearance_by_username)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+def get_api_key(request: Request, api_key: str = Security(api_key_header), db: Session = Depends(get_session)):
+    """Validate device API key. Sync, so the DB lookup runs in the threadpool rather than on the event loop."""
     if not api_key:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="API key required"
         )
     
-    device = device_crud.get_device_by_api_key(db, api_key=api_key)
-    if not device or not device.is_active:
+    device = resolve_active_device(request, api_key, db)
+    if not device:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or inactive API key"
@@ -139,6 +205,11 @@ def get_current_user_or_device(required_roles: List[Role] | None = None):
     Flexible authentication that accepts either JWT token or API key.
     Useful for endpoints that need to work with both web users and devices.
     """
+    return _user_or_device_dependency(_role_key(required_roles))
+
+
+@lru_cache(maxsize=None)
+def _user_or_device_dependency(required_roles: Tuple[Role, ...]):
     def dependency(
         request: Request,
         db: Session = Depends(get_session)
@@ -147,8 +218,8 @@ def get_current_user_or_device(required_roles: List[Role] | None = None):
         # Check for API key first (x-api-key header)
         api_key = request.headers.get("x-api-key")
         if api_key:
-            device = device_crud.get_device_by_api_key(db, api_key=api_key)
-            if device and device.is_active:
+            device = resolve_active_device(request, api_key, db)
+            if device:
                 return AuthenticatedEntity(device=device, api_key=api_key)
             else:
                 raise HTTPException(
@@ -160,39 +231,22 @@ def get_current_user_or_device(required_roles: List[Role] | None = None):
         auth_header = request.headers.get("authorization")
         if auth_header and auth_header.startswith("Bearer "):
             token = auth_header.split(" ")[1]
-            try:
-                payload = jwt.decode(
-                    token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-                )
-                username: str | None = payload.get("sub")
-                if username is None:
-                    raise HTTPException(
-                        status_code=status.HTTP_401_UNAUTHORIZED,
-                        detail="Could not validate credentials"
-                    )
-                
-                user = user_crud.get_user_by_username(db, username=username)
-                if user is None:
-                    raise HTTPException(
-                        status_code=status.HTTP_401_UNAUTHORIZED,
-                        detail="User not found"
-                    )
-                
-                # Check for roles if required
-                entity = AuthenticatedEntity(user=user)
-                if required_roles and not entity.has_role(required_roles):
-                    raise HTTPException(
-                        status_code=status.HTTP_403_FORBIDDEN,
-                        detail="The user does not have adequate privileges"
-                    )
-                
-                return entity
-                
-            except JWTError:
+            user = resolve_current_user(request, token, db)
+            if user is None:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Could not validate credentials"
                 )
+
+            # Check for roles if required
+            entity = AuthenticatedEntity(user=user)
+            if required_roles and not entity.has_role(list(required_roles)):
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="The user does not have adequate privileges"
+                )
+
+            return entity
         
         # No valid authentication found
         raise HTTPException(
@@ -0,0 +1,25 @@
+"""
+Minimal periodic task support for work started from the app's lifespan.
+"""
+import asyncio
+from typing import Callable
+
+from fastapi.concurrency import run_in_threadpool
+
+
+async def run_periodically(name: str, interval_seconds: float, job: Callable[[], None]):
+    """
+    Runs a blocking `job` in the threadpool every `interval_seconds` until cancelled.
+    Failures are logged and retried on the next tick rather than stopping the loop.
+    """
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await run_in_threadpool(job)
+        except Exception as e:
+            print(f"Error during periodic job '{name}': {e}")
+
+
+def start_periodic(name: str, interval_seconds: float, job: Callable[[], None]) -> asyncio.Task:
+    """Schedules `run_periodically` on the running loop. Cancel the task on shutdown."""
+    return asyncio.create_task(run_periodically(name, interval_seconds, job), name=name)
@@ -0,0 +1,158 @@
+"""
+Archival of closed academic sessions.
+
+Every session adds a cohort of students and their clearance rows, and the
+live tables used to keep all of them. `archive_session` moves a closed
+session's students into the cold `student_archive` and `clearancestatus_archive`
+tables with set-based INSERT ... SELECT and DELETE statements, one transaction
+per ARCHIVE_BATCH_SIZE students, so the live tables and their indexes only
+hold open sessions. On PostgreSQL each archived session gets its own
+partition of clearancestatus_archive.
+
+Archived students' RFID tags are freed for reuse (the tag id is kept on the
+archive row). Their logins are kept but no longer linked to a record.
+"""
+import re
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, literal, text, update
+from sqlmodel import Session, select
+
+from src.config import settings
+from src.crud.counters import reconcile_counters
+from src.crud.utils import unit_of_work
+from src.models import ClearanceStatus, ClearanceStatusArchive, RFIDTag, Student, StudentArchive, User
+from src.tag_filter import tag_filter
+
+SESSION_FORMAT = r"^\d{4}/\d{4}$"
+
+
+class ArchiveError(Exception):
+    """Raised when a session can't be archived (the current one, or a malformed name)."""
+
+
+def archive_partition_name(academic_session: str) -> str:
+    return "clearancestatus_archive_" + academic_session.replace("/", "_")
+
+
+def ensure_archive_partition(db: Session, academic_session: str):
+    """Creates the session's clearancestatus_archive partition on PostgreSQL; a no-op elsewhere."""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    # academic_session has been checked against SESSION_FORMAT, so it is safe to inline
+    db.connection().execute(text(
+        f'CREATE TABLE IF NOT EXISTS "{archive_partition_name(academic_session)}" '
+        f"PARTITION OF clearancestatus_archive FOR VALUES IN ('{academic_session}')"
+    ))
+
+
+def list_sessions(db: Session) -> List[Dict]:
+    """Every session with live or archived students, newest first, with both counts."""
+    live = dict(db.exec(
+        select(Student.academic_session, func.count()).group_by(Student.academic_session)).all())
+    archived = dict(db.exec(
+        select(StudentArchive.academic_session, func.count()).group_by(StudentArchive.academic_session)).all())
+    return [
+        {
+            "academic_session": name,
+            "current": name == settings.CURRENT_ACADEMIC_SESSION,
+            "live_students": live.get(name, 0),
+            "archived_students": archived.get(name, 0),
+        }
+        for name in sorted(set(live) | set(archived), reverse=True)
+    ]
+
+
+def check_archivable(academic_session: str):
+    """Raises ArchiveError unless `academic_session` is a well-formed session other than the current one."""
+    if not re.match(SESSION_FORMAT, academic_session):
+        raise ArchiveError(f"'{academic_session}' is not an academic session like '2023/2024'.")
+    if academic_session == settings.CURRENT_ACADEMIC_SESSION:
+        raise ArchiveError(f"{academic_session} is the current session and can't be archived.")
+
+
+def _archive_batch(db: Session, academic_session: str, batch_size: int) -> Dict[str, int]:
+    """Moves up to `batch_size` of the session's students in one transaction."""
+    with unit_of_work(db):
+        # Locked so a late edit can't land between the copy and the delete
+        student_ids = list(db.exec(
+            select(Student.id)
+            .where(Student.academic_session == academic_session)
+            .order_by(Student.id)
+            .limit(batch_size)
+            .with_for_update()
+        ).all())
+        if not student_ids:
+            return {"students": 0, "clearance_rows": 0, "tags": 0}
+
+        archived_at = datetime.now(timezone.utc)
+        copied = db.exec(insert(ClearanceStatusArchive).from_select(
+            ["id", "academic_session", "department", "status", "remarks", "student_id", "version"],
+            select(
+                ClearanceStatus.id, literal(academic_session), ClearanceStatus.department,
+                ClearanceStatus.status, ClearanceStatus.remarks, ClearanceStatus.student_id,
+                ClearanceStatus.version,
+            ).where(ClearanceStatus.student_id.in_(student_ids)),  # type:ignore
+        ))
+        db.exec(insert(StudentArchive).from_select(
+            ["id", "full_name", "matric_no", "email", "department", "version", "academic_session",
+             "tag_id", "archived_at"],
+            select(
+                Student.id, Student.full_name, Student.matric_no, Student.email, Student.department,
+                Student.version, Student.academic_session, RFIDTag.tag_id, literal(archived_at),
+            )
+            .select_from(Student)
+            .outerjoin(RFIDTag, RFIDTag.student_id == Student.id)  # type:ignore
+            .where(Student.id.in_(student_ids)),  # type:ignore
+        ))
+
+        tag_ids = list(db.exec(select(RFIDTag.tag_id).where(RFIDTag.student_id.in_(student_ids))).all())  # type:ignore
+        db.exec(update(User).where(User.student_id.in_(student_ids))  # type:ignore
+                .values(student_id=None).execution_options(synchronize_session=False))
+        for model, column in ((RFIDTag, RFIDTag.student_id), (ClearanceStatus, ClearanceStatus.student_id),
+                              (Student, Student.id)):
+            db.exec(delete(model).where(column.in_(student_ids))  # type:ignore
+                    .execution_options(synchronize_session=False))
+
+    for tag_id in tag_ids:
+        tag_filter.discard(tag_id)
+    return {"students": len(student_ids), "clearance_rows": copied.rowcount, "tags": len(tag_ids)}
+
+
+def archive_session(
+    db: Session,
+    academic_session: str,
+    batch_size: Optional[int] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict:
+    """
+    Moves every student of a closed session, with their clearance rows, to the
+    archive tables. Safe to re-run: an interrupted run leaves whole batches
+    archived and picks up with the rest. `progress(moved, total)` is called
+    after each batch. Returns what was moved.
+    """
+    check_archivable(academic_session)
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+
+    ensure_archive_partition(db, academic_session)
+    db.commit()
+
+    total = db.exec(
+        select(func.count(Student.id)).where(Student.academic_session == academic_session)).one()  # type:ignore
+    totals = {"students": 0, "clearance_rows": 0, "tags": 0}
+    while True:
+        moved = _archive_batch(db, academic_session, batch_size)
+        if not moved["students"]:
+            break
+        for name, count in moved.items():
+            totals[name] += count
+        if progress is not None:
+            progress(totals["students"], max(total, totals["students"]))
+
+    if totals["students"]:
+        # The dashboard counters describe the live tables only
+        reconcile_counters(db)
+        print(f"Archived {totals['students']} students ({totals['clearance_rows']} clearance rows, "
+              f"{totals['tags']} tags freed) of the {academic_session} session.")
+    return {"academic_session": academic_session, **totals}
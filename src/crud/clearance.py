@@ -1,6 +1,29 @@
 from sqlmodel import Session, select
-from typing import List, Optional
-from src.models import ClearanceStatus, Student, ClearanceUpdate, ClearanceStatusEnum
+from sqlalchemy import bindparam, or_, update
+from sqlalchemy.orm import joinedload
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Sequence, Tuple
+from src.config import settings
+from src.models import ClearanceStatus, Student, ClearanceUpdate, ClearanceStatusEnum, ClearanceDepartment
+from src.crud.students import bump_student_version
+from src.crud.counters import apply_counter_deltas, merge_deltas, student_counter_deltas
+
+class ClearanceConflictError(Exception):
+    """
+    Raised when an update would clobber another staff member's work.
+    Carries the current record so the router can report its state.
+    """
+    def __init__(self, message: str, record: ClearanceStatus):
+        super().__init__(message)
+        self.record = record
+
+
+def _is_claimable(now: datetime):
+    return or_(
+        ClearanceStatus.claimed_by == None,  # noqa: E711
+        ClearanceStatus.claim_expires_at < now,  # type:ignore
+    )
+
 
 def get_clearance_status_for_student(db: Session, student: Student) -> List[ClearanceStatus]:
     """
@@ -8,37 +31,211 @@ def get_clearance_status_for_student(db: Session, student: Student) -> List[Clea
     """
     return student.clearance_statuses
 
-def update_clearance_status(db: Session, update_data: ClearanceUpdate) -> ClearanceStatus | None:
+def get_work_queue(
+    db: Session,
+    department: ClearanceDepartment,
+    statuses: Sequence[ClearanceStatusEnum],
+    after_id: Optional[int] = None,
+    limit: int = 50,
+) -> List[Tuple[ClearanceStatus, Student]]:
+    """
+    Returns a department's clearance items in the given statuses, oldest first,
+    together with their students. Uses keyset pagination on the clearance id:
+    pass the last id of the previous page as `after_id`.
+    Only the current academic session is served, from the
+    (academic_session, department, status, id) index.
+    """
+    statement = (
+        select(ClearanceStatus, Student)
+        .join(Student, Student.id == ClearanceStatus.student_id)  # type:ignore
+        .where(
+            ClearanceStatus.academic_session == settings.CURRENT_ACADEMIC_SESSION,
+            ClearanceStatus.department == department,
+            ClearanceStatus.status.in_(list(statuses)),  # type:ignore
+        )
+        .order_by(ClearanceStatus.id)
+        .limit(limit)
+    )
+    if after_id is not None:
+        statement = statement.where(ClearanceStatus.id > after_id)
+    return list(db.exec(statement).all())
+
+# Rounds a claim may lose entirely to another desk before giving up (SQLite only)
+_CLAIM_ATTEMPTS = 3
+
+
+def claim_work_items(
+    db: Session,
+    department: ClearanceDepartment,
+    user_id: int,
+    count: int,
+    lease_seconds: int,
+) -> List[Tuple[ClearanceStatus, Student]]:
+    """
+    Leases up to `count` of the oldest unclaimed pending items of the current
+    academic session in a department to a user.
+
+    On PostgreSQL candidate rows are picked with FOR UPDATE SKIP LOCKED, so
+    concurrent desks never wait on or receive each other's rows. Expired leases
+    count as unclaimed, so abandoned items return to the pool on their own.
+    """
+    for _ in range(_CLAIM_ATTEMPTS):
+        now = datetime.now(timezone.utc)
+        candidates = db.exec(
+            select(ClearanceStatus.id)
+            .where(
+                ClearanceStatus.academic_session == settings.CURRENT_ACADEMIC_SESSION,
+                ClearanceStatus.department == department,
+                ClearanceStatus.status == ClearanceStatusEnum.PENDING,
+                _is_claimable(now),
+            )
+            .order_by(ClearanceStatus.id)
+            .limit(count)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not candidates:
+            return []
+
+        expires_at = now + timedelta(seconds=lease_seconds)
+        # The claimable condition is repeated so backends without row locks
+        # (SQLite) still can't hand the same row to two desks. RETURNING reports
+        # the rows this UPDATE actually won.
+        claimed = list(db.exec(
+            update(ClearanceStatus)
+            .where(ClearanceStatus.id.in_(candidates), _is_claimable(now))  # type:ignore
+            .values(claimed_by=user_id, claim_expires_at=expires_at)
+            .returning(ClearanceStatus.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all())
+        db.commit()
+        if claimed:
+            break
+        # Another desk took every candidate first (no SKIP LOCKED); pick again
+    else:
+        return []
+
+    return list(db.exec(
+        select(ClearanceStatus, Student)
+        .join(Student, Student.id == ClearanceStatus.student_id)  # type:ignore
+        .where(ClearanceStatus.id.in_(claimed))  # type:ignore
+        .order_by(ClearanceStatus.id)
+        .execution_options(populate_existing=True)
+    ).all())
+
+
+def release_work_items(db: Session, clearance_ids: Sequence[int], user_id: int) -> int:
+    """Releases the user's leases on the given items. Returns how many were released."""
+    if not clearance_ids:
+        return 0
+    result = db.exec(
+        update(ClearanceStatus)
+        .where(
+            ClearanceStatus.id.in_(list(clearance_ids)),  # type:ignore
+            ClearanceStatus.claimed_by == user_id,
+        )
+        .values(claimed_by=None, claim_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+# Attempts for updates without a version precondition that lose a race to another writer
+_UPDATE_ATTEMPTS = 3
+
+# The student with every clearance row: the record to change and the rows the
+# dashboard counter deltas are computed from, in one round trip
+STUDENT_WITH_STATUSES_BY_MATRIC_NO = (
+    select(Student)
+    .where(Student.matric_no == bindparam("matric_no"))
+    .options(joinedload(Student.clearance_statuses))  # type:ignore
+)
+
+
+def update_clearance_status(
+    db: Session, update_data: ClearanceUpdate, acting_user_id: Optional[int] = None
+) -> ClearanceStatus | None:
     """
     Updates the clearance status for a specific student and department.
+
+    The write is a conditional UPDATE on the record's version. If `update_data.version`
+    is given and doesn't match, ClearanceConflictError is raised instead of
+    overwriting. Without it, a lost race is retried, so the last writer still wins.
+    The check adds no round trip: the student and all their clearance rows are
+    read in one query, and a retry re-reads only the clearance rows.
+
+    Also raises ClearanceConflictError if another user holds an unexpired lease on
+    the item. A successful update by the lease holder releases the lease.
     """
-    # Find the student first
-    student_statement = select(Student).where(Student.matric_no == update_data.matric_no)
-    student = db.exec(student_statement).first()
+    student = db.exec(
+        STUDENT_WITH_STATUSES_BY_MATRIC_NO, params={"matric_no": update_data.matric_no}).unique().first()
     if not student:
         return None # Student not found
+    student_id = student.id
 
-    # Now find the specific clearance status record for that student
-    status_statement = select(ClearanceStatus).where(
-        ClearanceStatus.student_id == student.id,
-        ClearanceStatus.department == update_data.department
-    )
-    clearance_record = db.exec(status_statement).first()
-
-    if not clearance_record:
-        # This case should ideally not happen if students are created correctly
-        return None 
-
-    # Update the status and remarks
-    clearance_record.status = update_data.status
-    if update_data.remarks is not None:
-        clearance_record.remarks = update_data.remarks
-    
-    db.add(clearance_record)
-    db.commit()
-    db.refresh(clearance_record)
+    for attempt in range(_UPDATE_ATTEMPTS):
+        if attempt:
+            # The rollback after the lost race expired the rows; reload just them
+            db.refresh(student, ["clearance_statuses"])
+        clearance_record = next(
+            (record for record in student.clearance_statuses if record.department == update_data.department), None)
+        if not clearance_record:
+            # This case should ideally not happen if students are created correctly
+            return None
+
+        if update_data.version is not None and clearance_record.version != update_data.version:
+            raise ClearanceConflictError(
+                f"This clearance item was changed by someone else (you sent version "
+                f"{update_data.version}, current version is {clearance_record.version}).",
+                clearance_record)
+
+        now = datetime.now(timezone.utc)
+        if (clearance_record.claimed_by is not None
+                and clearance_record.claimed_by != acting_user_id
+                and clearance_record.claim_expires_at is not None
+                and clearance_record.claim_expires_at > now):
+            raise ClearanceConflictError(
+                "This clearance item is currently claimed by another staff member.", clearance_record)
+
+        # Update the status and remarks, moving the dashboard counters along with it.
+        # "evaluate" applies the new values to the loaded objects without a reload.
+        counters_before = student_counter_deltas(student.clearance_statuses, sign=-1)
+        values = {
+            "status": update_data.status,
+            "version": ClearanceStatus.version + 1,
+            "claimed_by": None,
+            "claim_expires_at": None,
+        }
+        if update_data.remarks is not None:
+            values["remarks"] = update_data.remarks
+        result = db.exec(
+            update(ClearanceStatus)
+            .where(
+                ClearanceStatus.id == clearance_record.id,
+                ClearanceStatus.version == clearance_record.version,
+            )
+            .values(**values)
+            .execution_options(synchronize_session="evaluate")
+        )
+        if result.rowcount == 0:
+            # Someone else wrote between our read and our write
+            db.rollback()
+            if update_data.version is not None:
+                db.refresh(clearance_record)
+                raise ClearanceConflictError(
+                    "This clearance item was changed by someone else while saving.", clearance_record)
+            continue
+
+        bump_student_version(db, student_id)  # type:ignore
+        apply_counter_deltas(db, merge_deltas(
+            counters_before, student_counter_deltas(student.clearance_statuses)))
+        # No refresh needed: the UPDATE's new values were applied to clearance_record above
+        db.commit()
+
+        return clearance_record
 
-    return clearance_record
+    raise ClearanceConflictError(
+        "This clearance item is being changed concurrently, please retry.", clearance_record)
 
 
 def is_student_fully_cleared(db: Session, matric_no: str) -> bool:
@@ -0,0 +1,151 @@
+from sqlmodel import Session, select
+from sqlalchemy import case, func, update
+from typing import Dict, Iterable
+
+from src.models import (
+    ClearanceCounter, ClearanceDepartment, ClearanceStatus, ClearanceStatusEnum, Student
+)
+
+TOTAL_STUDENTS = "total_students"
+OVERALL_STATES = ["fully_cleared", "partially_cleared", "pending", "rejected", "not_started"]
+
+
+def overall_counter(state: str) -> str:
+    return f"overall:{state}"
+
+
+def department_counter(department: ClearanceDepartment, status: ClearanceStatusEnum) -> str:
+    return f"department:{department.value}:{status.value}"
+
+
+ALL_COUNTERS = [TOTAL_STUDENTS] + [overall_counter(s) for s in OVERALL_STATES] + [
+    department_counter(d, s) for d in ClearanceDepartment for s in ClearanceStatusEnum
+]
+
+
+def overall_state(statuses: Iterable[ClearanceStatusEnum]) -> str:
+    """Overall clearance state of a student, using the same rules as the dashboard endpoints."""
+    statuses = list(statuses)
+    approved_count = sum(1 for s in statuses if s == ClearanceStatusEnum.APPROVED)
+    if not statuses:
+        return "not_started"
+    if ClearanceStatusEnum.REJECTED in statuses:
+        return "rejected"
+    if approved_count == len(statuses):
+        return "fully_cleared"
+    if approved_count > 0:
+        return "partially_cleared"
+    return "pending"
+
+
+def student_counter_deltas(records: Iterable[ClearanceStatus], sign: int = 1) -> Dict[str, int]:
+    """
+    The counter contributions of one student with the given clearance rows.
+    Use sign=1 when the student appears, sign=-1 when they disappear.
+    """
+    records = list(records)
+    deltas = {
+        TOTAL_STUDENTS: sign,
+        overall_counter(overall_state(r.status for r in records)): sign,
+    }
+    for record in records:
+        name = department_counter(record.department, record.status)
+        deltas[name] = deltas.get(name, 0) + sign
+    return deltas
+
+
+def merge_deltas(*deltas: Dict[str, int]) -> Dict[str, int]:
+    """Sums several delta dicts, dropping counters that cancel out."""
+    merged: Dict[str, int] = {}
+    for delta in deltas:
+        for name, value in delta.items():
+            merged[name] = merged.get(name, 0) + value
+    return {name: value for name, value in merged.items() if value}
+
+
+def apply_counter_deltas(db: Session, deltas: Dict[str, int]) -> None:
+    """
+    Adjusts counters in the current transaction with a single UPDATE.
+    The caller is responsible for committing. Counters that don't exist yet are
+    left alone; the next reconciliation creates them.
+    """
+    deltas = {name: value for name, value in deltas.items() if value}
+    if not deltas:
+        return
+    db.exec(
+        update(ClearanceCounter)
+        .where(ClearanceCounter.name.in_(list(deltas)))  # type:ignore
+        .values(value=ClearanceCounter.value + case(deltas, value=ClearanceCounter.name, else_=0))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def get_counters(db: Session) -> Dict[str, int]:
+    """Reads every dashboard counter in one query."""
+    counters = {name: 0 for name in ALL_COUNTERS}
+    for name, value in db.exec(select(ClearanceCounter.name, ClearanceCounter.value)).all():
+        counters[name] = value
+    return counters
+
+
+def compute_counters(db: Session) -> Dict[str, int]:
+    """Computes every dashboard counter from the source tables with set-based queries."""
+    counters = {name: 0 for name in ALL_COUNTERS}
+    counters[TOTAL_STUDENTS] = db.exec(select(func.count(Student.id))).one()  # type:ignore
+
+    # Per-student totals, then bucketed into overall states by the database.
+    per_student = (
+        select(
+            func.count(ClearanceStatus.id).label("total"),  # type:ignore
+            func.sum(case((ClearanceStatus.status == ClearanceStatusEnum.APPROVED, 1), else_=0)).label("approved"),
+            func.sum(case((ClearanceStatus.status == ClearanceStatusEnum.REJECTED, 1), else_=0)).label("rejected"),
+        )
+        .select_from(Student)
+        .outerjoin(ClearanceStatus, ClearanceStatus.student_id == Student.id)  # type:ignore
+        .group_by(Student.id)
+        .subquery()
+    )
+    state = case(
+        (per_student.c.total == 0, "not_started"),
+        (per_student.c.rejected > 0, "rejected"),
+        (per_student.c.approved == per_student.c.total, "fully_cleared"),
+        (per_student.c.approved > 0, "partially_cleared"),
+        else_="pending",
+    )
+    for name, count in db.exec(select(state, func.count()).group_by(state)).all():
+        counters[overall_counter(name)] = count
+
+    for department, status, count in db.exec(
+        select(ClearanceStatus.department, ClearanceStatus.status, func.count())
+        .group_by(ClearanceStatus.department, ClearanceStatus.status)
+    ).all():
+        counters[department_counter(department, status)] = count
+    return counters
+
+
+def reconcile_counters(db: Session) -> Dict[str, int]:
+    """
+    Recomputes every counter and overwrites the stored values.
+
+    The counter rows are locked first, so writers that commit while the
+    recount is running apply their delta after it rather than being lost.
+    Returns the drift that was corrected, as {name: stored - actual}.
+    """
+    stored = {c.name: c for c in db.exec(select(ClearanceCounter).with_for_update()).all()}
+    actual = compute_counters(db)
+
+    drift = {}
+    for name, value in actual.items():
+        counter = stored.get(name)
+        if counter is None:
+            counter = ClearanceCounter(name=name, value=value)
+            if value:
+                drift[name] = -value
+        elif counter.value != value:
+            drift[name] = counter.value - value
+            counter.value = value
+        else:
+            continue
+        db.add(counter)
+    db.commit()
+    return drift
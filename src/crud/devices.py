@@ -1,8 +1,10 @@
 from sqlmodel import Session, select
+from sqlalchemy import bindparam
 import secrets
 from typing import List, Optional
 
 from src.models import Device, DeviceCreate, Department
+from src.crud.utils import commit_or_flush
 
 def create_device(db: Session, device: DeviceCreate) -> Optional[Device]:
     """
@@ -27,18 +29,19 @@ def create_device(db: Session, device: DeviceCreate) -> Optional[Device]:
     )
     
     db.add(db_device)
-    db.commit()
-    db.refresh(db_device)
+    commit_or_flush(db)
     return db_device
 
 def get_device_by_id(db: Session, device_id: int) -> Optional[Device]:
     """Retrieves a device by its primary key ID."""
     return db.get(Device, device_id)
 
+# Runs on every device request; built once, like the hot lookups in users.py
+ACTIVE_DEVICE_BY_API_KEY = select(Device).where(Device.api_key == bindparam("api_key"), Device.is_active == True)
+
 def get_device_by_api_key(db: Session, api_key: str) -> Optional[Device]:
     """Retrieves an active device by its API key."""
-    statement = select(Device).where(Device.api_key == api_key, Device.is_active == True)
-    return db.exec(statement).first()
+    return db.exec(ACTIVE_DEVICE_BY_API_KEY, params={"api_key": api_key}).first()
 
 def get_device_by_name(db: Session, device_name: str) -> Optional[Device]:
     """Retrieves a device by its unique name."""
@@ -64,8 +67,7 @@ def update_device(db: Session, device_id: int, device_update: dict) -> Optional[
         setattr(db_device, key, value)
         
     db.add(db_device)
-    db.commit()
-    db.refresh(db_device)
+    commit_or_flush(db)
     return db_device
 
 def delete_device(db: Session, device_id: int) -> Optional[Device]:
@@ -75,7 +77,7 @@ def delete_device(db: Session, device_id: int) -> Optional[Device]:
         return None
     
     db.delete(db_device)
-    db.commit()
+    commit_or_flush(db)
     return db_device
 
 def get_device_by_location(db: Session, location: str) -> Optional[Device]:
@@ -1,12 +1,33 @@
 from sqlmodel import Session, select
+from sqlalchemy import Integer, and_, bindparam, case, collate, func, inspect, or_, text, update
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
 from typing import List, Optional
 
 from src.models import (
     Student, StudentCreate, StudentUpdate, User, Role, ClearanceStatus, ClearanceDepartment, RFIDTag, UserCreate
 )
+from src import database
 from src.crud import users as user_crud
+from src.crud.counters import apply_counter_deltas, student_counter_deltas
+from src.crud.utils import commit_or_flush, unit_of_work
 # --- Read Operations ---
 
+# Built once at import, like the hot lookups in users.py. Both load the tag and
+# the clearance rows the callers serialize: the tag through the same row, the
+# clearance rows in one follow-up query.
+STUDENT_BY_MATRIC_NO = (
+    select(Student)
+    .where(Student.matric_no == bindparam("matric_no"))
+    .options(joinedload(Student.rfid_tag), selectinload(Student.clearance_statuses))  # type:ignore
+)
+STUDENT_BY_TAG_ID = (
+    select(Student)
+    .join(RFIDTag, RFIDTag.student_id == Student.id)  # type:ignore
+    .where(RFIDTag.tag_id == bindparam("tag_id"))
+    .options(contains_eager(Student.rfid_tag), selectinload(Student.clearance_statuses))  # type:ignore
+)
+
+
 
 def get_student_by_id(db: Session, student_id: int) -> Optional[Student]:
     """Retrieves a student by their primary key ID."""
@@ -19,72 +40,166 @@ def get_student_by_id(db: Session, student_id: int) -> Optional[Student]:
 
 def get_student_by_matric_no(db: Session, matric_no: str) -> Optional[Student]:
     """Retrieves a student by their unique matriculation number."""
-    student = db.exec(select(Student).where(
-        Student.matric_no == matric_no)).first()
-    if student:
-        # Explicitly load the relationships
-        db.refresh(student, ["rfid_tag", "clearance_statuses"])
-    return student
+    return db.exec(STUDENT_BY_MATRIC_NO, params={"matric_no": matric_no}).first()
 
 
 def get_student_by_tag_id(db: Session, tag_id: str) -> Optional[Student]:
     """Get student by RFID tag ID."""
-    from src.models import RFIDTag
-    tag = db.exec(select(RFIDTag).where(RFIDTag.tag_id == tag_id)).first()
-    if tag and tag.student_id:
-        student = db.exec(select(Student).where(
-            Student.id == tag.student_id)).first()
-        if student:
-            # Explicitly load the relationships
-            db.refresh(student, ["rfid_tag", "clearance_statuses"])
-        return student
-    return None
+    return db.exec(STUDENT_BY_TAG_ID, params={"tag_id": tag_id}).first()
+
+
+def get_student_for_user(db: Session, user: User) -> Optional[Student]:
+    """
+    A student user's own record with its clearance rows. Free when the user came
+    from users.get_user_with_clearance_by_username; otherwise one joined query.
+    """
+    if user.student_id is None:
+        return None
+    if "student" not in inspect(user).unloaded:
+        return user.student
+    return db.exec(
+        select(Student)
+        .where(Student.id == user.student_id)
+        .options(joinedload(Student.clearance_statuses))  # type:ignore
+    ).unique().first()
+
+
+def get_student_version(db: Session, student_id: int) -> Optional[int]:
+    """Returns only the student's version number, or None if the student doesn't exist."""
+    return db.exec(select(Student.version).where(Student.id == student_id)).first()
 
 
 def get_all_students(db: Session, skip: int = 0, limit: int = 100) -> List[Student]:
     """Retrieves a paginated list of all students."""
-    students = list(db.exec(select(Student).offset(skip).limit(limit)).all())
-    # Load relationships for all students
-    for student in students:
-        db.refresh(student, ["rfid_tag", "clearance_statuses"])
-    return students
+    # Load relationships for the whole page in one query each, rather than per student
+    statement = (
+        select(Student)
+        .options(selectinload(Student.rfid_tag), selectinload(Student.clearance_statuses))  # type:ignore
+        .order_by(Student.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return list(db.exec(statement).all())
+
+def _like_escape(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _matches(column, pattern: str):
+    if database.trigram_search_available:
+        # ILIKE is what the trigram GIN indexes accelerate.
+        return column.ilike(pattern, escape="\\")
+    # SQLite's LIKE is already case-insensitive; ilike() would add lower() calls.
+    return column.like(pattern, escape="\\")
+
+
+# Ids of the students whose name, matric number or email contains :match (SQLite FTS5, trigram)
+STUDENT_SEARCH_IDS = text(
+    "SELECT rowid FROM student_search WHERE student_search MATCH :match").columns(rowid=Integer)
+# Beyond any character a student field holds, so `< term + _PREFIX_END` bounds a prefix range
+_PREFIX_END = "\U0010ffff"
+
+
+def _search_filter(term: str):
+    """Matches students containing `term` in a way the backend's search indexes can serve."""
+    columns = (Student.full_name, Student.matric_no, Student.email)
+    if database.fts_search_available:
+        if len(term) >= 3:
+            phrase = '"' + term.replace('"', '""') + '"'
+            return Student.id.in_(STUDENT_SEARCH_IDS.bindparams(match=phrase))  # type:ignore
+        # Too short for a trigram: prefixes only, as ranges over the NOCASE indexes
+        return or_(*(
+            and_(collate(column, "NOCASE") >= term, collate(column, "NOCASE") < term + _PREFIX_END)
+            for column in columns
+        ))
+    # pg_trgm serves this on PostgreSQL; anywhere else it is a scan
+    substring = f"%{_like_escape(term)}%"
+    return or_(*(_matches(column, substring) for column in columns))
+
+
+def search_students(db: Session, query: str, skip: int = 0, limit: int = 20) -> List[Student]:
+    """
+    Ranked substring search over full name, matriculation number and email.
+
+    Exact and prefix matches rank first. On PostgreSQL with pg_trgm the rest are
+    ordered by trigram similarity and matched through the GIN indexes. On SQLite,
+    terms of three or more characters are matched through the trigram FTS5 table
+    and shorter ones match prefixes only, through the NOCASE indexes. Relationships
+    are not loaded, so results stay cheap.
+    """
+    term = query.strip()
+    if not term:
+        return []
+    prefix = f"{_like_escape(term)}%"
+    columns = (Student.full_name, Student.matric_no, Student.email)
+
+    # Only computed for the rows the filter matched
+    rank = case(
+        (func.lower(Student.matric_no) == term.lower(), 100),
+        (_matches(Student.matric_no, prefix), 50),
+        (_matches(Student.full_name, prefix), 40),
+        (_matches(Student.email, prefix), 30),
+        else_=0,
+    )
+    if database.trigram_search_available:
+        rank = rank + 10 * func.greatest(*(func.similarity(column, term) for column in columns))
+
+    statement = (
+        select(Student)
+        .where(_search_filter(term))
+        .order_by(rank.desc(), Student.full_name, Student.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return list(db.exec(statement).all())
 
 # --- Write Operations ---
 
 
+def bump_student_version(db: Session, student_id: int) -> None:
+    """
+    Increments the student's version in the current transaction.
+    Done as a single UPDATE so concurrent writers never reuse a version number.
+    The caller is responsible for committing.
+    """
+    db.exec(update(Student).where(Student.id == student_id).values(
+        version=Student.version + 1))
+
+
 def create_student(db: Session, student: StudentCreate) -> Student:
     """
     Creates a new student record and automatically performs two key actions:
-    1. Creates an associated User account for the student to enable login.
-    2. Initializes all required clearance statuses, setting them to 'pending'.
+    1. Initializes all required clearance statuses, setting them to 'pending'.
+    2. Creates an associated User account for the student to enable login.
+
+    All of it is committed together, so a failure part-way leaves nothing behind.
     """
-    # Step 1: Create the associated User account for login purposes.
-    # The student's matriculation number is used as their username.
-    user_for_student = UserCreate(
-        password=student.password,  # The password from the student creation form
-        email=student.email,
-        username=student.matric_no,
-        full_name=student.full_name,
-        department=student.department,
-        role=Role.STUDENT,
-    )
-    user_crud.create_user(db, user=user_for_student)  # Create the user
-
-    # Step 2: Create the Student profile.
-    db_student = Student.model_validate(student)
-    db.add(db_student)
-    db.commit()
-    db.refresh(db_student)
-
-    # Step 3: Automatically create all necessary clearance status entries for the new student.
-    for dept in ClearanceDepartment:
-        status = ClearanceStatus(
-            department=dept,
-            student_id=db_student.id  # type:ignore
+    with unit_of_work(db):
+        # Step 1: Create the Student profile together with all necessary clearance
+        # status entries. One flush inserts the student and then its clearance rows,
+        # picking up the generated student id through RETURNING.
+        db_student = Student.model_validate(student)
+        db_student.clearance_statuses = [
+            ClearanceStatus(department=dept, academic_session=db_student.academic_session)
+            for dept in ClearanceDepartment
+        ]
+        db_student.rfid_tag = None  # A new student has no tag; saves a lazy load when serializing
+        db.add(db_student)
+        db.flush()
+
+        # Step 2: Create the associated User account for login purposes, linked to the record.
+        # The student's matriculation number is used as their username.
+        user_for_student = UserCreate(
+            password=student.password,  # The password from the student creation form
+            email=student.email,
+            username=student.matric_no,
+            full_name=student.full_name,
+            department=student.department,
+            role=Role.STUDENT,
         )
-        db.add(status)
-    db.commit()
-    db.refresh(db_student)
+        user_crud.create_user(db, user=user_for_student, student_id=db_student.id)  # Create the user
+
+        apply_counter_deltas(db, student_counter_deltas(db_student.clearance_statuses))
     return db_student
 
 
@@ -97,8 +212,8 @@ def update_student(db: Session, student_id: int, updates: StudentUpdate) -> Stud
     update_data = updates.model_dump(exclude_unset=True)
     student.sqlmodel_update(update_data)
     db.add(student)
-    db.commit()
-    db.refresh(student)
+    bump_student_version(db, student.id)  # type:ignore
+    commit_or_flush(db)
     return student
 
 
@@ -109,11 +224,13 @@ def delete_student(db: Session, student_id: int) -> Student | None:
         return None
 
     # Also delete the associated user account
-    user_to_delete = user_crud.get_user_by_username(
+    user_to_delete = student_to_delete.user or user_crud.get_user_by_username(
         db, username=student_to_delete.matric_no)
     if user_to_delete:
         db.delete(user_to_delete)
 
+    apply_counter_deltas(db, student_counter_deltas(
+        student_to_delete.clearance_statuses, sign=-1))
     db.delete(student_to_delete)
-    db.commit()
+    commit_or_flush(db)
     return student_to_delete
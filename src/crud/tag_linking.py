@@ -2,6 +2,9 @@ from sqlmodel import Session, select
 from typing import Optional, Union
 
 from src.models import RFIDTag, User, Student, TagLink
+from src.crud.students import bump_student_version
+from src.crud.utils import commit_or_flush
+from src.tag_filter import tag_filter
 
 def link_tag(db: Session, link_data: TagLink) -> Optional[RFIDTag]:
     """
@@ -44,8 +47,12 @@ def link_tag(db: Session, link_data: TagLink) -> Optional[RFIDTag]:
         new_tag.user_id = target_person.id
         
     db.add(new_tag)
-    db.commit()
-    db.refresh(new_tag)
+    if new_tag.student_id is not None:
+        bump_student_version(db, new_tag.student_id)
+    # Before the commit: if it fails, the filter only keeps a harmless extra entry.
+    # A rebuild whose snapshot misses the uncommitted row replays it (see tag_filter.py).
+    tag_filter.add(new_tag.tag_id)
+    commit_or_flush(db)
     
     return new_tag
 
@@ -60,6 +67,9 @@ def unlink_tag(db: Session, tag_id: str) -> Optional[RFIDTag]:
         return None # Tag not found
         
     db.delete(tag_to_delete)
-    db.commit()
+    if tag_to_delete.student_id is not None:
+        bump_student_version(db, tag_to_delete.student_id)
+    commit_or_flush(db)
+    tag_filter.discard(tag_id)
     
     return tag_to_delete
@@ -1,11 +1,26 @@
 from sqlmodel import Session, select
+from sqlalchemy import bindparam
+from sqlalchemy.orm import joinedload
 from typing import List, Optional
 
-from src.models import User, UserCreate, UserUpdate, RFIDTag
-from src.crud.utils import hash_password
+from src.models import User, UserCreate, UserUpdate, RFIDTag, Student
+from src.crud.utils import commit_or_flush, hash_password
 
 # --- Read Operations ---
 
+# Hot lookups (every authenticated request, every gate scan) use statements built
+# once at import. SQLAlchemy memoizes a statement's cache key on the object, so
+# reusing it skips per-call construction and cache-key generation, and the
+# identical SQL text lets psycopg 3 prepare it server-side (see database.py).
+USER_BY_USERNAME = select(User).where(User.username == bindparam("username"))
+USER_BY_TAG_ID = select(User).join(RFIDTag, RFIDTag.user_id == User.id).where(  # type:ignore
+    RFIDTag.tag_id == bindparam("tag_id"))
+# A student's own clearance view needs the login, the record and its clearance
+# rows; one joined query brings back all three.
+USER_WITH_CLEARANCE_BY_USERNAME = USER_BY_USERNAME.options(
+    joinedload(User.student).joinedload(Student.clearance_statuses))  # type:ignore
+
+
 
 def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
     """Retrieves a user by their primary key ID."""
@@ -14,7 +29,12 @@ def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
 
 def get_user_by_username(db: Session, username: str) -> Optional[User]:
     """Retrieves a user by their unique username."""
-    return db.exec(select(User).where(User.username == username)).first()
+    return db.exec(USER_BY_USERNAME, params={"username": username}).first()
+
+
+def get_user_with_clearance_by_username(db: Session, username: str) -> Optional[User]:
+    """Like get_user_by_username, with the linked student record and its clearance rows loaded."""
+    return db.exec(USER_WITH_CLEARANCE_BY_USERNAME, params={"username": username}).unique().first()
 
 
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
@@ -24,11 +44,7 @@ def get_user_by_email(db: Session, email: str) -> Optional[User]:
 
 def get_user_by_tag_id(db: Session, tag_id: str) -> Optional[User]:
     """Get user by RFID tag ID."""
-    from src.models import RFIDTag
-    tag = db.exec(select(RFIDTag).where(RFIDTag.tag_id == tag_id)).first()
-    if tag and tag.user_id:
-        return db.exec(select(User).where(User.id == tag.user_id)).first()
-    return None
+    return db.exec(USER_BY_TAG_ID, params={"tag_id": tag_id}).first()
 
 
 def get_all_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
@@ -36,8 +52,8 @@ def get_all_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
     return list(db.exec(select(User).offset(skip).limit(limit)).all())
 
 
-def create_user(db: Session, user: UserCreate) -> User:
-    """Creates a new user and hashes their password."""
+def create_user(db: Session, user: UserCreate, student_id: Optional[int] = None) -> User:
+    """Creates a new user and hashes their password. `student_id` links a student's login to their record."""
     hashed_password = hash_password(user.password)
     db_user = User(
         username=user.username,
@@ -46,11 +62,11 @@ def create_user(db: Session, user: UserCreate) -> User:
         full_name=user.full_name,
         role=user.role,
         department=user.department,
-        clearance_department=user.clearance_department
+        clearance_department=user.clearance_department,
+        student_id=student_id,
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    commit_or_flush(db)
     return db_user
 
 
@@ -70,8 +86,7 @@ def update_user(db: Session, user_id: int, updates: UserUpdate) -> User | None:
     user.sqlmodel_update(update_data)
 
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    commit_or_flush(db)
     return user
 
 
@@ -81,6 +96,6 @@ def delete_user(db: Session, user_id: int) -> User | None:
     if not user_to_delete:
         return None
     db.delete(user_to_delete)
-    db.commit()
+    commit_or_flush(db)
     # The user object is no longer valid after deletion, so we return the in-memory object
     return user_to_delete
@@ -1,6 +1,11 @@
 """
 Utility functions for CRUD operations.
 """
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlmodel import Session
+
 from src.config import settings
 
 # --- Password Hashing ---
@@ -8,4 +13,41 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return settings.PWD_CONTEXT.verify(plain_password, hashed_password)
 
 def hash_password(password: str) -> str:
-    return settings.PWD_CONTEXT.hash(password)
\ No newline at end of file
+    return settings.PWD_CONTEXT.hash(password)
+
+
+# --- Transactions ---
+
+_UNIT_OF_WORK_DEPTH = "unit_of_work_depth"
+
+
+@contextmanager
+def unit_of_work(db: Session) -> Iterator[Session]:
+    """
+    Groups several CRUD calls into one transaction with a single commit.
+
+    Inside the block, CRUD functions flush instead of committing, so generated
+    keys are still available (they come back through INSERT ... RETURNING).
+    The outermost block commits on success and rolls everything back on error;
+    nested blocks join the enclosing one.
+    """
+    depth = db.info.get(_UNIT_OF_WORK_DEPTH, 0)
+    db.info[_UNIT_OF_WORK_DEPTH] = depth + 1
+    try:
+        yield db
+        if depth == 0:
+            db.commit()
+    except BaseException:
+        if depth == 0:
+            db.rollback()
+        raise
+    finally:
+        db.info[_UNIT_OF_WORK_DEPTH] = depth
+
+
+def commit_or_flush(db: Session) -> None:
+    """Commits, unless a unit_of_work is open, in which case it only flushes and leaves the commit to it."""
+    if db.info.get(_UNIT_OF_WORK_DEPTH):
+        db.flush()
+    else:
+        db.commit()
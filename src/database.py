@@ -1,53 +1,275 @@
 from sqlmodel import create_engine, Session, SQLModel
 from sqlalchemy import text
+from sqlalchemy.engine import Engine, make_url
+from fastapi import Request
+from collections import OrderedDict
+from typing import Optional
+import hashlib
+import threading
+import time
 from src.config import settings
+from src.metrics import instrument_engine, registry, Counter
+from src.query_budget import enable_slow_query_log
+from src.sqlite_backend import configure_sqlite_engine, is_sqlite_url
 
 # --- Database Engine Setup ---
 
 # The database URL is constructed from the application settings.
 # This makes it easy to switch between different database environments (e.g., dev, test, prod).
+# A sqlite:/// URL selects the embedded single-node mode (see src/sqlite_backend.py).
 DATABASE_URL = settings.POSTGRES_URI
-engine = create_engine(DATABASE_URL,)
+
+
+def build_engine(url: str) -> Engine:
+    if is_sqlite_url(url):
+        new_engine = create_engine(url, connect_args={"check_same_thread": False})
+        configure_sqlite_engine(new_engine, url)
+    elif make_url(url).get_driver_name() == "psycopg":
+        # psycopg 3 (SQLAlchemy 2.1's default for postgresql:// URLs) prepares a statement
+        # server-side once a connection has run it this many times. psycopg2 can't.
+        new_engine = create_engine(url, connect_args={"prepare_threshold": settings.POSTGRES_PREPARE_THRESHOLD})
+    else:
+        new_engine = create_engine(url,)
+    # Count queries and DB time for the /metrics endpoint
+    if settings.METRICS_ENABLED:
+        instrument_engine(new_engine)
+    return new_engine
+
+
+engine = build_engine(DATABASE_URL)
+enable_slow_query_log()
+
+# Optional read replica for GET traffic (see get_session). Migrations and all
+# writes only ever go to the primary `engine`.
+replica_engine: Optional[Engine] = build_engine(settings.READ_REPLICA_URI) if settings.READ_REPLICA_URI else None
+
+# Set by migrate_student_search_indexes() once pg_trgm and its indexes are in place.
+trigram_search_available = False
+# Set by migrate_student_search_indexes() once SQLite's student_search FTS5 table is in place.
+fts_search_available = False
 
 # --- Database Migration Functions ---
 
 
+def column_exists(session: Session, table_name: str, column_name: str) -> bool:
+    """Checks the live schema for a column, using each backend's own catalog."""
+    if engine.dialect.name == "sqlite":
+        rows = session.connection().execute(text(f'PRAGMA table_info("{table_name}")')).fetchall()
+        return any(row[1] == column_name for row in rows)
+    check_column_query = text("""
+        SELECT column_name 
+        FROM information_schema.columns 
+        WHERE table_name = :table_name 
+        AND column_name = :column_name
+    """)
+    result = session.connection().execute(
+        check_column_query, {"table_name": table_name, "column_name": column_name}).fetchone()
+    return result is not None
+
+
+def add_column_if_missing(table_name: str, column_name: str, column_ddl: str, sqlite_ddl: Optional[str] = None):
+    """
+    Adds a column to an existing table if it doesn't exist yet.
+    `column_ddl` is everything after the column name in ADD COLUMN; pass
+    `sqlite_ddl` where SQLite needs something different.
+    """
+    if engine.dialect.name == "sqlite" and sqlite_ddl is not None:
+        column_ddl = sqlite_ddl
+    with Session(engine) as session:
+        try:
+            if not column_exists(session, table_name, column_name):
+                print(f"Adding {column_name} column to {table_name} table...")
+                add_column_query = text(f'''
+                    ALTER TABLE "{table_name}" 
+                    ADD COLUMN {column_name} {column_ddl}
+                ''')
+                session.connection().execute(add_column_query)
+                session.commit()
+                print(f"Successfully added {column_name} column.")
+            else:
+                print(f"{table_name}.{column_name} column already exists.")
+
+        except Exception as e:
+            print(f"Error during {table_name}.{column_name} column migration: {e}")
+            session.rollback()
+
+
 def migrate_clearance_department_column():
     """
     Adds the clearance_department column to the user table if it doesn't exist.
     This handles the migration for the new department-based access control feature.
     """
+    add_column_if_missing("user", "clearance_department", "VARCHAR")
+
+
+def migrate_student_version_column():
+    """
+    Adds the version column to the student table if it doesn't exist.
+    The version backs the ETags served by the clearance read endpoints.
+    """
+    add_column_if_missing("student", "version", "INTEGER NOT NULL DEFAULT 1")
+
+
+def migrate_clearance_version_column():
+    """
+    Adds the optimistic-concurrency version column to clearancestatus.
+    """
+    add_column_if_missing("clearancestatus", "version", "INTEGER NOT NULL DEFAULT 1")
+
+
+def migrate_clearance_claim_columns():
+    """
+    Adds the lease columns used by the claim/release work API to clearancestatus.
+    """
+    add_column_if_missing("clearancestatus", "claimed_by", 'INTEGER REFERENCES "user"(id)')
+    add_column_if_missing("clearancestatus", "claim_expires_at", "TIMESTAMP WITH TIME ZONE", sqlite_ddl="DATETIME")
+
+
+def migrate_user_student_column():
+    """
+    Adds the user -> student link, so a student's login no longer has to be
+    matched to their record through username == matric_no.
+    """
+    add_column_if_missing("user", "student_id", "INTEGER REFERENCES student(id)")
+
+
+def backfill_user_student_links():
+    """
+    Links student logins that predate the student_id column to their Student
+    record by matric number. Runs after migrate_student_usernames, and only
+    touches unlinked rows, so it is cheap once everything is linked.
+    """
     with Session(engine) as session:
         try:
-            # Check if the column exists
-            check_column_query = text("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = 'user' 
-                AND column_name = 'clearance_department'
-            """)
-
-            # Use the underlying SQLAlchemy session for raw SQL
-            result = session.connection().execute(check_column_query).fetchone()
-
-            if not result:
-                print("Adding clearance_department column to user table...")
-                # Add the column if it doesn't exist
-                add_column_query = text('''
-                    ALTER TABLE "user" 
-                    ADD COLUMN clearance_department VARCHAR
-                ''')
-                session.connection().execute(add_column_query)
+            result = session.connection().execute(text('''
+                UPDATE "user"
+                SET student_id = (SELECT student.id FROM student WHERE student.matric_no = "user".username)
+                WHERE role = 'STUDENT'
+                AND student_id IS NULL
+                AND EXISTS (SELECT 1 FROM student WHERE student.matric_no = "user".username)
+            '''))
+            session.commit()
+            if result.rowcount:
+                print(f"Linked {result.rowcount} student users to their student records.")
+        except Exception as e:
+            print(f"Error during user student link backfill: {e}")
+            session.rollback()
+
+
+def migrate_academic_session_columns():
+    """
+    Adds the academic_session column to student and clearancestatus. Rows that
+    predate it are put in the current session; clearance rows take their
+    student's. Also drops the work-queue index the session-leading one replaced.
+    """
+    add_column_if_missing("student", "academic_session", "VARCHAR")
+    add_column_if_missing("clearancestatus", "academic_session", "VARCHAR")
+    with Session(engine) as session:
+        try:
+            result = session.connection().execute(text(
+                "UPDATE student SET academic_session = :current WHERE academic_session IS NULL"),
+                {"current": settings.CURRENT_ACADEMIC_SESSION})
+            if result.rowcount:
+                print(f"Put {result.rowcount} students in the {settings.CURRENT_ACADEMIC_SESSION} session.")
+            session.connection().execute(text('''
+                UPDATE clearancestatus
+                SET academic_session = (
+                    SELECT student.academic_session FROM student WHERE student.id = clearancestatus.student_id)
+                WHERE academic_session IS NULL
+            '''))
+            session.connection().execute(text("DROP INDEX IF EXISTS ix_clearancestatus_department_status_id"))
+            session.commit()
+        except Exception as e:
+            print(f"Error during academic session migration: {e}")
+            session.rollback()
+
+
+def migrate_student_search_indexes():
+    """
+    Creates the indexes behind /admin/students/search.
+    On PostgreSQL these are pg_trgm GIN indexes, which serve ILIKE '%term%' and
+    similarity ranking. On SQLite, a trigram FTS5 table kept in sync by triggers
+    serves substring matches of three or more characters, and case-insensitive
+    b-tree indexes serve the prefix ranges used for shorter terms.
+    """
+    global trigram_search_available, fts_search_available
+    with Session(engine) as session:
+        try:
+            if engine.dialect.name == "postgresql":
+                session.connection().execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                for column in ("full_name", "matric_no", "email"):
+                    session.connection().execute(text(
+                        f"CREATE INDEX IF NOT EXISTS ix_student_{column}_trgm "
+                        f"ON student USING gin ({column} gin_trgm_ops)"
+                    ))
                 session.commit()
-                print("Successfully added clearance_department column.")
+                trigram_search_available = True
+                print("Student search trigram indexes are in place.")
             else:
-                print("clearance_department column already exists.")
+                for column in ("full_name", "matric_no", "email"):
+                    session.connection().execute(text(
+                        f"CREATE INDEX IF NOT EXISTS ix_student_{column}_nocase "
+                        f"ON student ({column} COLLATE NOCASE)"
+                    ))
+                session.commit()
+                print("Student search prefix indexes are in place.")
+                migrate_student_search_fts(session)
 
         except Exception as e:
-            print(f"Error during clearance_department column migration: {e}")
+            print(f"Error during student search index migration: {e}")
             session.rollback()
 
 
+def migrate_student_search_fts(session: Session):
+    """
+    Creates `student_search`, an external-content FTS5 table over the student's
+    name, matric number and email with the trigram tokenizer (SQLite 3.34+), and
+    the triggers that keep it in step with `student`. Filled from the existing
+    rows when first created. Without FTS5, search falls back to unindexed LIKE.
+    """
+    global fts_search_available
+    connection = session.connection()
+    exists = connection.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'student_search'")).first()
+    try:
+        if not exists:
+            connection.execute(text(
+                "CREATE VIRTUAL TABLE student_search USING fts5("
+                "full_name, matric_no, email, content='student', content_rowid='id', tokenize='trigram')"
+            ))
+            connection.execute(text("INSERT INTO student_search(student_search) VALUES ('rebuild')"))
+        insert_row = ("INSERT INTO student_search(rowid, full_name, matric_no, email) "
+                      "VALUES (new.id, new.full_name, new.matric_no, new.email);")
+        delete_row = ("INSERT INTO student_search(student_search, rowid, full_name, matric_no, email) "
+                      "VALUES ('delete', old.id, old.full_name, old.matric_no, old.email);")
+        for name, event, body in (
+            ("student_search_ai", "AFTER INSERT ON student", insert_row),
+            ("student_search_ad", "AFTER DELETE ON student", delete_row),
+            ("student_search_au", "AFTER UPDATE OF full_name, matric_no, email ON student",
+             delete_row + " " + insert_row),
+        ):
+            connection.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END"))
+        session.commit()
+        fts_search_available = True
+        print("Student search FTS5 table is in place.")
+    except Exception as e:
+        print(f"SQLite FTS5 trigram search is unavailable, search falls back to LIKE: {e}")
+        session.rollback()
+
+
+def migrate_missing_indexes():
+    """
+    Creates indexes declared on the models that predate their tables.
+    create_all() only creates indexes together with new tables.
+    """
+    try:
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(engine, checkfirst=True)
+    except Exception as e:
+        print(f"Error during index migration: {e}")
+
+
 def migrate_student_usernames():
     """
     Fix student usernames to use matric_no instead of full_name.
@@ -111,19 +333,110 @@ def create_db_and_tables():
 
     # Run any necessary migrations
     migrate_clearance_department_column()
+    migrate_student_version_column()
+    migrate_clearance_version_column()
+    migrate_clearance_claim_columns()
+    migrate_user_student_column()
+    migrate_academic_session_columns()
+    migrate_student_search_indexes()
+    migrate_missing_indexes()
     migrate_student_usernames()
+    backfill_user_student_links()
 
 # --- Database Session Management ---
 
 
-def get_session():
+SESSIONS_TOTAL = registry.register(Counter(
+    "db_sessions_total", "Request database sessions by the engine they were routed to.", ("target",)))
+
+_READ_ONLY_METHODS = ("GET", "HEAD")
+
+
+class RecentWriters:
+    """
+    Remembers, per caller, when they last sent a write, so their reads stay on
+    the primary until the replica has caught up. Per process and bounded like
+    the rate limiter's buckets; with several workers a caller whose next read
+    lands on another worker can still briefly see replica lag.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self._last_write: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_keys = max_keys
+
+    def mark(self, key: str):
+        with self._lock:
+            self._last_write.pop(key, None)
+            self._last_write[key] = time.monotonic()
+            if len(self._last_write) > self._max_keys:
+                self._last_write.popitem(last=False)
+
+    def wrote_recently(self, key: str, window_seconds: float) -> bool:
+        with self._lock:
+            last = self._last_write.get(key)
+        return last is not None and time.monotonic() - last < window_seconds
+
+
+recent_writers = RecentWriters()
+
+
+def caller_key(request: Request) -> str:
+    """Identifies the caller by their credentials, falling back to the client IP. Never stored in clear."""
+    credential = request.headers.get("authorization") or request.headers.get("x-api-key")
+    if not credential:
+        credential = f"ip:{request.client.host if request.client else 'unknown'}"
+    return hashlib.blake2b(credential.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def session_engine(request: Optional[Request]) -> Engine:
+    """The engine a request's session should use: the replica for reads, unless the caller just wrote."""
+    if replica_engine is None or request is None or request.method not in _READ_ONLY_METHODS:
+        return engine
+    if recent_writers.wrote_recently(caller_key(request), settings.READ_YOUR_WRITES_SECONDS):
+        return engine
+    return replica_engine
+
+
+def get_session(request: Request = None):  # type:ignore
     """
     A FastAPI dependency that provides a database session for each request.
     It ensures that the session is always closed after the request is finished,
     even if an error occurs.
+
+    With READ_REPLICA_URI set, GET/HEAD requests are served from the replica,
+    except for callers who sent a write in the last READ_YOUR_WRITES_SECONDS.
     """
-    with Session(engine) as session:
+    bind = session_engine(request)
+    SESSIONS_TOTAL.inc("replica" if bind is replica_engine else "primary")
+    # Marked when the write starts and again when it ends, so the window covers the whole write
+    track_write = replica_engine is not None and request is not None and request.method not in _READ_ONLY_METHODS
+    if track_write:
+        recent_writers.mark(caller_key(request))
+    # Objects stay usable after commit; CRUD functions no longer refresh after writing
+    with Session(bind, expire_on_commit=False) as session:
+        try:
+            yield session
+        finally:
+            session.close()
+            if track_write:
+                recent_writers.mark(caller_key(request))
+
+
+def get_primary_session():
+    """Like get_session, but always on the primary. For reads that must not see replica lag."""
+    with Session(engine, expire_on_commit=False) as session:
         try:
             yield session
         finally:
             session.close()
+
+
+def read_session() -> Session:
+    """
+    A session not tied to a request, on the replica when one is configured.
+    For shared reads that tolerate lag, such as the cached dashboard aggregates.
+    """
+    bind = replica_engine if replica_engine is not None else engine
+    SESSIONS_TOTAL.inc("replica" if bind is replica_engine else "primary")
+    return Session(bind, expire_on_commit=False)
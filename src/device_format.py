@@ -0,0 +1,152 @@
+"""
+Compact wire formats for the RFID gate devices.
+
+Readers are memory-constrained microcontrollers, so the device endpoints
+negotiate their response format from the `Accept` header:
+
+    application/json (default)    the usual RFIDStatusResponse object
+    text/plain                    one fixed-field line: "F|S|P|Ada Obi"
+    application/msgpack           the same four fields as a MessagePack array
+
+The compact formats carry single-character codes (see the *_CODES tables)
+followed by the full name, which is always last so it may contain any
+character but a newline. "-" (text) or nil (MessagePack) stands for a missing
+field. A JSON response is ~110 bytes; the text line for the same tap is ~20
+and is read on the device with a few `indexOf` calls instead of a JSON parser.
+
+Devices may also send the scanned tag as a bare `text/plain` body instead of
+`{"tag_id": "..."}`.
+"""
+from typing import Any, List, Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+
+from src.models import RFIDScanRequest, RFIDStatusResponse
+
+JSON = "application/json"
+TEXT = "text/plain"
+MSGPACK = "application/msgpack"
+
+_MEDIA_TYPES = {
+    "application/json": JSON,
+    "application/*": JSON,
+    "*/*": JSON,
+    "text/plain": TEXT,
+    "text/*": TEXT,
+    "application/msgpack": MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+# Every negotiated response says it depends on Accept, so caches keep the formats apart
+_VARY_ACCEPT = {"Vary": "Accept"}
+
+STATUS_CODES = {"found": "F", "unregistered": "U"}
+ENTITY_CODES = {"Student": "S", "Staff": "T", "Admin": "A"}
+CLEARANCE_CODES = {"Fully Cleared": "C", "Pending Clearance": "P", "N/A": "N"}
+
+# OpenAPI `responses` entry documenting the alternatives to JSON
+COMPACT_RESPONSES = {
+    200: {
+        "description": "JSON by default; a compact format when the device asks for it in `Accept`.",
+        "content": {
+            TEXT: {"schema": {"type": "string"}, "example": "F|S|P|Ada Obi"},
+            MSGPACK: {"schema": {"type": "string", "format": "binary"}},
+        },
+    }
+}
+
+# OpenAPI request body for endpoints reading the tag through `scanned_tag_id`
+TAG_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            JSON: {"schema": {"type": "object", "required": ["tag_id"],
+                              "properties": {"tag_id": {"type": "string"}}}},
+            TEXT: {"schema": {"type": "string"}, "example": "D6FC3F05"},
+        },
+    }
+}
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """The best supported media type for an Accept header; JSON when there is no usable preference."""
+    best, best_q = JSON, -1.0
+    for entry in (accept or "").split(","):
+        media_type, _, params = entry.partition(";")
+        chosen = _MEDIA_TYPES.get(media_type.strip().lower())
+        if chosen is None:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > best_q:
+            best, best_q = chosen, q
+    return best if best_q != 0.0 else JSON
+
+
+def _packb_str(value: Optional[str]) -> bytes:
+    if value is None:
+        return b"\xc0"
+    data = value.encode("utf-8")
+    if len(data) < 32:
+        return bytes([0xA0 | len(data)]) + data
+    if len(data) < 256:
+        return b"\xd9" + bytes([len(data)]) + data
+    data = data[:0xFFFF]
+    return b"\xda" + len(data).to_bytes(2, "big") + data
+
+
+def packb_strings(values: List[Optional[str]]) -> bytes:
+    """MessagePack for a short array of strings/nils, the only shape the devices need."""
+    return bytes([0x90 | len(values)]) + b"".join(_packb_str(v) for v in values)
+
+
+def status_fields(result: RFIDStatusResponse) -> List[Optional[str]]:
+    return [
+        STATUS_CODES.get(result.status, result.status),
+        ENTITY_CODES.get(result.entity_type) if result.entity_type else None,
+        CLEARANCE_CODES.get(result.clearance_status) if result.clearance_status else None,
+        result.full_name,
+    ]
+
+
+def status_response(request: Request, response: Response, result: RFIDStatusResponse) -> Any:
+    """Returns `result` as the device asked for it; the model itself (regular JSON) by default."""
+    media_type = negotiate(request.headers.get("accept"))
+    if media_type == TEXT:
+        line = "|".join("-" if v is None else v.replace("\n", " ") for v in status_fields(result))
+        return Response(line, media_type="text/plain; charset=utf-8", headers=_VARY_ACCEPT)
+    if media_type == MSGPACK:
+        return Response(packb_strings(status_fields(result)), media_type=MSGPACK, headers=_VARY_ACCEPT)
+    # A returned model is serialized into `response`, which carries the header
+    response.headers.update(_VARY_ACCEPT)
+    return result
+
+
+async def scanned_tag_id(request: Request) -> str:
+    """
+    Dependency reading the scanned tag from the request body: JSON
+    (`{"tag_id": "..."}`) or, for constrained devices, the bare tag as text/plain.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").partition(";")[0].strip().lower()
+    if content_type == TEXT:
+        tag_id = body.decode("utf-8", errors="replace").strip()
+    else:
+        try:
+            tag_id = RFIDScanRequest.model_validate_json(body).tag_id
+        except ValidationError as e:
+            # Same error shape FastAPI gives for a declared body parameter
+            raise RequestValidationError(
+                [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)])
+    if not tag_id:
+        raise HTTPException(status_code=422, detail="Empty tag id")
+    return tag_id
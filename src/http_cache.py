@@ -0,0 +1,35 @@
+"""
+Helpers for conditional GET handling (ETag / If-None-Match).
+
+Student read endpoints derive a strong ETag from the student's `version`
+column, so a client revalidating an unchanged record costs a single
+indexed lookup and an empty 304 response.
+"""
+from fastapi import Request, Response, status
+
+
+def student_etag(student_id: int, version: int) -> str:
+    """Builds the strong ETag for a given student version."""
+    return f'"student-{student_id}-v{version}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Returns True if the request's If-None-Match header matches the ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so a W/ prefix is ignored.
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in candidates
+
+
+def not_modified(etag: str) -> Response:
+    """Builds an empty 304 response carrying the current ETag."""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag))
+
+
+def cache_headers(etag: str) -> dict:
+    """Headers telling clients to store the response but revalidate every time."""
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
@@ -0,0 +1,37 @@
+"""
+The background jobs available through /jobs. See src/jobs.py for the runner.
+"""
+from typing import Any, Dict
+
+from src.analytics import ClearanceMatrix, get_clearance_matrix
+from src.crud import archive as archive_crud
+from src.crud.counters import reconcile_counters
+from src.jobs import JobContext, job_kind
+from src.models import SessionArchiveRequest
+
+
+@job_kind("archive_session", params_model=SessionArchiveRequest)
+def archive_session_job(ctx: JobContext, params: SessionArchiveRequest) -> Dict[str, Any]:
+    """Moves a closed academic session's students and clearance records to the archive tables."""
+    def report(moved: int, total: int):
+        ctx.progress(moved / total, f"{moved} of {total} students archived")
+
+    return archive_crud.archive_session(ctx.db, params.academic_session, progress=report)
+
+
+@job_kind("reconcile_counters")
+def reconcile_counters_job(ctx: JobContext) -> Dict[str, Any]:
+    """Recomputes the dashboard counters from the clearance tables."""
+    return {"drift": reconcile_counters(ctx.db)}
+
+
+@job_kind("clearance_export")
+def clearance_export_job(ctx: JobContext) -> Dict[str, Any]:
+    """Exports every student's clearance status per department as a CSV file."""
+    ctx.progress(0.0, "Loading clearance records")
+    matrix = get_clearance_matrix(ctx.db)
+    ctx.progress(0.5, f"Writing {len(matrix)} students")
+    content = ctx.run_cpu(ClearanceMatrix.to_csv, matrix)
+    with open(ctx.result_file("clearance.csv"), "w", newline="") as f:
+        f.write(content)
+    return {"students": len(matrix)}
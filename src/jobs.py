@@ -0,0 +1,338 @@
+"""
+In-process background jobs backed by the `job` table.
+
+Work too slow for a request (archiving a session, exports, counter rebuilds)
+is submitted as a `Job` row and answered with 202; clients poll
+GET /jobs/{id} for its state, progress and result.
+
+Every worker process runs a JobRunner: JOB_WORKERS asyncio tasks that claim
+queued rows from the database and run them in the runner's own thread pool,
+so jobs never take threads from the request threadpool. Claiming is a
+conditional UPDATE (plus SKIP LOCKED on PostgreSQL), so with several
+processes each job still runs once. Steps that are CPU-bound rather than
+waiting on the database go to a process pool through `JobContext.run_cpu`.
+
+On shutdown the runner stops claiming and gives running jobs
+JOB_DRAIN_SECONDS to finish. Jobs still running after that are asked to stop
+at their next progress report and are queued again. Runners heartbeat the
+jobs they hold, and a job whose heartbeat is JOB_STALE_SECONDS old (its
+process died) is queued again too, so job functions must be safe to re-run.
+
+Job kinds are registered with `@job_kind` (see src/job_kinds.py).
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from src import metrics
+from src.config import settings
+from src.database import engine
+from src.models import Job, JobStatus
+
+# Progress reports are written at most this often, however often a job reports
+_PROGRESS_WRITE_INTERVAL_SECONDS = 1.0
+# After the drain period, how long jobs get to notice they were asked to stop
+_CANCEL_GRACE_SECONDS = 5.0
+_MAX_ERROR_LENGTH = 2000
+
+JOBS_TOTAL = metrics.registry.register(metrics.Counter(
+    "background_jobs_total", "Background job runs by kind and outcome: done, failed or requeued.",
+    ("kind", "result")))
+
+
+@dataclass
+class JobKind:
+    name: str
+    run: Callable[..., Optional[Dict[str, Any]]]
+    description: str
+    params_model: Optional[Type[BaseModel]] = None
+
+
+JOB_KINDS: Dict[str, JobKind] = {}
+
+
+def job_kind(name: str, params_model: Optional[Type[BaseModel]] = None):
+    """
+    Registers a job function as `name`. It is called in a job thread as
+    `run(ctx)`, or `run(ctx, params)` with the validated `params_model`, and
+    returns a small JSON-able result dict (or None). Its docstring is the
+    description shown by GET /jobs/kinds.
+    """
+    def register(run: Callable[..., Optional[Dict[str, Any]]]):
+        JOB_KINDS[name] = JobKind(name, run, (run.__doc__ or "").strip(), params_model)
+        return run
+    return register
+
+
+class JobCancelled(Exception):
+    """Raised from JobContext.progress when the runner is shutting down."""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _update_job(job_id: int, expected: Optional[JobStatus] = None, **values) -> bool:
+    """Writes to a job row in its own transaction, only if it is still in the `expected` status."""
+    statement = update(Job).where(Job.id == job_id).values(updated_at=_now(), **values)  # type:ignore
+    if expected is not None:
+        statement = statement.where(Job.status == expected)  # type:ignore
+    with Session(engine) as db:
+        result = db.exec(statement.execution_options(synchronize_session=False))
+        db.commit()
+    return result.rowcount > 0
+
+
+class JobContext:
+    """Handed to job functions: a database session, progress reporting and the CPU pool."""
+
+    def __init__(self, runner: "JobRunner", job: Job, db: Session):
+        self.job_id: int = job.id  # type:ignore
+        self.db = db
+        self.result_path: Optional[str] = None
+        self._runner = runner
+        self._last_write = 0.0
+
+    def progress(self, fraction: float, message: Optional[str] = None):
+        """
+        Reports progress (0..1). Also the point where a job is stopped during
+        shutdown, so long jobs should report between units of work.
+        """
+        if self._runner.cancel_requested:
+            raise JobCancelled()
+        now = time.monotonic()
+        if now - self._last_write >= _PROGRESS_WRITE_INTERVAL_SECONDS or fraction >= 1:
+            self._last_write = now
+            values: Dict[str, Any] = {"progress": min(max(fraction, 0.0), 1.0)}
+            if message is not None:
+                values["message"] = message
+            _update_job(self.job_id, JobStatus.RUNNING, **values)
+
+    def run_cpu(self, fn: Callable, *args):
+        """
+        Runs `fn(*args)` in the runner's process pool and returns its result, for
+        steps that would otherwise hold the GIL. `fn` and its arguments must pickle.
+        """
+        return self._runner.cpu_pool().submit(fn, *args).result()
+
+    def result_file(self, filename: str) -> str:
+        """A path for the job's result file, reported as its result_url once it is done."""
+        os.makedirs(settings.JOB_RESULTS_DIR, exist_ok=True)
+        self.result_path = os.path.join(settings.JOB_RESULTS_DIR, f"{self.job_id}-{filename}")
+        return self.result_path
+
+
+def submit_job(db: Session, kind: str, params: Dict[str, Any], user_id: Optional[int] = None) -> Job:
+    """
+    Validates and queues a job. Raises KeyError for an unknown kind and
+    pydantic's ValidationError for bad params. Call `job_runner.notify()`
+    afterwards so an idle runner picks it up straight away.
+    """
+    job_type = JOB_KINDS[kind]
+    if job_type.params_model is not None:
+        params = job_type.params_model.model_validate(params).model_dump(mode="json")
+    now = _now()
+    job = Job(kind=kind, params=params, created_by=user_id, created_at=now, updated_at=now)
+    db.add(job)
+    db.commit()
+    return job
+
+
+def claim_next_job(db: Session) -> Optional[Job]:
+    """Marks the oldest queued job as running and returns it, or None if there is none."""
+    while True:
+        job_id = db.exec(
+            select(Job.id)
+            .where(Job.status == JobStatus.QUEUED)
+            .order_by(Job.id)  # type:ignore
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).first()
+        if job_id is None:
+            db.commit()
+            return None
+        now = _now()
+        # Conditional, so two runners racing on a backend without row locks can't both win
+        claimed = db.exec(
+            update(Job)
+            .where(Job.id == job_id, Job.status == JobStatus.QUEUED)  # type:ignore
+            .values(status=JobStatus.RUNNING, started_at=now, updated_at=now, attempts=Job.attempts + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        if claimed:
+            return db.get(Job, job_id)
+
+
+def requeue_stale_jobs() -> int:
+    """
+    Queues again the running jobs whose runner stopped heartbeating, or fails
+    them once they have used up JOB_MAX_ATTEMPTS. Returns how many were queued.
+    """
+    cutoff = _now() - timedelta(seconds=settings.JOB_STALE_SECONDS)
+    stale = (Job.status == JobStatus.RUNNING) & (Job.updated_at < cutoff)  # type:ignore
+    with Session(engine) as db:
+        db.exec(
+            update(Job)
+            .where(stale, Job.attempts >= settings.JOB_MAX_ATTEMPTS)  # type:ignore
+            .values(status=JobStatus.FAILED, finished_at=_now(), updated_at=_now(),
+                    error="The job's worker stopped responding too many times.")
+            .execution_options(synchronize_session=False)
+        )
+        requeued = db.exec(
+            update(Job)
+            .where(stale)
+            .values(status=JobStatus.QUEUED, started_at=None, updated_at=_now(),
+                    message="The job's worker stopped responding; queued again.")
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+    if requeued:
+        print(f"Queued {requeued} stale background jobs again.")
+    return requeued
+
+
+class JobRunner:
+    """A bounded pool of job workers for this process. Start it from the lifespan, drain it on shutdown."""
+
+    def __init__(self, workers: int, cpu_workers: int):
+        self.workers = workers
+        self.cpu_workers = cpu_workers
+        self.cancel_requested = False
+        self.running: Dict[int, str] = {}  # job id -> kind
+        self._stopping = False
+        # One thread per worker for claiming and running jobs, plus one for the
+        # heartbeats, so they never wait behind the jobs they are reporting on
+        self._threads = ThreadPoolExecutor(workers + 1, thread_name_prefix="job")
+        self._cpu_pool: Optional[ProcessPoolExecutor] = None
+        self._cpu_pool_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._tasks = []
+
+    def cpu_pool(self) -> ProcessPoolExecutor:
+        # Created on first use: most processes never run a CPU-heavy step.
+        # Spawned rather than forked, since this process has threads running.
+        with self._cpu_pool_lock:
+            if self._cpu_pool is None:
+                self._cpu_pool = ProcessPoolExecutor(
+                    self.cpu_workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._cpu_pool
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f"job-worker-{n}") for n in range(self.workers)
+        ]
+
+    def notify(self):
+        """Wakes idle workers to look for new jobs. Safe to call from any thread."""
+        if self._loop is not None and not self._stopping:
+            self._loop.call_soon_threadsafe(self._wake.set)  # type:ignore
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            try:
+                job = await loop.run_in_executor(self._threads, self._claim)
+            except Exception as e:
+                print(f"Error while claiming a background job: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), settings.JOB_POLL_INTERVAL_SECONDS)  # type:ignore
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()  # type:ignore
+                continue
+            await self._run(job)
+
+    def _claim(self) -> Optional[Job]:
+        with Session(engine) as db:
+            return claim_next_job(db)
+
+    async def _run(self, job: Job):
+        loop = asyncio.get_running_loop()
+        self.running[job.id] = job.kind  # type:ignore
+        try:
+            future = loop.run_in_executor(self._threads, self._execute, job)
+            heartbeat = settings.JOB_STALE_SECONDS / 5
+            while True:
+                done, _ = await asyncio.wait({future}, timeout=heartbeat)
+                if done:
+                    break
+                await loop.run_in_executor(self._threads, _update_job, job.id, JobStatus.RUNNING)
+        finally:
+            self.running.pop(job.id, None)  # type:ignore
+
+    def _execute(self, job: Job):
+        """Runs one job in a job thread and records how it ended."""
+        started = time.perf_counter()
+        kind = JOB_KINDS.get(job.kind)
+        with Session(engine, expire_on_commit=False) as db:
+            ctx = JobContext(self, job, db)
+            try:
+                if kind is None:
+                    raise ValueError(f"Unknown job kind '{job.kind}'.")
+                if kind.params_model is None:
+                    result = kind.run(ctx)
+                else:
+                    result = kind.run(ctx, kind.params_model.model_validate(job.params))
+            except JobCancelled:
+                db.rollback()
+                _update_job(job.id, JobStatus.RUNNING, status=JobStatus.QUEUED, started_at=None,  # type:ignore
+                            message="Interrupted by a shutdown; queued again.")
+                JOBS_TOTAL.inc(job.kind, "requeued")
+                print(f"Background job {job.id} ({job.kind}) interrupted by shutdown, queued again.")
+                return
+            except Exception as e:
+                db.rollback()
+                _update_job(job.id, JobStatus.RUNNING, status=JobStatus.FAILED,  # type:ignore
+                            finished_at=_now(), error=str(e)[:_MAX_ERROR_LENGTH] or type(e).__name__)
+                JOBS_TOTAL.inc(job.kind, "failed")
+                print(f"Background job {job.id} ({job.kind}) failed: {e}")
+                return
+        _update_job(job.id, JobStatus.RUNNING, status=JobStatus.DONE, progress=1.0,  # type:ignore
+                    finished_at=_now(), result=result, result_path=ctx.result_path)
+        JOBS_TOTAL.inc(job.kind, "done")
+        print(f"Background job {job.id} ({job.kind}) done in {time.perf_counter() - started:.2f}s.")
+
+    async def drain(self, timeout: float):
+        """
+        Stops claiming jobs and waits up to `timeout` seconds for running ones.
+        Jobs still running are then asked to stop and queued again; one that
+        doesn't report progress is left to finish in its thread, or is queued
+        again by another process once its heartbeat goes stale.
+        """
+        self._stopping = True
+        if self._wake is not None:
+            self._wake.set()
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+            if pending:
+                print(f"Stopping {len(self.running)} background jobs still running after {timeout:.0f}s...")
+                self.cancel_requested = True
+                _, pending = await asyncio.wait(pending, timeout=_CANCEL_GRACE_SECONDS)
+                for task in pending:
+                    task.cancel()
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._cpu_pool is not None:
+            self._cpu_pool.shutdown(wait=False, cancel_futures=True)
+
+
+job_runner = JobRunner(settings.JOB_WORKERS, settings.JOB_CPU_WORKERS)
+
+metrics.registry.register(metrics.Gauge(
+    "background_jobs_running", "Background jobs running in this process.",
+    callback=lambda: float(len(job_runner.running))))
@@ -0,0 +1,271 @@
+"""
+Prometheus-format metrics.
+
+A small in-process registry (counters, gauges, histograms) rendered in the
+Prometheus text exposition format at /metrics, fed by:
+
+- `MetricsMiddleware`: per-route latency histograms, status codes and in-flight requests
+- SQLAlchemy cursor hooks on the engine: query counts and DB time, both in
+  total and attributed to the request that issued them
+
+Per-request database figures are collected on a `RequestStats` object held in
+a context variable, which also follows sync endpoints into the threadpool.
+"""
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """A settable gauge, or one computed on scrape when `callback` is given."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def _samples(self) -> List[str]:
+        if self._callback is not None:
+            return [f"{self.name} {_format_value(self._callback())}"]
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # labels -> [per-bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for labels, state in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} "
+                             f"{_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {_format_value(state[-1])}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUESTS_TOTAL = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status code.", ("method", "route", "status")))
+REQUEST_LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route")))
+REQUESTS_IN_PROGRESS = registry.register(Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served.", ("method",)))
+REQUEST_DB_QUERIES = registry.register(Histogram(
+    "http_request_db_queries", "SQL statements issued per request, by route.", ("method", "route"),
+    buckets=QUERY_COUNT_BUCKETS))
+REQUEST_DB_SECONDS = registry.register(Histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per request, by route.", ("method", "route")))
+DB_QUERIES_TOTAL = registry.register(Counter(
+    "db_queries_total", "SQL statements executed."))
+DB_QUERY_SECONDS_TOTAL = registry.register(Counter(
+    "db_query_seconds_total", "Total time spent executing SQL statements."))
+
+
+# --- Per-request database accounting ---
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_seconds: float = 0.0
+    route: str = "unmatched"
+    scope: Optional[dict] = None
+
+    def current_route(self) -> str:
+        """The route template, also usable while the request is still being handled."""
+        return route_template(self.scope) if self.scope is not None else self.route
+
+
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+# Extra per-statement hooks, called as observer(statement, parameters, executemany, elapsed, stats)
+statement_observers: List[Callable] = []
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # One value, not a stack: a connection runs one statement at a time, and a
+    # failed statement's start time is simply overwritten by the next one
+    conn.info["query_start_time"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop("query_start_time")
+    DB_QUERIES_TOTAL.inc()
+    DB_QUERY_SECONDS_TOTAL.inc(amount=elapsed)
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+    for observer in statement_observers:
+        observer(statement, parameters, executemany, elapsed, stats)
+
+
+def instrument_engine(engine: Engine):
+    """Attaches the query counting hooks to an engine (idempotent)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# --- HTTP middleware ---
+
+
+def route_template(scope) -> str:
+    """The matched route's path template, keeping label cardinality bounded."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request metrics."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        stats = RequestStats(scope=scope)
+        token = current_request_stats.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            stats.route = route_template(scope)
+            REQUESTS_IN_PROGRESS.dec(method)
+            REQUESTS_TOTAL.inc(method, stats.route, str(status_code))
+            REQUEST_LATENCY.observe(elapsed, method, stats.route)
+            REQUEST_DB_QUERIES.observe(stats.queries, method, stats.route)
+            REQUEST_DB_SECONDS.observe(stats.db_seconds, method, stats.route)
+            current_request_stats.reset(token)
@@ -1,6 +1,9 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
+from datetime import datetime
 from sqlmodel import Field, Relationship, SQLModel
+from sqlalchemy import JSON, Index
 from enum import Enum
+from src.config import settings
 
 # --- Enums for choices ---
 
@@ -32,6 +35,13 @@ class ClearanceStatusEnum(str, Enum):
     APPROVED = "approved"
     REJECTED = "rejected"
 
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
 # --- Database Table Models ---
 
 
@@ -46,8 +56,11 @@ class User(SQLModel, table=True):
     department: Optional[Department] = None
     # For staff members - which clearance dept they manage
     clearance_department: Optional[ClearanceDepartment] = None
+    # For students - the Student record this login belongs to
+    student_id: Optional[int] = Field(default=None, foreign_key="student.id", index=True, unique=True)
     rfid_tag: Optional["RFIDTag"] = Relationship(
         back_populates="user", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+    student: Optional["Student"] = Relationship(back_populates="user")
 
 
 class Student(SQLModel, table=True):
@@ -56,19 +69,38 @@ class Student(SQLModel, table=True):
     matric_no: str = Field(index=True, unique=True)
     email: str = Field(index=True, unique=True)
     department: Department
+    # Bumped on every change to the student's profile, tag or clearance rows.
+    # Used to build ETags for the clearance read endpoints.
+    version: int = Field(default=1)
+    # The session the student is clearing in, e.g. "2024/2025". Closed sessions
+    # are moved to the archive tables (see src/crud/archive.py).
+    academic_session: str = Field(default_factory=lambda: settings.CURRENT_ACADEMIC_SESSION, index=True)
     # A student's login is handled by their associated User record, not directly here.
     rfid_tag: Optional["RFIDTag"] = Relationship(
         back_populates="student", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
     clearance_statuses: List["ClearanceStatus"] = Relationship(
         back_populates="student", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+    user: Optional["User"] = Relationship(back_populates="student")
 
 
 class ClearanceStatus(SQLModel, table=True):
+    __table_args__ = (
+        # Serves the per-department work queue as a single index range scan within the current session
+        Index("ix_clearancestatus_session_department_status_id", "academic_session", "department", "status", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     department: ClearanceDepartment
     status: ClearanceStatusEnum = Field(default=ClearanceStatusEnum.PENDING)
     remarks: Optional[str] = None
     student_id: int = Field(foreign_key="student.id")
+    # Incremented on every update; clients send it back to detect concurrent edits
+    version: int = Field(default=1)
+    # Work lease: the staff user currently handling this item, until the lease expires
+    claimed_by: Optional[int] = Field(default=None, foreign_key="user.id")
+    claim_expires_at: Optional[datetime] = None
+    # Always the student's session, so session-scoped queries don't need the join
+    academic_session: str = Field(default_factory=lambda: settings.CURRENT_ACADEMIC_SESSION)
     student: "Student" = Relationship(back_populates="clearance_statuses")
 
 
@@ -90,6 +122,77 @@ class Device(SQLModel, table=True):
     department: Department  # ADD THIS - referenced in devices.py CRUD
     is_active: bool = Field(default=True)
 
+class ClearanceCounter(SQLModel, table=True):
+    """
+    Pre-aggregated dashboard counts, kept current by deltas applied in the same
+    transaction as each write and periodically reconciled against the source tables.
+    Names: "total_students", "overall:<state>", "department:<department>:<status>".
+    """
+    name: str = Field(primary_key=True)
+    value: int = Field(default=0)
+
+
+class Job(SQLModel, table=True):
+    """A background job, run by the JobRunner in src/jobs.py and polled through /jobs."""
+    __table_args__ = (
+        # Runners claim the oldest queued job
+        Index("ix_job_status_id", "status", "id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str
+    params: Dict[str, Any] = Field(default_factory=dict, sa_type=JSON)
+    status: JobStatus = Field(default=JobStatus.QUEUED)
+    progress: float = Field(default=0.0)  # 0..1
+    message: Optional[str] = None
+    # Small results are stored inline; large ones (exports) as a file under JOB_RESULTS_DIR
+    result: Optional[Dict[str, Any]] = Field(default=None, sa_type=JSON)
+    result_path: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = Field(default=0)
+    created_by: Optional[int] = Field(default=None, foreign_key="user.id")
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # Heartbeat of the runner holding the job; a stale one means its process is gone
+    updated_at: datetime
+
+
+# --- Archive (cold) tables ---
+# Closed academic sessions, moved out of the live tables in bulk by src/crud/archive.py.
+# Nothing on the request path reads them.
+
+
+class StudentArchive(SQLModel, table=True):
+    __tablename__ = "student_archive"
+
+    id: int = Field(primary_key=True)  # The id the student had in the live table
+    full_name: str
+    matric_no: str = Field(index=True)
+    email: str
+    department: Department
+    version: int
+    academic_session: str = Field(index=True)
+    # The RFID tag the student had when archived; the tag itself is freed for reuse
+    tag_id: Optional[str] = None
+    archived_at: datetime
+
+
+class ClearanceStatusArchive(SQLModel, table=True):
+    __tablename__ = "clearancestatus_archive"
+    # One partition per archived session on PostgreSQL, created by the archival job,
+    # so a whole cohort can later be detached or dropped at once. Ignored elsewhere.
+    __table_args__ = {"postgresql_partition_by": "LIST (academic_session)"}
+
+    # The partition key has to be part of the primary key
+    id: int = Field(primary_key=True)
+    academic_session: str = Field(primary_key=True)
+    department: ClearanceDepartment
+    status: ClearanceStatusEnum
+    remarks: Optional[str] = None
+    student_id: int = Field(index=True)
+    version: int
+
 # --- Pydantic Models for API Operations ---
 
 # Token Model
@@ -154,6 +257,10 @@ class StudentRead(SQLModel):
     full_name: str
     matric_no: str
     department: Department
+    academic_session: Optional[str] = None
+
+class StudentSearchResult(StudentRead):
+    email: str
 
 # Clearance Status Models
 
@@ -162,6 +269,78 @@ class ClearanceStatusRead(SQLModel):
     department: ClearanceDepartment
     status: ClearanceStatusEnum
     remarks: Optional[str] = None
+    version: int = 1
+
+
+class WorkQueueItem(SQLModel):
+    clearance_id: int
+    student_id: int
+    matric_no: str
+    full_name: str
+    student_department: Department
+    department: ClearanceDepartment
+    status: ClearanceStatusEnum
+    remarks: Optional[str] = None
+    version: int = 1
+    claimed_by: Optional[int] = None
+    claim_expires_at: Optional[datetime] = None
+
+
+class WorkQueuePage(SQLModel):
+    items: List[WorkQueueItem] = []
+    # Pass as `after` to fetch the next page; None when there are no more items
+    next_cursor: Optional[int] = None
+
+
+class ClaimRequest(SQLModel):
+    count: int = Field(default=10, ge=1, le=100)
+    # Lease length; defaults to CLAIM_LEASE_SECONDS
+    lease_seconds: Optional[int] = Field(default=None, ge=30, le=3600)
+    # Only used by admins, staff always claim from their own clearance department
+    department: Optional[ClearanceDepartment] = None
+
+
+class ReleaseRequest(SQLModel):
+    clearance_ids: List[int]
+
+
+class AcademicSessionSummary(SQLModel):
+    academic_session: str
+    current: bool
+    live_students: int
+    archived_students: int
+
+
+class SessionArchiveRequest(SQLModel):
+    academic_session: str = Field(schema_extra={"pattern": r"^\d{4}/\d{4}$"})
+
+
+class JobSubmit(SQLModel):
+    kind: str
+    params: Dict[str, Any] = {}
+
+
+class JobRead(SQLModel):
+    id: int
+    kind: str
+    params: Dict[str, Any] = {}
+    status: JobStatus
+    progress: float
+    message: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    # Where to download the result file from, for jobs that produce one
+    result_url: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class JobKindRead(SQLModel):
+    kind: str
+    description: str
+    params_schema: Optional[Dict[str, Any]] = None
 
 
 class ClearanceUpdate(SQLModel):
@@ -169,6 +348,8 @@ class ClearanceUpdate(SQLModel):
     department: ClearanceDepartment
     status: ClearanceStatusEnum
     remarks: Optional[str] = None
+    # Optional precondition: the version the client last saw. A mismatch returns 409.
+    version: Optional[int] = None
 
 # Combined Read Model
 
@@ -0,0 +1,225 @@
+"""
+Query-count budgets and slow-query logging.
+
+- `query_budget(n)`: a context manager that fails if the code inside issues more
+  than `n` SQL statements, listing them in the error. Also available as the
+  `query_budget` pytest fixture once this module is loaded as a plugin
+  (`pytest_plugins = ["src.query_budget"]` in a conftest).
+- `ENDPOINT_QUERY_BUDGETS`: the per-endpoint budget registry. `QueryBudgetMiddleware`
+  checks every request against it, counts and logs violations, and keeps them in
+  `budget_violations` so the `endpoint_query_budgets` fixture can fail a test run.
+- A sampled slow-query log (statement, parameter shape, duration, route) for
+  statements slower than `SLOW_QUERY_THRESHOLD_MS`.
+
+Request attribution relies on the metrics hooks, so the middleware and the
+slow-query route need `METRICS_ENABLED`.
+"""
+import random
+import re
+import sys
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src import metrics
+from src.config import settings
+
+# Maximum SQL statements per request, keyed by "METHOD /route/template".
+# Authentication counts too. A list endpoint whose count grows with the page
+# size is an N+1 and should be fixed rather than given a bigger budget.
+ENDPOINT_QUERY_BUDGETS: Dict[str, int] = {
+    "POST /token": 1,
+    "GET /users/me": 1,
+    "GET /admin/students/": 4,
+    "GET /admin/students/search": 2,
+    "GET /admin/clearance/overview": 2,
+    "GET /clearance/statistics": 4,
+    "GET /clearance/students/cleared": 4,
+    "GET /clearance/students/{student_id}/summary": 6,
+    "GET /clearance/queue": 2,
+    "PUT /clearance/update": 5,
+    "GET /students/me/clearance": 1,
+    "GET /analytics/crosstab": 3,
+    "GET /analytics/completion": 3,
+}
+
+BUDGET_EXCEEDED_TOTAL = metrics.registry.register(metrics.Counter(
+    "http_request_query_budget_exceeded_total",
+    "Requests that issued more SQL statements than their route's budget.", ("method", "route")))
+SLOW_QUERIES_TOTAL = metrics.registry.register(metrics.Counter(
+    "db_slow_queries_total", "SQL statements slower than the slow-query threshold.", ("route",)))
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a block issues more SQL statements than its budget allows."""
+
+    def __init__(self, label: str, budget: int, statements: List[str]):
+        self.label = label
+        self.budget = budget
+        self.statements = statements
+        listing = "\n".join(f"  {i}. {s}" for i, s in enumerate(statements, 1))
+        super().__init__(
+            f"{label or 'Block'} issued {len(statements)} SQL statements, budget is {budget}:\n{listing}")
+
+
+def _compact(statement: str, limit: int = 500) -> str:
+    statement = re.sub(r"\s+", " ", statement).strip()
+    return statement if len(statement) <= limit else statement[:limit] + "..."
+
+
+def params_shape(parameters, executemany: bool = False) -> str:
+    """Describes bound parameters by type only, so values (names, emails, hashes) never reach the log."""
+    if executemany and isinstance(parameters, (list, tuple)):
+        first = params_shape(parameters[0]) if parameters else "()"
+        return f"{len(parameters)} x {first}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(v).__name__ for v in parameters) + ")"
+    return type(parameters).__name__
+
+
+# --- Statement capture for query_budget() ---
+
+
+@dataclass
+class QueryLog:
+    """Statements captured while a `query_budget` block is active."""
+    statements: List[str] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+_active_logs: List[QueryLog] = []
+_active_lock = threading.Lock()
+
+
+def _capture_statement(conn, cursor, statement, parameters, context, executemany):
+    # Global rather than per-thread: a test client runs sync endpoints in a worker
+    # thread, and those statements must count against the test's budget.
+    with _active_lock:
+        for log in _active_logs:
+            log.statements.append(_compact(statement, limit=200))
+
+
+@contextmanager
+def query_budget(max_queries: int, label: str = "", engine: Optional[Engine] = None) -> Iterator[QueryLog]:
+    """
+    Fails with QueryBudgetExceeded if the block issues more than `max_queries`
+    statements on `engine` (the application engine by default).
+
+        with query_budget(4, "GET /admin/students/"):
+            client.get("/admin/students/", headers=admin_headers)
+    """
+    if engine is None:
+        from src.database import engine
+    log = QueryLog()
+    with _active_lock:
+        if not _active_logs:
+            event.listen(engine, "after_cursor_execute", _capture_statement)
+        _active_logs.append(log)
+    try:
+        yield log
+    finally:
+        with _active_lock:
+            _active_logs.remove(log)
+            if not _active_logs:
+                event.remove(engine, "after_cursor_execute", _capture_statement)
+    if log.count > max_queries:
+        raise QueryBudgetExceeded(label, max_queries, log.statements)
+
+
+# --- Per-endpoint budgets ---
+
+
+# (endpoint, budget, queries) for every request that went over, newest last.
+# Bounded so a long-running server doesn't accumulate them forever.
+budget_violations: List[Tuple[str, int, int]] = []
+_MAX_RECORDED_VIOLATIONS = 1000
+
+
+def endpoint_key(method: str, route: str) -> str:
+    return f"{method} {route}"
+
+
+def check_endpoint_budget(method: str, route: str, queries: int) -> Optional[int]:
+    """Returns the budget if the request went over it, otherwise None."""
+    key = endpoint_key(method, route)
+    budget = ENDPOINT_QUERY_BUDGETS.get(key)
+    if budget is None or queries <= budget:
+        return None
+    BUDGET_EXCEEDED_TOTAL.inc(method, route)
+    print(f"Query budget exceeded: {key} issued {queries} SQL statements, budget is {budget}")
+    if len(budget_violations) < _MAX_RECORDED_VIOLATIONS:
+        budget_violations.append((key, budget, queries))
+    return budget
+
+
+class QueryBudgetMiddleware:
+    """
+    Pure ASGI middleware checking each request against ENDPOINT_QUERY_BUDGETS.
+    Must sit inside MetricsMiddleware, which sets up the per-request counts.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        stats = metrics.current_request_stats.get() if scope["type"] == "http" else None
+        if stats is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            check_endpoint_budget(scope["method"], metrics.route_template(scope), stats.queries)
+
+
+# --- Slow-query log ---
+
+
+def _log_slow_query(statement, parameters, executemany: bool, elapsed: float,
+                    stats: Optional[metrics.RequestStats]):
+    if elapsed * 1000 < settings.SLOW_QUERY_THRESHOLD_MS:
+        return
+    route = stats.current_route() if stats is not None else "background"
+    SLOW_QUERIES_TOTAL.inc(route)
+    if random.random() >= settings.SLOW_QUERY_SAMPLE_RATE:
+        return
+    print(f"Slow query ({elapsed * 1000:.1f} ms) on {route}: {_compact(statement)} "
+          f"params={params_shape(parameters, executemany)}")
+
+
+def enable_slow_query_log():
+    """Registers the slow-query log with the metrics cursor hooks (idempotent)."""
+    if _log_slow_query not in metrics.statement_observers:
+        metrics.statement_observers.append(_log_slow_query)
+
+
+# --- pytest plugin ---
+
+# Only when pytest is already running: importing it costs ~100 ms of worker startup
+pytest = sys.modules.get("pytest")
+
+if pytest is not None:
+    @pytest.fixture(name="query_budget")
+    def query_budget_fixture():
+        """The `query_budget` context manager, e.g. `with query_budget(3): ...`."""
+        return query_budget
+
+    @pytest.fixture
+    def endpoint_query_budgets():
+        """Fails the test if any request made during it exceeded ENDPOINT_QUERY_BUDGETS."""
+        budget_violations.clear()
+        yield ENDPOINT_QUERY_BUDGETS
+        violations = list(budget_violations)
+        budget_violations.clear()
+        if violations:
+            pytest.fail("Query budgets exceeded:\n" + "\n".join(
+                f"  {key}: {queries} statements, budget {budget}" for key, budget, queries in violations))
@@ -0,0 +1,242 @@
+"""
+Admission control for device and login traffic.
+
+Token buckets, keyed by device API key, user or client IP, with a separate
+budget per route group (`/rfid/*`, `/admin/scanners/*`, `/token`). The check
+runs in an ASGI middleware before routing, so a rejected request is a cheap
+429 that never reaches a dependency, the database or bcrypt.
+
+Callers choose their own headers, so only verified identities get a bucket of
+their own: bearer tokens by signature, and device API keys once the device
+auth dependency has matched them to an active `Device` (see VerifiedApiKeys).
+Anything else, and every `/token` request, is keyed by client IP, so sending a
+fresh made-up key or token doesn't buy a fresh bucket.
+
+Buckets live in process memory by default. Set `RATE_LIMIT_REDIS_URL` to share
+them between workers (requires the optional `redis` package).
+"""
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.config import settings
+from src.tokens import decode_access_token
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    name: str
+    path_prefix: str
+    per_minute: int
+    burst: int
+    # Key every request by client IP, whatever credentials it carries
+    by_ip_only: bool = False
+
+    @property
+    def rate(self) -> float:
+        """Tokens added per second."""
+        return self.per_minute / 60.0
+
+
+# --- Backends ---
+
+
+class InMemoryBackend:
+    """
+    Per-process token buckets. The number of tracked keys is bounded; the least
+    recently used buckets are dropped first, which at worst resets a client to a full bucket.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_keys = max_keys
+
+    def take(self, key: str, rate: float, capacity: int) -> float:
+        """Consumes a token. Returns 0 if allowed, otherwise seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (float(capacity), now))
+            tokens = min(float(capacity), tokens + (now - last) * rate)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self._max_keys:
+                self._buckets.popitem(last=False)
+            return retry_after
+
+
+_REDIS_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(retry_after)
+"""
+
+
+class RedisBackend:
+    """Token buckets shared by every worker, updated atomically by a Lua script."""
+
+    def __init__(self, url: str):
+        import redis  # Optional dependency, only needed for multi-worker setups
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(_REDIS_TOKEN_BUCKET)
+
+    def take(self, key: str, rate: float, capacity: int) -> float:
+        return float(self._script(keys=[f"ratelimit:{key}"], args=[rate, capacity, time.time()]))
+
+
+class VerifiedApiKeys:
+    """
+    Device API keys this process has seen belong to an active device, so the
+    limiter can trust them as bucket keys. Bounded like the buckets; a key that
+    drops out is keyed by IP until the device authenticates again.
+    """
+
+    def __init__(self, max_keys: int = 10_000):
+        self._keys: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_keys = max_keys
+
+    def add(self, api_key: str):
+        with self._lock:
+            self._keys[api_key] = None
+            self._keys.move_to_end(api_key)
+            if len(self._keys) > self._max_keys:
+                self._keys.popitem(last=False)
+
+    def discard(self, api_key: str):
+        with self._lock:
+            self._keys.pop(api_key, None)
+
+    def __contains__(self, api_key: str) -> bool:
+        return api_key in self._keys
+
+
+verified_api_keys = VerifiedApiKeys()
+
+
+# --- Policies and checks ---
+
+
+POLICIES: List[RateLimitPolicy] = [
+    RateLimitPolicy("rfid", "/rfid/", settings.RATE_LIMIT_RFID_PER_MINUTE, settings.RATE_LIMIT_RFID_BURST),
+    RateLimitPolicy("scanners", "/admin/scanners/",
+                    settings.RATE_LIMIT_SCANNERS_PER_MINUTE, settings.RATE_LIMIT_SCANNERS_BURST),
+    RateLimitPolicy("token", "/token", settings.RATE_LIMIT_TOKEN_PER_MINUTE, settings.RATE_LIMIT_TOKEN_BURST,
+                    by_ip_only=True),
+]
+POLICIES_BY_NAME: Dict[str, RateLimitPolicy] = {p.name: p for p in POLICIES}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = RedisBackend(settings.RATE_LIMIT_REDIS_URL) if settings.RATE_LIMIT_REDIS_URL \
+                    else InMemoryBackend()
+    return _backend
+
+
+def check_rate_limit(policy: RateLimitPolicy, key: str) -> float:
+    """
+    Consumes one token of `policy` for `key`. Returns 0 if the request may proceed,
+    otherwise the number of seconds the client should wait. Fails open if a shared
+    backend is unreachable, so an outage there doesn't take the API down with it.
+    """
+    try:
+        return get_backend().take(f"{policy.name}:{key}", policy.rate, policy.burst)
+    except Exception as e:
+        print(f"Rate limiter backend error, allowing request: {e}")
+        return 0.0
+
+
+def _bearer_subject(authorization: str, state: Optional[dict] = None) -> Optional[str]:
+    """
+    The user a bearer token was issued to. Only the signature is checked, never the DB.
+    The decoded claims are left in `state` for the auth dependencies to reuse.
+    """
+    if not authorization.startswith("Bearer "):
+        return None
+    payload = decode_access_token(authorization[7:], state)
+    return payload.get("sub") if payload else None
+
+
+def client_key(headers: Dict[str, str], client_host: Optional[str], state: Optional[dict] = None,
+               by_ip_only: bool = False) -> str:
+    """Identifies the caller: verified device API key, then authenticated user, then client IP."""
+    if by_ip_only:
+        return f"ip:{client_host or 'unknown'}"
+    api_key = headers.get("x-api-key")
+    if api_key and api_key in verified_api_keys:
+        return f"device:{api_key}"
+    subject = _bearer_subject(headers.get("authorization", ""), state)
+    if subject:
+        return f"user:{subject}"
+    return f"ip:{client_host or 'unknown'}"
+
+
+def too_many_requests_body(retry_after: float) -> Tuple[bytes, List[Tuple[bytes, bytes]]]:
+    body = json.dumps({"detail": "Too many requests. Please slow down."}).encode("utf-8")
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode("latin-1")),
+        (b"retry-after", str(max(1, math.ceil(retry_after))).encode("latin-1")),
+    ]
+    return body, headers
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware applying POLICIES by path prefix."""
+
+    def __init__(self, app, policies: Optional[List[RateLimitPolicy]] = None,
+                 check: Callable[[RateLimitPolicy, str], float] = check_rate_limit):
+        self.app = app
+        self.policies = policies if policies is not None else POLICIES
+        self.check = check
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        policy = next((p for p in self.policies if path.startswith(p.path_prefix)), None)
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        client = scope.get("client")
+        key = client_key(headers, client[0] if client else None, scope.setdefault("state", {}), policy.by_ip_only)
+        retry_after = self.check(policy, key)
+        if not retry_after:
+            await self.app(scope, receive, send)
+            return
+
+        body, response_headers = too_many_requests_body(retry_after)
+        await send({"type": "http.response.start", "status": 429, "headers": response_headers})
+        await send({"type": "http.response.body", "body": body})
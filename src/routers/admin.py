@@ -2,17 +2,25 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlmodel import Session, SQLModel
 from typing import List, Optional, Dict
 
-from src.database import get_session
+from src.database import get_session, read_session
 from src.auth import get_current_active_user, get_api_key, get_current_user_or_device, AuthenticatedEntity
 from src.models import (
     User, UserCreate, UserRead, UserUpdate, Role,
-    Student, StudentCreate, StudentReadWithClearance, StudentUpdate, StudentRead,
-    TagLink, RFIDTagRead, Device, DeviceCreate, DeviceRead, TagScan
+    Student, StudentCreate, StudentReadWithClearance, StudentUpdate, StudentRead, StudentSearchResult,
+    TagLink, RFIDTagRead, Device, DeviceCreate, DeviceRead, TagScan,
+    ClearanceDepartment, ClearanceStatusEnum,
+    AcademicSessionSummary, SessionArchiveRequest, JobRead
 )
 from src.crud import users as user_crud
 from src.crud import students as student_crud
 from src.crud import tag_linking as tag_crud
 from src.crud import devices as device_crud
+from src.crud import counters as counter_crud
+from src.crud import archive as archive_crud
+from src.serialization import students_response
+from src.device_format import TAG_REQUEST_BODY, scanned_tag_id
+from src.single_flight import aggregate_cache
+from src.routers.jobs import queue_job
 
 # --- New State Management for Secure Admin Scanning ---
 
@@ -61,15 +69,16 @@ def activate_admin_scanner(
     return
 
 
-@router.post("/scanners/scan", status_code=status.HTTP_204_NO_CONTENT)
+@router.post("/scanners/scan", status_code=status.HTTP_204_NO_CONTENT, openapi_extra=TAG_REQUEST_BODY)
 def receive_scan_from_activated_device(
-    scan_data: TagScan,
+    tag_id: str = Depends(scanned_tag_id),
     # Device authenticates with its API Key (API key only)
     api_key: str = Depends(get_api_key)
 ):
     """
     STEP 2 (Device): The ESP32 device sends the scanned tag to this endpoint.
     This endpoint requires API key authentication (devices only).
+    The tag may be sent as JSON (`{"tag_id": "..."}`) or as a bare text/plain body.
     """
     # Check if this device was activated by an admin.
     admin_id = activated_scanners.pop(api_key, None)
@@ -78,7 +87,7 @@ def receive_scan_from_activated_device(
                             detail="This scanner has not been activated for a scan.")
 
     # Store the scanned tag against the admin who was waiting for it.
-    admin_scanned_tags[admin_id] = scan_data.tag_id
+    admin_scanned_tags[admin_id] = tag_id
     return
 
 
@@ -130,7 +139,7 @@ def read_all_students(
         get_current_user_or_device(required_roles=[Role.ADMIN, Role.STAFF]))
 ):
     """(Admin & Staff) Retrieves a list of all student records."""
-    return student_crud.get_all_students(db, skip=skip, limit=limit)
+    return students_response(student_crud.get_all_students(db, skip=skip, limit=limit))
 
 
 @router.get("/students/lookup", response_model=StudentReadWithClearance)
@@ -164,6 +173,20 @@ def lookup_student(
     return db_student
 
 
+@router.get("/students/search", response_model=List[StudentSearchResult])
+def search_students(
+    q: str = Query(..., min_length=1, max_length=100,
+                   description="Part of a name, matriculation number or email."),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_session),
+    auth: AuthenticatedEntity = Depends(
+        get_current_user_or_device(required_roles=[Role.ADMIN, Role.STAFF]))
+):
+    """(Admin & Staff) Ranked, paginated typeahead search over students."""
+    return student_crud.search_students(db, query=q, skip=skip, limit=limit)
+
+
 @router.get("/students/{student_id}", response_model=StudentReadWithClearance)
 def read_single_student(student_id: int, db: Session = Depends(get_session)):
     """(Admin & Staff) Retrieves a single student's complete record by their internal ID."""
@@ -222,7 +245,10 @@ def unlink_rfid_tag(
 # --- Super Admin Only Functions ---
 
 def require_super_admin(current_user: User = Depends(get_current_active_user())):
-    """Dependency to ensure a user has the ADMIN role."""
+    """
+    Dependency to ensure a user has the ADMIN role.
+    Shares the request's cached principal, so it adds no token decode or user lookup.
+    """
     if current_user.role != Role.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -311,6 +337,32 @@ def delete_student_record(student_id: int, db: Session = Depends(get_session)):
     return deleted_student
 
 
+@router.get("/sessions", response_model=List[AcademicSessionSummary], dependencies=[Depends(require_super_admin)])
+def read_academic_sessions(db: Session = Depends(get_session)):
+    """(Super Admin Only) Lists academic sessions with their live and archived student counts."""
+    return archive_crud.list_sessions(db)
+
+
+@router.post("/sessions/archive", response_model=JobRead, status_code=status.HTTP_202_ACCEPTED,
+             dependencies=[Depends(require_super_admin)])
+def archive_academic_session(
+    request: SessionArchiveRequest,
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_active_user()),
+):
+    """
+    (Super Admin Only) Starts a background job moving a closed session's students
+    and clearance records out of the live tables into the archive, freeing their
+    RFID tags. Poll the returned job at GET /jobs/{job_id}.
+    """
+    # Checked here too, so a doomed job is refused up front instead of failing later
+    try:
+        archive_crud.check_archivable(request.academic_session)
+    except archive_crud.ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return queue_job(db, "archive_session", request.model_dump(), current_user)
+
+
 @router.post("/devices/", response_model=DeviceRead, status_code=status.HTTP_201_CREATED, dependencies=[Depends(require_super_admin)])
 def create_device(device: DeviceCreate, db: Session = Depends(get_session)):
     """(Super Admin Only) Registers a new RFID hardware device."""
@@ -337,66 +389,37 @@ def delete_device_registration(device_id: int, db: Session = Depends(get_session
     return deleted_device
 
 
-@router.get("/clearance/overview")
-def get_clearance_overview(
-    db: Session = Depends(get_session),
-    auth: AuthenticatedEntity = Depends(get_current_user_or_device(
-        required_roles=[Role.ADMIN, Role.STAFF]))
-):
-    """Get comprehensive clearance overview for admin dashboard."""
-    all_students = student_crud.get_all_students(db)
+def _clearance_overview() -> dict:
+    with read_session() as db:
+        counters = counter_crud.get_counters(db)
 
-    overview = {
-        "total_students": len(all_students),
+    return {
+        "total_students": counters[counter_crud.TOTAL_STUDENTS],
         "clearance_summary": {
-            "fully_cleared": 0,
-            "partially_cleared": 0,
-            "pending": 0,
-            "rejected": 0,
-            "not_started": 0
+            state: counters[counter_crud.overall_counter(state)]
+            for state in counter_crud.OVERALL_STATES
         },
         "recent_activity": [],
-        "department_breakdown": {}
-    }
-
-    # Initialize department breakdown
-    from src.models import ClearanceDepartment
-    for dept in ClearanceDepartment:
-        overview["department_breakdown"][dept.value] = {
-            "approved": 0,
-            "pending": 0,
-            "rejected": 0
+        "department_breakdown": {
+            dept.value: {
+                clearance_status.value: counters[counter_crud.department_counter(dept, clearance_status)]
+                for clearance_status in (ClearanceStatusEnum.APPROVED, ClearanceStatusEnum.PENDING, ClearanceStatusEnum.REJECTED)
+            }
+            for dept in ClearanceDepartment
         }
+    }
 
-    # Calculate statistics
-    for student in all_students:
-        if not student.clearance_statuses:
-            overview["clearance_summary"]["not_started"] += 1
-            continue
 
-        approved_count = sum(
-            1 for status in student.clearance_statuses
-            if status.status.value == "approved"
-        )
-        total_departments = len(student.clearance_statuses)
-        has_rejection = any(status.status.value ==
-                            "rejected" for status in student.clearance_statuses)
-
-        # Update overall statistics
-        if has_rejection:
-            overview["clearance_summary"]["rejected"] += 1
-        elif approved_count == total_departments:
-            overview["clearance_summary"]["fully_cleared"] += 1
-        elif approved_count > 0:
-            overview["clearance_summary"]["partially_cleared"] += 1
-        else:
-            overview["clearance_summary"]["pending"] += 1
-
-        # Update department breakdown
-        for status in student.clearance_statuses:
-            dept_name = status.department.value
-            status_value = status.status.value
-            if dept_name in overview["department_breakdown"]:
-                overview["department_breakdown"][dept_name][status_value] += 1
-
-    return overview
+@router.get("/clearance/overview")
+async def get_clearance_overview(
+    db: Session = Depends(get_session),
+    auth: AuthenticatedEntity = Depends(get_current_user_or_device(
+        required_roles=[Role.ADMIN, Role.STAFF]))
+):
+    """
+    Get comprehensive clearance overview for admin dashboard.
+    Served from the pre-aggregated counters table, so the cost doesn't grow with the student count,
+    and computed at most once per AGGREGATE_CACHE_TTL_SECONDS however many dashboards ask.
+    """
+    db.close()  # Don't hold the connection authentication used while waiting on the shared result
+    return await aggregate_cache.get("admin_clearance_overview", _clearance_overview)
@@ -0,0 +1,99 @@
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlmodel import Session
+
+from src.database import get_session
+from src.auth import get_current_active_user
+from src.models import Role, ClearanceDepartment
+from src.analytics import (
+    CLEARANCE_DEPARTMENTS, STATUSES, STUDENT_DEPARTMENTS, get_clearance_matrix
+)
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["Analytics"],
+    dependencies=[Depends(get_current_active_user(
+        required_roles=[Role.ADMIN, Role.STAFF]))],
+)
+
+
+@router.get("/crosstab")
+def get_clearance_crosstab(db: Session = Depends(get_session)):
+    """
+    Student department x clearance department x status counts, e.g.
+    how many Engineering students are still pending at the Bursary.
+    """
+    matrix = get_clearance_matrix(db)
+    counts = matrix.crosstab()
+    return {
+        "total_students": len(matrix),
+        "crosstab": {
+            student_dept.value: {
+                clearance_dept.value: {
+                    clearance_status.value: int(counts[i, j, k])
+                    for k, clearance_status in enumerate(STATUSES)
+                }
+                for j, clearance_dept in enumerate(CLEARANCE_DEPARTMENTS)
+            }
+            for i, student_dept in enumerate(STUDENT_DEPARTMENTS)
+        },
+    }
+
+
+@router.get("/completion")
+def get_completion_curve(db: Session = Depends(get_session)):
+    """
+    Cohort completion curve per student department: the number of students
+    with at least k approvals, for k = 0 .. number of clearance departments.
+    """
+    matrix = get_clearance_matrix(db)
+    curve = matrix.completion_curve()
+    return {
+        "overall": matrix.overall_counts(),
+        "at_least_approved": {
+            student_dept.value: curve[i].tolist()
+            for i, student_dept in enumerate(STUDENT_DEPARTMENTS)
+        },
+    }
+
+
+@router.get("/blocked-only-by/{department}")
+def get_students_blocked_only_by(department: ClearanceDepartment, db: Session = Depends(get_session)):
+    """Ids of students approved by every department except the given one."""
+    student_ids = get_clearance_matrix(db).blocked_only_by(department)
+    return {
+        "department": department.value,
+        "count": len(student_ids),
+        "student_ids": student_ids.tolist(),
+    }
+
+
+@router.get("/export.csv")
+def export_clearance_csv(db: Session = Depends(get_session)):
+    """Exports the clearance matrix as CSV, one row per student."""
+    return Response(
+        content=get_clearance_matrix(db).to_csv(),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="clearance.csv"'},
+    )
+
+
+@router.get("/export.arrow")
+def export_clearance_arrow(db: Session = Depends(get_session)):
+    """Exports the clearance matrix as an Arrow IPC stream (requires pyarrow)."""
+    matrix = get_clearance_matrix(db)
+    try:
+        import pyarrow as pa
+        table = matrix.to_arrow()
+    except (ImportError, RuntimeError):
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Arrow export is not available on this server (pyarrow is not installed)."
+        )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(
+        content=sink.getvalue().to_pybytes(),
+        media_type="application/vnd.apache.arrow.stream",
+        headers={"Content-Disposition": 'attachment; filename="clearance.arrow"'},
+    )
@@ -1,12 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlmodel import Session
-from typing import List
+from typing import List, Optional
 
-from src.database import get_session
+from src.database import get_session, read_session
 from src.auth import get_current_active_user
-from src.models import User, Role, ClearanceStatus, ClearanceUpdate, ClearanceStatusRead, Student
+from src.http_cache import cache_headers, etag_matches, not_modified, student_etag
+from src.models import (
+    User, Role, ClearanceStatus, ClearanceUpdate, ClearanceStatusRead, Student,
+    ClearanceDepartment, ClearanceStatusEnum, WorkQueueItem, WorkQueuePage,
+    ClaimRequest, ReleaseRequest
+)
+from src.config import settings
 from src.crud import clearance as clearance_crud
 from src.crud import students as student_crud
+from src.serialization import json_response
+from src.single_flight import aggregate_cache
 
 router = APIRouter(
     prefix="/clearance",
@@ -26,6 +34,11 @@ def update_student_clearance_status(
     """
     Endpoint for staff to update a student's clearance status.
 
+    **Concurrent edits:** send the `version` you last read (from the summary,
+    work queue or a previous update) to make the update conditional. If someone
+    else changed the item in the meantime, the response is `409 Conflict` with
+    the item's current state instead of silently overwriting it.
+
     **Department-based Access Control:**
     - **ADMIN users** can update clearance status for any department
     - **STAFF users** can only update clearance status for their assigned clearance department
@@ -59,8 +72,17 @@ def update_student_clearance_status(
 
     # Admin users can update any department (no additional checks needed)
 
-    updated_status = clearance_crud.update_clearance_status(
-        db, clearance_update)
+    try:
+        updated_status = clearance_crud.update_clearance_status(
+            db, clearance_update, acting_user_id=current_user.id)
+    except clearance_crud.ClearanceConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": str(e),
+                "current": _clearance_state(e.record),
+            }
+        )
 
     if not updated_status:
         raise HTTPException(
@@ -71,24 +93,166 @@ def update_student_clearance_status(
     return updated_status
 
 
+def _clearance_state(record: ClearanceStatus) -> dict:
+    return {
+        "id": record.id,
+        "department": record.department.value,
+        "status": record.status.value,
+        "remarks": record.remarks,
+        "version": record.version,
+        "claimed_by": record.claimed_by,
+        "claim_expires_at": record.claim_expires_at.isoformat() if record.claim_expires_at else None,
+    }
+
+
+def _resolve_work_department(
+    current_user: User, department: Optional[ClearanceDepartment]
+) -> ClearanceDepartment:
+    """Staff are pinned to their clearance department; admins must name one."""
+    if current_user.role == Role.STAFF:
+        if not current_user.clearance_department:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Staff user must have a clearance department assigned. Contact your administrator."
+            )
+        if department and department != current_user.clearance_department:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Access denied. You can only work on the {current_user.clearance_department.value} queue."
+            )
+        return current_user.clearance_department
+    if department is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A department must be provided."
+        )
+    return department
+
+
+def _work_queue_item(record: ClearanceStatus, student: Student) -> WorkQueueItem:
+    return WorkQueueItem(
+        clearance_id=record.id,  # type:ignore
+        student_id=student.id,  # type:ignore
+        matric_no=student.matric_no,
+        full_name=student.full_name,
+        student_department=student.department,
+        department=record.department,
+        status=record.status,
+        remarks=record.remarks,
+        version=record.version,
+        claimed_by=record.claimed_by,
+        claim_expires_at=record.claim_expires_at,
+    )
+
+
+@router.get("/queue", response_model=WorkQueuePage)
+def get_department_work_queue(
+    department: Optional[ClearanceDepartment] = Query(
+        None, description="Clearance department to list. Staff may only use their own; required for admins."),
+    status_filter: Optional[ClearanceStatusEnum] = Query(
+        None, alias="status", description="Only 'pending' or only 'rejected' items. Defaults to both."),
+    after: Optional[int] = Query(
+        None, description="Cursor from the previous page's `next_cursor`."),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_active_user(
+        required_roles=[Role.STAFF, Role.ADMIN]))
+):
+    """
+    Work queue for a clearance desk: pending and rejected items for one
+    department, oldest first, with keyset pagination.
+
+    **STAFF users** always see their assigned `clearance_department`.
+    **ADMIN users** choose the department with the `department` parameter.
+    """
+    department = _resolve_work_department(current_user, department)
+
+    if status_filter == ClearanceStatusEnum.APPROVED:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The work queue only lists pending or rejected items."
+        )
+    statuses = [status_filter] if status_filter else [
+        ClearanceStatusEnum.PENDING, ClearanceStatusEnum.REJECTED]
+
+    rows = clearance_crud.get_work_queue(
+        db, department=department, statuses=statuses, after_id=after, limit=limit)
+    items = [_work_queue_item(record, student) for record, student in rows]
+    return WorkQueuePage(
+        items=items,
+        next_cursor=items[-1].clearance_id if len(items) == limit else None,
+    )
+
+
+@router.post("/claims", response_model=List[WorkQueueItem])
+def claim_work(
+    claim: ClaimRequest,
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_active_user(
+        required_roles=[Role.STAFF, Role.ADMIN]))
+):
+    """
+    Leases the next pending items of a department's queue to the current user,
+    so desks working the same queue never pick up the same student.
+
+    Leases expire after `lease_seconds`, after which the items can be claimed
+    again. Updating an item through `/clearance/update` releases its lease;
+    while a lease is active, other users get `409 Conflict` when updating it.
+    """
+    department = _resolve_work_department(current_user, claim.department)
+    rows = clearance_crud.claim_work_items(
+        db,
+        department=department,
+        user_id=current_user.id,  # type:ignore
+        count=claim.count,
+        lease_seconds=claim.lease_seconds or settings.CLAIM_LEASE_SECONDS,
+    )
+    return [_work_queue_item(record, student) for record, student in rows]
+
+
+@router.post("/claims/release")
+def release_work(
+    release: ReleaseRequest,
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_active_user(
+        required_roles=[Role.STAFF, Role.ADMIN]))
+):
+    """Gives up the current user's leases on the given clearance items."""
+    released = clearance_crud.release_work_items(
+        db, release.clearance_ids, user_id=current_user.id)  # type:ignore
+    return {"released": released}
+
+
 @router.get("/students/{student_id}/summary")
 def get_student_clearance_summary(
     student_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_active_user())
 ):
-    """Get comprehensive clearance summary for a student."""
+    """
+    Get comprehensive clearance summary for a student.
+
+    Responses carry an ETag; send it back in `If-None-Match` to get a
+    `304 Not Modified` when nothing has changed since the last read.
+    """
+    # Check permissions (admin/staff can view any, students only their own)
+    if current_user.role == Role.STUDENT and current_user.student_id != student_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    version = student_crud.get_student_version(db, student_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Student not found")
+
+    etag = student_etag(student_id, version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers.update(cache_headers(etag))
+
     student = student_crud.get_student_by_id(db, student_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
-    # Check permissions (admin/staff can view any, students only their own)
-    if current_user.role == Role.STUDENT:
-        student_user = student_crud.get_student_by_matric_no(
-            db, current_user.username)
-        if not student_user or student_user.id != student_id:
-            raise HTTPException(status_code=403, detail="Access denied")
-
     # Calculate clearance status
     approved_count = sum(
         1 for status in student.clearance_statuses
@@ -109,7 +273,7 @@ def get_student_clearance_summary(
     else:
         overall_status = "pending"
 
-    return {
+    return json_response({
         "student_id": student.id,
         "matric_no": student.matric_no,
         "full_name": student.full_name,
@@ -123,7 +287,8 @@ def get_student_clearance_summary(
                 "department": status.department.value,
                 "status": status.status.value,
                 "remarks": status.remarks,
-                "id": status.id
+                "id": status.id,
+                "version": status.version
             }
             for status in student.clearance_statuses
         ],
@@ -131,17 +296,12 @@ def get_student_clearance_summary(
             status.department.value for status in student.clearance_statuses
             if status.status.value != "approved"
         ]
-    }
+    }, response)
 
 
-@router.get("/students/cleared")
-def get_cleared_students(
-    db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_active_user(
-        required_roles=[Role.ADMIN, Role.STAFF]))
-):
-    """Get all students who have completed their clearance."""
-    all_students = student_crud.get_all_students(db)
+def _cleared_students() -> List[dict]:
+    with read_session() as db:
+        all_students = student_crud.get_all_students(db)
     cleared_students = []
 
     for student in all_students:
@@ -160,18 +320,26 @@ def get_cleared_students(
                     "total_departments": total_departments,
                     "approved_count": approved_count
                 })
-
     return cleared_students
 
 
-@router.get("/statistics")
-def get_clearance_statistics(
+@router.get("/students/cleared")
+async def get_cleared_students(
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_active_user(
         required_roles=[Role.ADMIN, Role.STAFF]))
 ):
-    """Get overall clearance statistics."""
-    all_students = student_crud.get_all_students(db)
+    """
+    Get all students who have completed their clearance.
+    Computed at most once per AGGREGATE_CACHE_TTL_SECONDS and shared between callers.
+    """
+    db.close()  # Don't hold the connection authentication used while waiting on the shared result
+    return json_response(await aggregate_cache.get("clearance_cleared_students", _cleared_students))
+
+
+def _clearance_statistics() -> dict:
+    with read_session() as db:
+        all_students = student_crud.get_all_students(db)
 
     stats = {
         "total_students": len(all_students),
@@ -203,5 +371,18 @@ def get_clearance_statistics(
             stats["partially_cleared"] += 1
         else:
             stats["pending"] += 1
-
     return stats
+
+
+@router.get("/statistics")
+async def get_clearance_statistics(
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_active_user(
+        required_roles=[Role.ADMIN, Role.STAFF]))
+):
+    """
+    Get overall clearance statistics.
+    Computed at most once per AGGREGATE_CACHE_TTL_SECONDS and shared between callers.
+    """
+    db.close()  # Don't hold the connection authentication used while waiting on the shared result
+    return json_response(await aggregate_cache.get("clearance_statistics", _clearance_statistics))
@@ -0,0 +1,94 @@
+import os
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from pydantic import ValidationError
+from sqlmodel import Session, select
+
+from src.auth import get_current_active_user
+from src.database import get_primary_session
+from src.jobs import JOB_KINDS, job_runner, submit_job
+from src.models import Job, JobKindRead, JobRead, JobStatus, JobSubmit, Role, User
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["Jobs"],
+    dependencies=[Depends(get_current_active_user(required_roles=[Role.ADMIN]))],
+)
+
+
+def job_read(job: Job) -> JobRead:
+    read = JobRead.model_validate(job)
+    if job.status == JobStatus.DONE and job.result_path:
+        read.result_url = f"/jobs/{job.id}/result"
+    return read
+
+
+def queue_job(db: Session, kind: str, params: dict, user: Optional[User] = None) -> JobRead:
+    """Queues a job and wakes the runner. Shared with endpoints that start jobs of their own."""
+    try:
+        job = submit_job(db, kind, params, user.id if user else None)
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind '{kind}'.")
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+    job_runner.notify()
+    return job_read(job)
+
+
+@router.get("/kinds", response_model=List[JobKindRead])
+def list_job_kinds():
+    """Lists the jobs that can be submitted, with the params each one takes."""
+    return [
+        JobKindRead(kind=kind.name, description=kind.description,
+                    params_schema=kind.params_model.model_json_schema() if kind.params_model else None)
+        for kind in JOB_KINDS.values()
+    ]
+
+
+# Job state is polled right after submitting, so it is always read from the primary
+@router.post("/", response_model=JobRead, status_code=status.HTTP_202_ACCEPTED)
+def create_job(
+    request: JobSubmit,
+    db: Session = Depends(get_primary_session),
+    current_user: User = Depends(get_current_active_user(required_roles=[Role.ADMIN])),
+):
+    """Queues a background job. Poll GET /jobs/{job_id} for its progress and result."""
+    return queue_job(db, request.kind, request.params, current_user)
+
+
+@router.get("/", response_model=List[JobRead])
+def list_jobs(
+    job_status: Optional[JobStatus] = Query(None, alias="status"),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_primary_session),
+):
+    """Lists recent jobs, newest first."""
+    statement = select(Job).order_by(Job.id.desc()).limit(limit)  # type:ignore
+    if job_status is not None:
+        statement = statement.where(Job.status == job_status)
+    return [job_read(job) for job in db.exec(statement).all()]
+
+
+@router.get("/{job_id}", response_model=JobRead)
+def get_job(job_id: int, db: Session = Depends(get_primary_session)):
+    job = db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_read(job)
+
+
+@router.get("/{job_id}/result")
+def get_job_result(job_id: int, db: Session = Depends(get_primary_session)):
+    """The job's result file if it produced one, otherwise its result object."""
+    job = db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != JobStatus.DONE:
+        raise HTTPException(status_code=409, detail=f"The job has no result: it is {job.status.value}.")
+    if job.result_path:
+        if not os.path.exists(job.result_path):
+            raise HTTPException(status_code=410, detail="The job's result file is no longer available.")
+        return FileResponse(job.result_path, filename=os.path.basename(job.result_path).split("-", 1)[1])
+    return job.result
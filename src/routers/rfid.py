@@ -1,20 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Security
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Security
 from fastapi.security import APIKeyHeader
 from sqlmodel import Session
 
 from src.database import get_session
 from src.auth import get_api_key
-from src.models import RFIDStatusResponse, RFIDScanRequest, ClearanceStatusEnum
+from src.models import RFIDStatusResponse, ClearanceStatusEnum
 from src.crud import students as student_crud
 from src.crud import users as user_crud
+from src.config import settings
+from src.tag_filter import TAG_FILTER_LOOKUPS_TOTAL, tag_filter
+from src.device_format import COMPACT_RESPONSES, TAG_REQUEST_BODY, scanned_tag_id, status_response
 
 # Define the router and the API key security scheme
 router = APIRouter(prefix="/rfid", tags=["RFID"])
 api_key_header = APIKeyHeader(name="x-api-key", auto_error=False)
 
-@router.post("/check-status", response_model=RFIDStatusResponse)
+@router.post("/check-status", response_model=RFIDStatusResponse,
+             responses=COMPACT_RESPONSES, openapi_extra=TAG_REQUEST_BODY)
 def check_rfid_status(
-    scan_data: RFIDScanRequest,
+    request: Request,
+    response: Response,
+    tag_id: str = Depends(scanned_tag_id),
     db: Session = Depends(get_session),
     # This dependency ensures the request comes from a valid, registered device
     api_key: str = Security(get_api_key),
@@ -22,12 +28,35 @@ def check_rfid_status(
     """
     Public endpoint for hardware devices to check the status of a scanned RFID tag.
     The device must provide a valid API key in the 'x-api-key' header.
+
+    Readers can ask for a compact response with `Accept: text/plain`
+    (`F|S|P|Ada Obi`: status, entity type and clearance codes, then the name)
+    or `Accept: application/msgpack`, and may send the tag as a text/plain body.
+    See `src/device_format.py` for the codes.
     """
-    tag_id = scan_data.tag_id
+    return status_response(request, response, _tag_status(db, tag_id))
+
+
+_UNREGISTERED = RFIDStatusResponse(
+    status="unregistered",
+    full_name=None,
+    entity_type=None,
+    clearance_status=None,
+)
+
+
+def _tag_status(db: Session, tag_id: str) -> RFIDStatusResponse:
+    # 0. Tags the filter has never seen are definitely not linked; skip the lookups
+    use_filter = settings.TAG_FILTER_ENABLED
+    if use_filter and not tag_filter.might_contain(tag_id):
+        TAG_FILTER_LOOKUPS_TOTAL.inc("definite_miss")
+        return _UNREGISTERED
 
     # 1. Check if the tag belongs to a student
     student = student_crud.get_student_by_tag_id(db, tag_id=tag_id)
     if student:
+        if use_filter:
+            TAG_FILTER_LOOKUPS_TOTAL.inc("hit")
         # Check overall clearance status using proper enum comparison
         is_cleared = all(
             clearance.status == ClearanceStatusEnum.APPROVED 
@@ -44,6 +73,8 @@ def check_rfid_status(
 
     # 2. If not a student, check if it belongs to a user (staff/admin)
     user = user_crud.get_user_by_tag_id(db, tag_id=tag_id)
+    if use_filter:
+        TAG_FILTER_LOOKUPS_TOTAL.inc("hit" if user else "false_positive")
     if user:
         return RFIDStatusResponse(
             status="found",
@@ -53,9 +84,4 @@ def check_rfid_status(
         )
 
     # 3. If the tag is not linked to anyone
-    return RFIDStatusResponse(
-        status="unregistered",
-        full_name=None,
-        entity_type=None,
-        clearance_status=None,
-    )
+    return _UNREGISTERED
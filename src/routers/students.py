@@ -1,24 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlmodel import Session, SQLModel
 
-from src.auth import get_current_active_user
+from src.auth import get_current_active_user, get_current_user_with_clearance
 from src.database import get_session
+from src.http_cache import cache_headers, etag_matches, not_modified, student_etag
 from src.models import StudentReadWithClearance, User, Role
 from src.crud import students as student_crud
+from src.serialization import json_response
 
 
 class StudentLookupRequest(SQLModel):
     matric_no: str
 
 
+# Authentication is declared per route: /me/clearance loads the caller together
+# with their clearance record, which only saves a query if no router-level
+# dependency has looked the caller up first.
 router = APIRouter(
     prefix="/students",
     tags=["Students"],
-    dependencies=[Depends(get_current_active_user)]
 )
 
 
-@router.post("/lookup", response_model=StudentReadWithClearance)
+@router.post("/lookup", response_model=StudentReadWithClearance,
+             dependencies=[Depends(get_current_active_user())])
 def lookup_student_by_matric_no(
     request: StudentLookupRequest,
     db: Session = Depends(get_session)
@@ -41,12 +46,17 @@ def lookup_student_by_matric_no(
 
 @router.get("/me/clearance")
 def get_my_clearance_status(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_active_user())
+    current_user: User = Depends(get_current_user_with_clearance)
 ):
     """
     Endpoint for students to view their own clearance status.
-    Only accessible by users with STUDENT role using their matriculation number as username.
+    Only accessible by users with STUDENT role whose login is linked to a student record.
+
+    Responses carry an ETag; send it back in `If-None-Match` to get a
+    `304 Not Modified` when nothing has changed since the last read.
     """
     # Only students can access this endpoint
     if current_user.role != Role.STUDENT:
@@ -55,13 +65,18 @@ def get_my_clearance_status(
             detail="This endpoint is only accessible to students"
         )
 
-    # Find student by matric number (username for students)
-    student = student_crud.get_student_by_matric_no(db, current_user.username)
+    # The record and its clearance rows came back with the login in one joined
+    # query; the ETag is checked against it.
+    student = student_crud.get_student_for_user(db, current_user)
     if not student:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Student record not found for current user"
         )
+    etag = student_etag(student.id, student.version)  # type:ignore
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers.update(cache_headers(etag))
 
     # Calculate clearance summary
     approved_count = sum(
@@ -83,7 +98,7 @@ def get_my_clearance_status(
     else:
         overall_status = "pending"
 
-    return {
+    return json_response({
         "student_info": {
             "id": student.id,
             "matric_no": student.matric_no,
@@ -111,4 +126,4 @@ def get_my_clearance_status(
             status.department.value for status in student.clearance_statuses
             if status.status.value == "pending"
         ]
-    }
+    }, response)
@@ -2,11 +2,13 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import Session
 from datetime import timedelta
+import math
 
 from src.database import get_session
 from src.auth import authenticate_user, create_access_token
 from src.models import Token
 from src.config import settings
+from src.rate_limit import POLICIES_BY_NAME, check_rate_limit
 
 router = APIRouter(tags=["Authentication"])
 
@@ -22,6 +24,17 @@ async def login_for_access_token(
     password flow. The client sends 'username' and 'password' in a
     form-data body.
     """
+    # Per-username budget on top of the per-IP one, so a password spray spread
+    # over many IPs still can't hammer one account. Checked before bcrypt runs.
+    if settings.RATE_LIMIT_ENABLED:
+        retry_after = check_rate_limit(POLICIES_BY_NAME["token"], f"username:{form_data.username}")
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts. Please try again later.",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
     # The authenticate_user function will check both Student and User tables
     user = authenticate_user(db, form_data.username, form_data.password)
     
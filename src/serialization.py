@@ -0,0 +1,79 @@
+"""
+Fast serialization path for large responses.
+
+When `settings.FAST_JSON` is enabled, list and summary endpoints build plain
+dicts straight from the already-loaded ORM objects and hand them to
+`FastJSONResponse` (orjson). This skips FastAPI's response_model validation and
+`jsonable_encoder` pass, which dominate request time for big lists.
+The payload shapes mirror the response models in `src.models` exactly.
+"""
+from typing import Any, Dict, List, Optional
+
+import orjson
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+from src.config import settings
+from src.models import ClearanceStatus, RFIDTag, Student
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson. Also used as the app's default response class."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def clearance_status_payload(status: ClearanceStatus) -> Dict[str, Any]:
+    """Same shape as `ClearanceStatusRead`."""
+    return {
+        "department": status.department.value,
+        "status": status.status.value,
+        "remarks": status.remarks,
+        "version": status.version,
+    }
+
+
+def rfid_tag_payload(tag: Optional[RFIDTag]) -> Optional[Dict[str, Any]]:
+    """Same shape as `RFIDTagRead`."""
+    if tag is None:
+        return None
+    return {
+        "tag_id": tag.tag_id,
+        "student_id": tag.student_id,
+        "user_id": tag.user_id,
+    }
+
+
+def student_payload(student: Student) -> Dict[str, Any]:
+    """Same shape as `StudentReadWithClearance`."""
+    return {
+        "id": student.id,
+        "full_name": student.full_name,
+        "matric_no": student.matric_no,
+        "department": student.department.value,
+        "academic_session": student.academic_session,
+        "clearance_statuses": [clearance_status_payload(s) for s in student.clearance_statuses],
+        "rfid_tag": rfid_tag_payload(student.rfid_tag),
+    }
+
+
+def students_response(students: List[Student]) -> Any:
+    """
+    Returns a list of students as a `List[StudentReadWithClearance]` body.
+    Falls back to the ORM objects (regular FastAPI encoding) when the fast path is off.
+    """
+    if not settings.FAST_JSON:
+        return students
+    return FastJSONResponse([student_payload(s) for s in students])
+
+
+def json_response(content: Any, response: Optional[Response] = None) -> Any:
+    """
+    Returns an already JSON-ready dict/list, through orjson when the fast path is on.
+    Headers set on the injected `response` (e.g. ETag) are carried over.
+    """
+    if not settings.FAST_JSON:
+        return content
+    headers = dict(response.headers) if response is not None else None
+    return FastJSONResponse(content, headers=headers)
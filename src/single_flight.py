@@ -0,0 +1,82 @@
+"""
+Single-flight caching for expensive read endpoints.
+
+Concurrent requests for the same key share one in-flight computation, and the
+result is kept for a short TTL. Once it expires it is still served for a
+further stale window while one background refresh replaces it, so callers
+only wait when nothing usable is cached. However many dashboards are open,
+each key costs at most one computation per TTL.
+
+Per process: with several workers, each computes its own copy.
+"""
+import asyncio
+import time
+from typing import Any, Callable, Dict, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from src import metrics
+from src.config import settings
+
+SINGLE_FLIGHT_TOTAL = metrics.registry.register(metrics.Counter(
+    "single_flight_requests_total",
+    "Cached aggregate lookups by outcome: hit, stale, coalesced (waited on an in-flight computation) or miss.",
+    ("key", "result")))
+
+
+class SingleFlightCache:
+    """
+    A TTL cache whose misses are coalesced. Only touched from the event loop,
+    so it needs no locks; computations run in the threadpool.
+    """
+
+    def __init__(self, ttl_seconds: float, stale_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    async def get(self, key: str, compute: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value for `key`, calling the blocking `compute()` at most
+        once at a time per key. The value is shared between callers; don't mutate it.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self.ttl_seconds:
+                SINGLE_FLIGHT_TOTAL.inc(key, "hit")
+                return entry[1]
+            if age < self.ttl_seconds + self.stale_seconds:
+                SINGLE_FLIGHT_TOTAL.inc(key, "stale")
+                self._start(key, compute)
+                return entry[1]
+        SINGLE_FLIGHT_TOTAL.inc(key, "coalesced" if key in self._in_flight else "miss")
+        # Shielded, so a client disconnecting doesn't cancel the computation others are waiting on
+        return await asyncio.shield(self._start(key, compute))
+
+    def _start(self, key: str, compute: Callable[[], Any]) -> asyncio.Future:
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._compute(key, compute))
+            future.add_done_callback(lambda f: self._log_failure(key, f))
+            self._in_flight[key] = future
+        return future
+
+    async def _compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        try:
+            value = await run_in_threadpool(compute)
+            self._entries[key] = (time.monotonic(), value)
+            return value
+        finally:
+            self._in_flight.pop(key, None)
+
+    @staticmethod
+    def _log_failure(key: str, future: asyncio.Future):
+        # Also marks the exception as retrieved when a background refresh had no waiters
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Error computing cached value '{key}': {future.exception()}")
+
+
+aggregate_cache = SingleFlightCache(
+    settings.AGGREGATE_CACHE_TTL_SECONDS, settings.AGGREGATE_CACHE_STALE_SECONDS)
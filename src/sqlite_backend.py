@@ -0,0 +1,115 @@
+"""
+SQLite backend mode for single-node deployments.
+
+Point POSTGRES_URI at a file (e.g. `sqlite:////var/lib/clearance/clearance.db`)
+and the engine is tuned for a small server serving gate traffic:
+
+- WAL journal, so readers never block on the writer and vice versa
+- `synchronous=NORMAL`, which is durable against application crashes and only
+  risks the last transactions on power loss when combined with WAL
+- memory-mapped reads (`mmap_size`) and a `busy_timeout` for lock waits
+- a single-writer queue: SQLite allows one writer at a time, so write
+  transactions in this process wait their turn in FIFO order instead of
+  failing with "database is locked" or starving under load
+"""
+import threading
+from typing import Set
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.config import settings
+
+_READ_PREFIXES = ("SELECT", "PRAGMA", "EXPLAIN")
+_WRITE_LOCK_KEY = "holds_sqlite_write_lock"
+
+
+class WriterQueue:
+    """A FIFO lock: waiters are served in arrival order. Tickets abandoned on timeout are skipped."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+        self._abandoned: Set[int] = set()
+
+    def acquire(self, timeout: float) -> bool:
+        with self._condition:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            if self._condition.wait_for(lambda: self._serving == ticket, timeout=timeout):
+                return True
+            if self._serving == ticket:  # served just as the wait timed out
+                return True
+            self._abandoned.add(ticket)
+            return False
+
+    def release(self):
+        with self._condition:
+            self._serving += 1
+            while self._serving in self._abandoned:
+                self._abandoned.discard(self._serving)
+                self._serving += 1
+            self._condition.notify_all()
+
+
+writer_queue = WriterQueue()
+
+
+def is_sqlite_url(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _is_in_memory(url: str) -> bool:
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+
+def _apply_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        if connection_record.info.get("file_backed", True):
+            cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    finally:
+        cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # pysqlite only opens a transaction at the first write, so taking the
+    # queue here, before that statement runs, serializes whole write transactions.
+    if conn.info.get(_WRITE_LOCK_KEY) or statement.lstrip()[:7].upper().startswith(_READ_PREFIXES):
+        return
+    if writer_queue.acquire(timeout=settings.SQLITE_BUSY_TIMEOUT_MS / 1000):
+        conn.info[_WRITE_LOCK_KEY] = True
+    else:
+        # Fall back to SQLite's own locking (and busy_timeout) rather than failing here
+        print("Timed out waiting for the SQLite writer queue; proceeding without it.")
+
+
+def _release_writer(conn):
+    if conn.info.pop(_WRITE_LOCK_KEY, False):
+        writer_queue.release()
+
+
+def _release_writer_on_checkin(dbapi_connection, connection_record):
+    # Safety net for connections returned to the pool without an explicit commit/rollback
+    if connection_record.info.pop(_WRITE_LOCK_KEY, False):
+        writer_queue.release()
+
+
+def configure_sqlite_engine(engine: Engine, url: str):
+    """Applies the pragmas to every new connection and, if enabled, the single-writer queue."""
+    file_backed = not _is_in_memory(url)
+
+    def on_connect(dbapi_connection, connection_record):
+        connection_record.info["file_backed"] = file_backed
+        _apply_pragmas(dbapi_connection, connection_record)
+
+    event.listen(engine, "connect", on_connect)
+    if settings.SQLITE_SINGLE_WRITER:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "commit", _release_writer)
+        event.listen(engine, "rollback", _release_writer)
+        event.listen(engine, "checkin", _release_writer_on_checkin)
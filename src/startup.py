@@ -0,0 +1,78 @@
+"""
+Cold-start timing.
+
+Records how long a worker takes from process start to serving its first
+request, split into imports, the lifespan startup and the first request, and
+exposes it as `app_startup_seconds{phase}`. A first request later than
+STARTUP_TARGET_SECONDS is logged, so slow boots show up when autoscaling.
+
+benchmarks/startup_bench.py measures the same thing from outside the process
+and checks the import-time budget.
+"""
+import os
+import time
+from typing import Optional
+
+from src import metrics
+from src.config import settings
+
+STARTUP_SECONDS = metrics.registry.register(metrics.Gauge(
+    "app_startup_seconds",
+    "Seconds from process start to the end of each startup phase: imports, lifespan and first_request.",
+    ("phase",)))
+
+
+def process_age_seconds() -> Optional[float]:
+    """Seconds since this process started, from /proc (Linux); None where unavailable."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the parenthesised command name; starttime is field 22
+            started_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - started_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupClock:
+    """
+    Seconds since process start. Falls back to timing from when this module
+    was imported (early in main.py) where /proc isn't available.
+    """
+
+    def __init__(self):
+        age = process_age_seconds()
+        self._origin = time.perf_counter() - (age if age is not None else 0.0)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._origin
+
+    def mark(self, phase: str) -> float:
+        elapsed = self.elapsed()
+        STARTUP_SECONDS.set(elapsed, phase)
+        return elapsed
+
+
+clock = StartupClock()
+
+
+class FirstRequestTimerMiddleware:
+    """Pure ASGI middleware recording when the first HTTP request has been served."""
+
+    def __init__(self, app):
+        self.app = app
+        self.done = False
+
+    async def __call__(self, scope, receive, send):
+        if self.done or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        self.done = True
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed = clock.mark("first_request")
+            print(f"First request served {elapsed:.2f}s after process start.")
+            if elapsed > settings.STARTUP_TARGET_SECONDS:
+                print(f"Startup is over its {settings.STARTUP_TARGET_SECONDS:.1f}s target.")
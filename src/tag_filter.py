@@ -0,0 +1,147 @@
+"""
+In-memory Bloom filter of linked RFID tag ids.
+
+Gates see many unregistered cards (visitors, old IDs, bank cards). The filter
+answers "definitely not linked" for those without touching the database;
+anything it might contain goes through the normal lookup, so a false positive
+only costs the queries every tap used to cost.
+
+Within a process the filter never produces false negatives. Tags are added
+as they are linked, before the commit (a rolled-back link only leaves a
+harmless extra entry), so a rebuild's snapshot can miss a link that was added
+just before the rebuild started and committed after it read. Every rebuild
+therefore replays the tags added since the previous rebuild started, and
+anything added while it runs. Bloom filters can't delete, so unlinked tags
+stay in it as false positives until the next periodic rebuild, which also
+resizes it for growth.
+
+Per process: with several workers, a tag linked through another worker reads
+as "unregistered" here until this worker's next rebuild, up to
+TAG_FILTER_REBUILD_INTERVAL_SECONDS.
+"""
+import hashlib
+import math
+import threading
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from src import metrics
+from src.config import settings
+from src.models import RFIDTag
+
+_MIN_CAPACITY = 1024
+
+
+class BloomFilter:
+    """A fixed-size Bloom filter over strings, sized for `capacity` items at `error_rate`."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.size_bits = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.size_bits + 7) // 8)
+        self.items = 0
+
+    def _positions(self, key: str) -> Iterable[int]:
+        # Double hashing (Kirsch-Mitzenmacher): k positions from one 128-bit digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size_bits for i in range(self.hash_count))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.items += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self.bits)
+
+    def estimated_false_positive_rate(self) -> float:
+        """The chance a key that was never added tests positive, from the share of bits set."""
+        set_bits = int.from_bytes(self.bits, "little").bit_count()
+        return (set_bits / self.size_bits) ** self.hash_count
+
+
+class TagFilter:
+    """The process-wide filter, rebuilt from the database and kept current by link_tag."""
+
+    def __init__(self, error_rate: float):
+        self.error_rate = error_rate
+        self._filter: Optional[BloomFilter] = None
+        self._lock = threading.Lock()
+        self._generation = 0  # rebuilds started so far
+        # (generation, tag_id) for tags added since the previous rebuild started
+        self._recently_linked: List[Tuple[int, str]] = []
+        self.stale_items = 0  # unlinked since the last rebuild
+
+    def might_contain(self, tag_id: str) -> bool:
+        current = self._filter
+        return current is None or tag_id in current  # not built yet: everything is a maybe
+
+    def add(self, tag_id: str):
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(tag_id)
+            if self._generation:  # nothing to replay into until a rebuild has started
+                self._recently_linked.append((self._generation, tag_id))
+
+    def discard(self, tag_id: str):
+        with self._lock:
+            self.stale_items += 1
+
+    def rebuild(self, db: Session) -> int:
+        """Builds a fresh filter from every linked tag and swaps it in. Returns the tag count."""
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        tag_ids = db.exec(select(RFIDTag.tag_id)).all()
+        rebuilt = BloomFilter(max(2 * len(tag_ids), _MIN_CAPACITY), self.error_rate)
+        for tag_id in tag_ids:
+            rebuilt.add(tag_id)
+        with self._lock:
+            # Links still uncommitted when the snapshot was read are missing from it
+            for _, tag_id in self._recently_linked:
+                rebuilt.add(tag_id)
+            # Those added before this rebuild started have committed by the next one
+            self._recently_linked = [entry for entry in self._recently_linked if entry[0] >= generation]
+            self._filter = rebuilt
+            self.stale_items = 0
+        return len(tag_ids)
+
+    @property
+    def bloom(self) -> Optional[BloomFilter]:
+        return self._filter
+
+
+tag_filter = TagFilter(settings.TAG_FILTER_FALSE_POSITIVE_RATE)
+
+
+def _filter_stat(read: Callable[[BloomFilter], float]) -> Callable[[], float]:
+    def callback() -> float:
+        current = tag_filter.bloom
+        return float(read(current)) if current is not None else 0.0
+    return callback
+
+
+TAG_FILTER_LOOKUPS_TOTAL = metrics.registry.register(metrics.Counter(
+    "rfid_tag_filter_lookups_total",
+    "Tag status checks by filter outcome: definite_miss (no query), hit, or false_positive.", ("result",)))
+metrics.registry.register(metrics.Gauge(
+    "rfid_tag_filter_memory_bytes", "Memory used by the linked-tag Bloom filter's bit array.",
+    callback=_filter_stat(lambda f: f.memory_bytes)))
+metrics.registry.register(metrics.Gauge(
+    "rfid_tag_filter_items", "Tags added to the linked-tag Bloom filter since it was built.",
+    callback=_filter_stat(lambda f: f.items)))
+metrics.registry.register(metrics.Gauge(
+    "rfid_tag_filter_stale_items", "Tags unlinked since the last rebuild, still in the filter as false positives.",
+    callback=lambda: float(tag_filter.stale_items)))
+metrics.registry.register(metrics.Gauge(
+    "rfid_tag_filter_false_positive_rate", "Estimated false-positive rate of the linked-tag Bloom filter.",
+    callback=_filter_stat(lambda f: f.estimated_false_positive_rate())))
@@ -0,0 +1,39 @@
+"""
+Bearer token decoding shared by the auth dependencies and the rate limiter.
+
+Decoded claims are cached in the request's ASGI state, so a request pays for
+at most one JWT signature check however many layers look at its token.
+python-jose (and its crypto backends) is imported on first use rather than at
+worker startup.
+"""
+from typing import Optional
+
+from src.config import settings
+
+_CLAIMS_KEY = "token_claims"
+
+
+def decode_access_token(token: str, state: Optional[dict] = None) -> Optional[dict]:
+    """
+    Returns the token's claims, or None if it is invalid or expired.
+    `state` is the request's ASGI state dict (`scope["state"]`), used as the cache.
+    """
+    if state is not None:
+        cached = state.get(_CLAIMS_KEY)
+        if cached is not None and cached[0] == token:
+            return cached[1]
+    from jose import JWTError, jwt
+
+    try:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        claims = None
+    if state is not None:
+        state[_CLAIMS_KEY] = (token, claims)
+    return claims
+
+
+def encode_access_token(claims: dict) -> str:
+    from jose import jwt
+
+    return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
@@ -0,0 +1,53 @@
+"""
+Test setup: the app runs against a throwaway SQLite database, seeded by its
+own lifespan (the initial admin and students from main.py).
+
+Settings are read when `src.config` is first imported, so the environment is
+set here, before the query budget plugin below pulls the app modules in.
+"""
+import os
+import tempfile
+
+import pytest
+
+_data_dir = tempfile.mkdtemp(prefix="clearance-tests-")
+os.environ.update(
+    POSTGRES_URI=f"sqlite:///{os.path.join(_data_dir, 'test.db')}",
+    initial_admin_username="admin",
+    initial_admin_password="admin-password",
+    initial_admin_email="admin@example.com",
+    JOB_RESULTS_DIR=os.path.join(_data_dir, "job_results"),
+    # Tests log in more often than the /token limit allows
+    RATE_LIMIT_ENABLED="false",
+)
+
+pytest_plugins = ["src.query_budget"]
+
+STUDENT_USERNAME = "20191648"  # seeded by main.initial_students_data
+STUDENT_PASSWORD = "student123"
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+def _login(client, username: str, password: str) -> dict:
+    response = client.post("/token", data={"username": username, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    return _login(client, "admin", "admin-password")
+
+
+@pytest.fixture(scope="session")
+def student_headers(client):
+    return _login(client, STUDENT_USERNAME, STUDENT_PASSWORD)
@@ -0,0 +1,117 @@
+"""
+PUT /clearance/update under concurrent edits: version preconditions, retried
+races and the dashboard counters that move with every update.
+"""
+import pytest
+from sqlmodel import Session, select
+
+from src.crud import clearance as clearance_crud
+from src.crud.counters import reconcile_counters
+from src.crud.students import create_student
+from src.database import engine
+from src.models import (
+    ClearanceDepartment, ClearanceStatus, ClearanceStatusEnum, ClearanceUpdate, Department, Student, StudentCreate,
+)
+
+MATRIC_NO = "UPD0001"
+
+
+@pytest.fixture(scope="module")
+def student(client):
+    with Session(engine) as db:
+        create_student(db, StudentCreate(
+            full_name="Uche Pdate", matric_no=MATRIC_NO, email="uche.pdate@example.com",
+            department=Department.LAW, password="update-password"))
+
+
+def _version(department: ClearanceDepartment) -> int:
+    with Session(engine) as db:
+        return db.exec(
+            select(ClearanceStatus.version)
+            .join(Student, Student.id == ClearanceStatus.student_id)  # type:ignore
+            .where(Student.matric_no == MATRIC_NO, ClearanceStatus.department == department)
+        ).one()
+
+
+def _update(client, headers, department="Bursary", **fields):
+    body = {"matric_no": MATRIC_NO, "department": department, "status": "approved", **fields}
+    return client.put("/clearance/update", json=body, headers=headers)
+
+
+def test_version_goes_up_on_every_update(client, admin_headers, student):
+    first = _update(client, admin_headers, status="rejected")
+    assert first.status_code == 200, first.text
+
+    second = _update(client, admin_headers, version=first.json()["version"])
+    assert second.status_code == 200, second.text
+    assert second.json()["status"] == "approved"
+    assert second.json()["version"] == first.json()["version"] + 1
+
+
+def test_stale_version_gets_409_with_the_current_state(client, admin_headers, student):
+    current = _update(client, admin_headers, department="Library", remarks="checked").json()
+
+    response = _update(client, admin_headers, department="Library", status="rejected",
+                       version=current["version"] - 1)
+    assert response.status_code == 409, response.text
+    detail = response.json()["detail"]
+    assert detail["current"]["version"] == current["version"]
+    assert detail["current"]["status"] == "approved"
+    assert detail["current"]["remarks"] == "checked"
+
+
+def test_lost_race_without_a_version_is_retried_and_counters_stay_exact(student, monkeypatch):
+    with Session(engine) as db:
+        reconcile_counters(db)
+
+    # Another desk writes the same item between this update's read and its write
+    real_deltas = clearance_crud.student_counter_deltas
+    raced = []
+
+    def racing_deltas(records, sign=1):
+        if not raced:
+            raced.append(True)
+            with Session(engine, expire_on_commit=False) as other:
+                clearance_crud.update_clearance_status(other, ClearanceUpdate(
+                    matric_no=MATRIC_NO, department=ClearanceDepartment.HEALTH_CENTER,
+                    status=ClearanceStatusEnum.REJECTED))
+        return real_deltas(records, sign)
+
+    monkeypatch.setattr(clearance_crud, "student_counter_deltas", racing_deltas)
+    before = _version(ClearanceDepartment.HEALTH_CENTER)
+    with Session(engine, expire_on_commit=False) as db:
+        updated = clearance_crud.update_clearance_status(db, ClearanceUpdate(
+            matric_no=MATRIC_NO, department=ClearanceDepartment.HEALTH_CENTER,
+            status=ClearanceStatusEnum.APPROVED))
+
+    assert raced
+    assert updated.status == ClearanceStatusEnum.APPROVED  # last writer wins
+    assert updated.version == before + 2  # the racing write, then this one
+    with Session(engine) as db:
+        assert reconcile_counters(db) == {}
+
+
+def test_a_precondition_is_not_retried_past_a_racing_write(student, monkeypatch):
+    real_deltas = clearance_crud.student_counter_deltas
+    raced = []
+
+    version = _version(ClearanceDepartment.STUDENT_AFFAIRS)
+
+    def racing_deltas(records, sign=1):
+        if not raced:
+            raced.append(True)
+            with Session(engine, expire_on_commit=False) as other:
+                clearance_crud.update_clearance_status(other, ClearanceUpdate(
+                    matric_no=MATRIC_NO, department=ClearanceDepartment.STUDENT_AFFAIRS,
+                    status=ClearanceStatusEnum.REJECTED, version=version))
+        return real_deltas(records, sign)
+
+    monkeypatch.setattr(clearance_crud, "student_counter_deltas", racing_deltas)
+    with Session(engine, expire_on_commit=False) as db:
+        with pytest.raises(clearance_crud.ClearanceConflictError) as conflict:
+            clearance_crud.update_clearance_status(db, ClearanceUpdate(
+                matric_no=MATRIC_NO, department=ClearanceDepartment.STUDENT_AFFAIRS,
+                status=ClearanceStatusEnum.APPROVED, version=version))
+
+    assert conflict.value.record.version == version + 1
+    assert conflict.value.record.status == ClearanceStatusEnum.REJECTED
@@ -0,0 +1,50 @@
+"""
+The dashboard counters are kept by deltas on every write. After any mix of
+writes they must equal a full recount, or reconcile_counters would report drift.
+"""
+from sqlmodel import Session
+
+from src.crud import students as student_crud
+from src.crud.clearance import update_clearance_status
+from src.crud.counters import compute_counters, get_counters, reconcile_counters
+from src.database import engine
+from src.models import ClearanceDepartment, ClearanceStatusEnum, ClearanceUpdate, Department, StudentCreate
+
+
+def _new_student(db: Session, n: int):
+    return student_crud.create_student(db, StudentCreate(
+        full_name=f"Counter Student {n}", matric_no=f"CNT{n:04d}", email=f"counter{n}@example.com",
+        department=Department.BUSINESS_ADMIN, password="counter-password"))
+
+
+def _set(db: Session, matric_no: str, department: ClearanceDepartment, status: ClearanceStatusEnum):
+    assert update_clearance_status(db, ClearanceUpdate(matric_no=matric_no, department=department, status=status))
+
+
+def test_incremental_counters_match_a_recount(client):
+    with Session(engine, expire_on_commit=False) as db:
+        reconcile_counters(db)
+
+        steps = [
+            ("create three students", lambda: [_new_student(db, n) for n in range(3)]),
+            ("approve one department", lambda: _set(
+                db, "CNT0000", ClearanceDepartment.LIBRARY, ClearanceStatusEnum.APPROVED)),
+            ("clear a student fully", lambda: [_set(
+                db, "CNT0001", department, ClearanceStatusEnum.APPROVED) for department in ClearanceDepartment]),
+            ("reject a fully cleared student", lambda: _set(
+                db, "CNT0001", ClearanceDepartment.BURSARY, ClearanceStatusEnum.REJECTED)),
+            ("update to the same status", lambda: _set(
+                db, "CNT0000", ClearanceDepartment.LIBRARY, ClearanceStatusEnum.APPROVED)),
+            ("back to pending", lambda: _set(
+                db, "CNT0000", ClearanceDepartment.LIBRARY, ClearanceStatusEnum.PENDING)),
+            ("delete a student", lambda: student_crud.delete_student(
+                db, student_crud.get_student_by_matric_no(db, "CNT0001").id)),  # type:ignore
+            ("delete an untouched student", lambda: student_crud.delete_student(
+                db, student_crud.get_student_by_matric_no(db, "CNT0002").id)),  # type:ignore
+        ]
+        for description, write in steps:
+            write()
+            db.expire_all()
+            assert get_counters(db) == compute_counters(db), f"counters drifted after: {description}"
+
+        assert reconcile_counters(db) == {}
@@ -0,0 +1,160 @@
+"""
+The job runner against the test database: claiming, stale requeues and drain.
+
+These tests run their own JobRunner over jobs of kinds registered here, and
+clear the job table around each test so the app's runner has nothing to claim.
+"""
+import asyncio
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+from pydantic import BaseModel, ValidationError
+from sqlmodel import Session, SQLModel, delete
+
+from src.config import settings
+from src.database import engine
+from src.jobs import (
+    JOB_KINDS, JobKind, JobRunner, _now, claim_next_job, requeue_stale_jobs, submit_job,
+)
+from src.models import Job, JobStatus
+
+
+@pytest.fixture
+def db():
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.exec(delete(Job))
+        session.commit()
+        yield session
+        session.exec(delete(Job))
+        session.commit()
+
+
+@pytest.fixture
+def job_kinds(monkeypatch):
+    """Registers `kind -> fn` for the test only."""
+    def register(name, run):
+        monkeypatch.setitem(JOB_KINDS, name, JobKind(name, run, ""))
+    return register
+
+
+def _job(db: Session, job_id: int) -> Job:
+    db.expire_all()
+    return db.get(Job, job_id)
+
+
+def _wait_for(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_claim_takes_the_oldest_queued_job_once(db, job_kinds):
+    job_kinds("noop", lambda ctx: None)
+    first = submit_job(db, "noop", {})
+    second = submit_job(db, "noop", {})
+
+    claimed = claim_next_job(db)
+    assert claimed.id == first.id
+    assert claimed.status == JobStatus.RUNNING
+    assert claimed.attempts == 1
+    assert claimed.started_at is not None
+
+    assert claim_next_job(db).id == second.id
+    assert claim_next_job(db) is None
+
+
+def test_unknown_kind_and_bad_params_are_refused(db, monkeypatch):
+    class Params(BaseModel):
+        count: int
+
+    monkeypatch.setitem(JOB_KINDS, "counted", JobKind("counted", lambda ctx, params: None, "", Params))
+    with pytest.raises(KeyError):
+        submit_job(db, "no_such_kind", {})
+    with pytest.raises(ValidationError):
+        submit_job(db, "counted", {"count": "many"})
+    assert submit_job(db, "counted", {"count": "3"}).params == {"count": 3}
+
+
+def test_stale_job_is_requeued_until_it_runs_out_of_attempts(db, job_kinds):
+    job_kinds("noop", lambda ctx: None)
+    job = submit_job(db, "noop", {})
+    claim_next_job(db)
+    stale = _now() - timedelta(seconds=settings.JOB_STALE_SECONDS + 1)
+
+    db.exec(Job.__table__.update().where(Job.id == job.id).values(updated_at=stale))  # type:ignore
+    db.commit()
+    assert requeue_stale_jobs() == 1
+    requeued = _job(db, job.id)
+    assert requeued.status == JobStatus.QUEUED
+    assert requeued.started_at is None
+
+    # A fresh heartbeat keeps it; its last allowed attempt going stale fails it
+    claim_next_job(db)
+    assert requeue_stale_jobs() == 0
+    db.exec(Job.__table__.update().where(Job.id == job.id).values(  # type:ignore
+        updated_at=stale, attempts=settings.JOB_MAX_ATTEMPTS))
+    db.commit()
+    assert requeue_stale_jobs() == 0
+    assert _job(db, job.id).status == JobStatus.FAILED
+
+
+def test_drain_waits_for_jobs_that_finish_in_time(db, job_kinds):
+    job_kinds("quick", lambda ctx: time.sleep(0.2) or {"ok": True})
+    job = submit_job(db, "quick", {})
+
+    async def run():
+        runner = JobRunner(1, 1)
+        runner.start()
+        await asyncio.to_thread(_wait_for, lambda: _job(db, job.id).status == JobStatus.RUNNING)
+        await runner.drain(5.0)
+
+    asyncio.run(run())
+    done = _job(db, job.id)
+    assert done.status == JobStatus.DONE
+    assert done.result == {"ok": True}
+
+
+def test_drain_requeues_jobs_still_running(db, job_kinds):
+    def slow(ctx):
+        while True:
+            ctx.progress(0.5)
+            time.sleep(0.05)
+    job_kinds("slow", slow)
+    job = submit_job(db, "slow", {})
+
+    async def run():
+        runner = JobRunner(1, 1)
+        runner.start()
+        await asyncio.to_thread(_wait_for, lambda: _job(db, job.id).status == JobStatus.RUNNING)
+        await runner.drain(0.1)
+        assert not runner.running
+
+    asyncio.run(run())
+    requeued = _job(db, job.id)
+    assert requeued.status == JobStatus.QUEUED
+    assert requeued.message == "Interrupted by a shutdown; queued again."
+
+
+def test_heartbeat_runs_while_every_worker_is_busy(db, job_kinds, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_STALE_SECONDS", 0.5)  # a heartbeat every 0.1s
+    release = threading.Event()
+    job_kinds("blocking", lambda ctx: release.wait(5) and None)
+    job = submit_job(db, "blocking", {})
+
+    async def run():
+        runner = JobRunner(1, 1)
+        runner.start()
+        await asyncio.to_thread(_wait_for, lambda: _job(db, job.id).status == JobStatus.RUNNING)
+        started = _job(db, job.id).updated_at
+        try:
+            await asyncio.to_thread(_wait_for, lambda: _job(db, job.id).updated_at > started, 2.0)
+        finally:
+            release.set()
+            await runner.drain(5.0)
+
+    asyncio.run(run())
+    assert _job(db, job.id).status == JobStatus.DONE
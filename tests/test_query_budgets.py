@@ -0,0 +1,47 @@
+"""
+Every endpoint in ENDPOINT_QUERY_BUDGETS, called once and held to its budget.
+
+A change that adds queries to one of these routes (an N+1, a lost eager load,
+a second auth lookup) fails here with the statements listed, instead of
+showing up later as a slower dashboard.
+"""
+import pytest
+
+from src.query_budget import ENDPOINT_QUERY_BUDGETS
+
+from tests.conftest import STUDENT_PASSWORD, STUDENT_USERNAME
+
+# (budget key, who calls it, request arguments for TestClient.request)
+CASES = [
+    ("POST /token", None, {"url": "/token", "data": {"username": STUDENT_USERNAME, "password": STUDENT_PASSWORD}}),
+    ("GET /users/me", "admin", {"url": "/users/me"}),
+    ("GET /admin/students/", "admin", {"url": "/admin/students/"}),
+    ("GET /admin/students/search", "admin", {"url": "/admin/students/search", "params": {"q": "Ade"}}),
+    ("GET /admin/clearance/overview", "admin", {"url": "/admin/clearance/overview"}),
+    ("GET /clearance/statistics", "admin", {"url": "/clearance/statistics"}),
+    ("GET /clearance/students/cleared", "admin", {"url": "/clearance/students/cleared"}),
+    ("GET /clearance/students/{student_id}/summary", "admin", {"url": "/clearance/students/1/summary"}),
+    ("GET /clearance/queue", "admin", {"url": "/clearance/queue", "params": {"department": "Library"}}),
+    ("PUT /clearance/update", "admin", {"url": "/clearance/update", "json": {
+        "matric_no": STUDENT_USERNAME, "department": "Library", "status": "approved"}}),
+    ("GET /students/me/clearance", "student", {"url": "/students/me/clearance"}),
+    ("GET /analytics/crosstab", "admin", {"url": "/analytics/crosstab"}),
+    ("GET /analytics/completion", "admin", {"url": "/analytics/completion"}),
+]
+
+
+def test_every_budget_is_exercised():
+    assert {key for key, _, _ in CASES} == set(ENDPOINT_QUERY_BUDGETS)
+
+
+@pytest.mark.parametrize("key, caller, request_args", CASES, ids=[key for key, _, _ in CASES])
+def test_endpoint_stays_within_budget(
+        client, admin_headers, student_headers, query_budget, endpoint_query_budgets, key, caller, request_args):
+    headers = {"admin": admin_headers, "student": student_headers}.get(caller, {})
+    method = key.split(" ", 1)[0]
+
+    with query_budget(ENDPOINT_QUERY_BUDGETS[key], key) as log:
+        response = client.request(method, headers=headers, **request_args)
+
+    assert response.status_code == 200, response.text
+    assert log.count > 0  # the statements were seen, so the budget was really checked
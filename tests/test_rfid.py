@@ -0,0 +1,104 @@
+"""
+The gate endpoint, /rfid/check-status, as the shipped app serves it.
+"""
+import pytest
+from sqlmodel import Session
+
+from src.crud import devices as device_crud
+from src.crud.tag_linking import link_tag
+from src.database import engine
+from src.models import Department, DeviceCreate, TagLink
+
+from tests.conftest import STUDENT_USERNAME
+
+LINKED_TAG = "D6FC3F05"
+
+
+@pytest.fixture(scope="module")
+def device_headers(client):
+    with Session(engine) as db:
+        device = device_crud.create_device(db, DeviceCreate(
+            device_name="test-gate", location="Main Gate", department=Department.COMPUTER_SCIENCE))
+        link_tag(db, TagLink(tag_id=LINKED_TAG, matric_no=STUDENT_USERNAME))
+        return {"X-API-Key": device.api_key}
+
+
+def test_unknown_tag_is_answered_from_the_filter(client, device_headers, query_budget):
+    with query_budget(1, "unknown tag") as log:
+        response = client.post("/rfid/check-status", json={"tag_id": "NEVER-LINKED"}, headers=device_headers)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == "unregistered"
+    assert log.count == 1  # the device's API key, and nothing for the tag
+
+
+def test_linked_tag_is_found(client, device_headers):
+    response = client.post("/rfid/check-status", json={"tag_id": LINKED_TAG}, headers=device_headers)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == "found"
+    assert response.json()["entity_type"] == "Student"
+
+
+def test_requires_a_device_key(client):
+    response = client.post("/rfid/check-status", json={"tag_id": LINKED_TAG})
+    assert response.status_code == 401
+
+
+def _check(client, device_headers, accept=None, content_type=None, **kwargs):
+    headers = dict(device_headers)
+    if accept is not None:
+        headers["Accept"] = accept
+    if content_type is not None:
+        headers["Content-Type"] = content_type
+    kwargs.setdefault("json", {"tag_id": LINKED_TAG})
+    response = client.post("/rfid/check-status", headers=headers, **kwargs)
+    assert response.status_code == 200, response.text
+    vary = [token.strip() for value in response.headers.get_list("vary") for token in value.split(",")]
+    assert vary.count("Accept") == 1  # CORS adds Origin alongside it
+    return response
+
+
+def test_json_by_default(client, device_headers):
+    for accept in (None, "*/*", "application/json", "image/png"):
+        response = _check(client, device_headers, accept)
+        assert response.headers["content-type"] == "application/json"
+        assert response.json()["entity_type"] == "Student"
+
+
+def test_text_plain_is_one_coded_line(client, device_headers):
+    student = _check(client, device_headers).json()
+    clearance = "C" if student["clearance_status"] == "Fully Cleared" else "P"
+
+    response = _check(client, device_headers, "text/plain")
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.text == f"F|S|{clearance}|{student['full_name']}"
+
+    unknown = _check(client, device_headers, "text/plain", json={"tag_id": "NEVER-LINKED"})
+    assert unknown.text == "U|-|-|-"
+
+
+def test_msgpack_is_a_four_item_array(client, device_headers):
+    student = _check(client, device_headers).json()
+    clearance = b"C" if student["clearance_status"] == "Fully Cleared" else b"P"
+    name = student["full_name"].encode()
+
+    response = _check(client, device_headers, "application/msgpack")
+    assert response.headers["content-type"] == "application/msgpack"
+    # fixarray(4), then fixstrs; nil (0xc0) for missing fields
+    assert response.content == b"\x94\xa1F\xa1S\xa1" + clearance + bytes([0xA0 | len(name)]) + name
+
+    unknown = _check(client, device_headers, "application/msgpack", json={"tag_id": "NEVER-LINKED"})
+    assert unknown.content == b"\x94\xa1U\xc0\xc0\xc0"
+
+
+def test_accept_quality_values_pick_the_format(client, device_headers):
+    response = _check(client, device_headers, "application/json;q=0.5, text/plain;q=0.9")
+    assert response.headers["content-type"].startswith("text/plain")
+    response = _check(client, device_headers, "text/plain;q=0, application/msgpack;q=0")
+    assert response.headers["content-type"] == "application/json"
+
+
+def test_tag_may_be_sent_as_text_plain(client, device_headers):
+    response = _check(client, device_headers, "text/plain", "text/plain", content=LINKED_TAG, json=None)
+    assert response.text.startswith("F|S|")
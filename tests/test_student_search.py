@@ -0,0 +1,82 @@
+"""
+/admin/students/search: ranking, paging, and the index-backed matching on SQLite.
+"""
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session
+
+from src.crud import students as student_crud
+from src import database
+from src.database import engine
+from src.models import Department, StudentCreate, StudentUpdate
+
+# In rank order for the query "qzx100"
+STUDENTS = [
+    ("Zed Ward", "QZX100", "zed.ward@example.com"),        # exact matric number
+    ("Amy Stone", "QZX1001", "amy.stone@example.com"),     # matric number prefix
+    ("Qzx100 Bello", "QZX2001", "bello@example.com"),      # name prefix
+    ("Cy Eze", "QZX2002", "qzx100.eze@example.com"),       # email prefix
+    ("Ben Oqzx100", "QZX2003", "ben@example.com"),         # substring only
+]
+
+
+@pytest.fixture(scope="module")
+def students(client):
+    with Session(engine) as db:
+        return {
+            matric_no: student_crud.create_student(db, StudentCreate(
+                full_name=name, matric_no=matric_no, email=email,
+                department=Department.ENGINEERING, password="search-password")).id
+            for name, matric_no, email in STUDENTS
+        }
+
+
+def _search(client, headers, q, **params):
+    response = client.get("/admin/students/search", params={"q": q, **params}, headers=headers)
+    assert response.status_code == 200, response.text
+    return [student["matric_no"] for student in response.json()]
+
+
+def test_exact_matric_number_first_then_prefixes_then_substrings(client, admin_headers, students):
+    assert _search(client, admin_headers, "qzx100") == [matric_no for _, matric_no, _ in STUDENTS]
+
+
+def test_pages_follow_the_ranking(client, admin_headers, students):
+    pages = [_search(client, admin_headers, "QZX100", skip=skip, limit=2) for skip in (0, 2, 4)]
+    assert pages == [["QZX100", "QZX1001"], ["QZX2001", "QZX2002"], ["QZX2003"]]
+
+
+def test_short_terms_match_prefixes_only(client, admin_headers, students):
+    found = _search(client, admin_headers, "Qz", limit=100)
+    assert {"QZX100", "QZX1001", "QZX2001"} <= set(found)
+    assert all(matric_no.startswith("QZX") for matric_no in found)
+    assert "QZX2003" in found  # by its matric number; "Ben Oqzx100" alone wouldn't match
+
+
+def test_search_follows_renames(client, admin_headers, students):
+    with Session(engine) as db:
+        student_crud.update_student(db, students["QZX2002"], StudentUpdate(full_name="Cy Qzxrenamed"))
+    assert _search(client, admin_headers, "qzxrenamed") == ["QZX2002"]
+    assert _search(client, admin_headers, "Cy Eze") == []
+
+
+@pytest.mark.parametrize("q", ["qzx100", "Qz"])
+def test_matching_uses_an_index_on_sqlite(client, students, q):
+    if not database.fts_search_available:
+        pytest.skip("SQLite with FTS5 only")
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    with Session(engine) as db:
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            student_crud.search_students(db, q)
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+        statement, parameters = statements[-1]
+        plan = [row[3] for row in db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+
+    assert "SCAN student" not in plan, plan
+    assert any(step.startswith("SEARCH student USING") for step in plan), plan
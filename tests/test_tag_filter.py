@@ -0,0 +1,53 @@
+"""The linked-tag filter must never turn a linked tag away as unregistered."""
+from src.tag_filter import TagFilter
+
+
+class _Snapshot:
+    """Stands in for the session a rebuild reads the linked tags from."""
+
+    def __init__(self, tag_ids):
+        self.tag_ids = tag_ids
+
+    def exec(self, statement):
+        return self
+
+    def all(self):
+        return list(self.tag_ids)
+
+
+def test_rebuild_keeps_a_link_committed_after_its_snapshot():
+    tag_filter = TagFilter(0.0001)
+    tag_filter.rebuild(_Snapshot(["A"]))
+
+    # link_tag adds before committing; the next rebuild reads before that commit lands
+    tag_filter.add("B")
+    tag_filter.rebuild(_Snapshot(["A"]))
+
+    assert tag_filter.might_contain("A")
+    assert tag_filter.might_contain("B")
+
+
+def test_rebuild_keeps_a_link_added_while_it_reads():
+    tag_filter = TagFilter(0.0001)
+    tag_filter.rebuild(_Snapshot([]))
+
+    class _LinkDuringRead(_Snapshot):
+        def all(self):
+            tag_filter.add("C")
+            return super().all()
+
+    tag_filter.rebuild(_LinkDuringRead([]))
+    assert tag_filter.might_contain("C")
+    # Still uncommitted as far as the next snapshot knows, so it is replayed once more
+    tag_filter.rebuild(_Snapshot([]))
+    assert tag_filter.might_contain("C")
+
+
+def test_replayed_links_are_dropped_once_a_later_rebuild_covers_them():
+    tag_filter = TagFilter(0.0001)
+    tag_filter.rebuild(_Snapshot([]))
+    tag_filter.add("D")
+    tag_filter.rebuild(_Snapshot(["D"]))
+    tag_filter.rebuild(_Snapshot([]))  # unlinked since; not replayed forever
+
+    assert not tag_filter.might_contain("D")
@@ -0,0 +1,113 @@
+"""
+Work-queue leases: POST /clearance/claims and the 409s they cause on /clearance/update.
+"""
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from src.crud import clearance as clearance_crud
+from src.crud import users as user_crud
+from src.crud.students import create_student
+from src.database import engine
+from src.models import (
+    ClearanceDepartment, ClearanceStatus, Department, Role, Student, StudentCreate, UserCreate,
+)
+
+from tests.conftest import _login
+
+DEPARTMENT = ClearanceDepartment.ACADEMIC_AFFAIRS
+STAFF_PASSWORDS = {"desk-one": "desk-one-password", "desk-two": "desk-two-password"}
+
+
+@pytest.fixture(scope="module")
+def desks(client):
+    """Two Academic Affairs staff users and a few students with pending items there. Returns user ids."""
+    with Session(engine) as db:
+        for n in range(6):
+            create_student(db, StudentCreate(
+                full_name=f"Claim Student {n}", matric_no=f"CLM{n:04d}", email=f"claim{n}@example.com",
+                department=Department.MEDICINE, password="claim-password"))
+        return {
+            username: user_crud.create_user(db, UserCreate(
+                username=username, password=password, email=f"{username}@example.com",
+                full_name=username.title(), role=Role.STAFF, clearance_department=DEPARTMENT)).id
+            for username, password in STAFF_PASSWORDS.items()
+        }
+
+
+@pytest.fixture(autouse=True)
+def release_all_claims():
+    yield
+    with Session(engine) as db:
+        db.exec(update(ClearanceStatus).values(claimed_by=None, claim_expires_at=None))
+        db.commit()
+
+
+def _claim(user_id: int, count: int, lease_seconds: int = 300):
+    with Session(engine) as db:
+        return [record.id for record, _ in clearance_crud.claim_work_items(
+            db, department=DEPARTMENT, user_id=user_id, count=count, lease_seconds=lease_seconds)]
+
+
+def test_two_desks_never_get_the_same_items(desks):
+    claims = {}
+    start = threading.Barrier(len(desks))
+
+    def claim(user_id):
+        start.wait()
+        claims[user_id] = _claim(user_id, 3)
+
+    threads = [threading.Thread(target=claim, args=(user_id,)) for user_id in desks.values()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    first, second = claims.values()
+    assert first and second
+    assert not set(first) & set(second)
+    # And the rows say so
+    with Session(engine) as db:
+        for user_id, ids in claims.items():
+            owners = db.exec(select(ClearanceStatus.claimed_by).where(ClearanceStatus.id.in_(ids))).all()  # type:ignore
+            assert set(owners) == {user_id}
+
+
+def test_claimed_items_are_skipped_until_the_lease_expires(desks):
+    one, two = desks.values()
+    held = _claim(one, 2)
+    assert not set(_claim(two, 100)) & set(held)
+
+    with Session(engine) as db:
+        db.exec(update(ClearanceStatus).where(ClearanceStatus.id.in_(held))  # type:ignore
+                .values(claim_expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+        db.commit()
+    assert set(held) <= set(_claim(two, 100))
+
+
+def test_empty_queue_claims_nothing(desks):
+    one, two = desks.values()
+    _claim(one, 1000)
+    assert _claim(two, 10) == []
+
+
+def test_update_is_refused_while_another_user_holds_the_lease(client, admin_headers, desks):
+    desk_one = _login(client, "desk-one", STAFF_PASSWORDS["desk-one"])
+    response = client.post("/clearance/claims", json={"count": 1}, headers=desk_one)
+    assert response.status_code == 200, response.text
+    item = response.json()[0]
+    update_body = {"matric_no": item["matric_no"], "department": DEPARTMENT.value, "status": "approved"}
+
+    refused = client.put("/clearance/update", json=update_body, headers=admin_headers)
+    assert refused.status_code == 409, refused.text
+    assert refused.json()["detail"]["current"]["claimed_by"] == desks["desk-one"]
+
+    # The holder's update goes through and releases the lease
+    accepted = client.put("/clearance/update", json=update_body, headers=desk_one)
+    assert accepted.status_code == 200, accepted.text
+    with Session(engine) as db:
+        record = db.get(ClearanceStatus, item["clearance_id"])
+        assert record.claimed_by is None